@@ -1,14 +1,26 @@
-from agents.base import BaseAgent, AgentConfig
+from agents.base import BaseAgent, AgentConfig, AgentOptions
 from agents.architect import ArchitectAgent
 from agents.planner import PlannerAgent
 from agents.tdd import TDDAgent
 from agents.executor import ExecutorAgent
+from agents.pool import AgentPool
+from agents.cache import ResponseCache, TestResultCache
+from agents.registry import AgentRegistry
+from agents.policy import RunPolicy
+from agents.limiter import CLILimiter
 
 __all__ = [
     "BaseAgent",
     "AgentConfig",
+    "AgentOptions",
     "ArchitectAgent",
     "PlannerAgent",
     "TDDAgent",
     "ExecutorAgent",
+    "AgentPool",
+    "ResponseCache",
+    "TestResultCache",
+    "AgentRegistry",
+    "RunPolicy",
+    "CLILimiter",
 ]
@@ -4,7 +4,7 @@ import re
 from pathlib import Path
 from typing import Any
 
-from agents.base import BaseAgent
+from agents.base import AgentOptions, BaseAgent
 
 
 class ArchitectAgent(BaseAgent):
@@ -27,9 +27,15 @@ class ArchitectAgent(BaseAgent):
     """
 
     AGENT_FILE = "architect"
+    POLICY_KEY = "architect"
 
-    def __init__(self, artifact_dir: Path | str, project_root: Path | str):
-        super().__init__(artifact_dir, project_root)
+    def __init__(
+        self,
+        artifact_dir: Path | str,
+        project_root: Path | str,
+        options: AgentOptions | None = None,
+    ):
+        super().__init__(artifact_dir, project_root, options=options)
 
     def _extract_artifacts(self, output: str) -> None:
         """Extract artifacts from <artifact> tags in output."""
@@ -44,6 +50,19 @@ class ArchitectAgent(BaseAgent):
         if not self.artifacts:
             self.add_artifact("analysis.md", output)
 
+    def _build_input(self, issue_content: str) -> str:
+        """Format the issue into the architect prompt."""
+        return f"""# Task to Analyze
+
+{issue_content}
+
+---
+
+Please analyze this task. Start by exploring the codebase to understand the current state, then produce your structured analysis.
+
+Remember to output your analysis using <artifact> tags when complete.
+"""
+
     def run(self, issue_content: str) -> dict[str, Any]:
         """Run the architect agent on the given issue.
 
@@ -53,19 +72,15 @@ class ArchitectAgent(BaseAgent):
         Returns:
             Dict with status, output text, and artifacts dict
         """
-        # Format the input with context
-        input_context = f"""# Task to Analyze
+        result = super().run(self._build_input(issue_content))
 
-{issue_content}
-
----
-
-Please analyze this task. Start by exploring the codebase to understand the current state, then produce your structured analysis.
+        self.log(f"Artifacts produced: {list(result['artifacts'].keys())}")
 
-Remember to output your analysis using <artifact> tags when complete.
-"""
+        return result
 
-        result = super().run(input_context)
+    async def arun(self, issue_content: str) -> dict[str, Any]:
+        """Async variant of run()."""
+        result = await super().arun(self._build_input(issue_content))
 
         self.log(f"Artifacts produced: {list(result['artifacts'].keys())}")
 
@@ -4,46 +4,63 @@ Uses the Claude CLI (claude --print) instead of the Anthropic Python SDK.
 This allows using Claude Max subscription instead of API keys.
 """
 
+import asyncio
+import contextlib
+import hashlib
 import json
-import re
-import subprocess
+import os
+import time
+import uuid
 from abc import ABC, abstractmethod
+from datetime import datetime
 from pathlib import Path
 from typing import Any
 
-import yaml
+from agents.cache import ResponseCache, TestResultCache, project_tree_hash
+from agents.limiter import CLILimiter, CLISlot
+from agents.metrics import extract_usage
+from agents.policy import RunPolicy
+from agents.registry import AgentConfig, AgentRegistry
+from agents.streaming import StreamJsonConsumer
+from tools.process import ProcessResult, active_process_group, arun_process, run_process
+from tools.vitest_server import VitestServers
 
 
-class AgentConfig:
-    """Configuration parsed from agent definition YAML frontmatter."""
+class AgentOptions:
+    """Runtime options shared by all agents of a pipeline run.
 
-    def __init__(self, name: str, description: str, tools: list[str], model: str, prompt: str):
-        self.name = name
-        self.description = description
-        self.tools = tools
-        self.model = model
-        self.prompt = prompt
-
-    @classmethod
-    def from_file(cls, path: Path) -> "AgentConfig":
-        """Parse agent config from markdown file with YAML frontmatter."""
-        content = path.read_text()
-
-        # Extract YAML frontmatter between --- markers
-        match = re.match(r"^---\n(.*?)\n---\n(.*)$", content, re.DOTALL)
-        if not match:
-            raise ValueError(f"No YAML frontmatter found in {path}")
-
-        frontmatter = yaml.safe_load(match.group(1))
-        prompt = match.group(2).strip()
+    Unlike AgentConfig (parsed from the agent definition file), these come
+    from the orchestrator / command line and apply to every agent.
+    """
 
-        return cls(
-            name=frontmatter.get("name", path.stem),
-            description=frontmatter.get("description", ""),
-            tools=[t.strip() for t in frontmatter.get("tools", "").split(",")],
-            model=frontmatter.get("model", "sonnet"),
-            prompt=prompt,
-        )
+    def __init__(
+        self,
+        stream: bool = False,
+        cache: ResponseCache | None = None,
+        claude_bin: str | None = None,
+        policy: RunPolicy | None = None,
+        limiter: CLILimiter | None = None,
+        test_servers: VitestServers | None = None,
+        test_cache: TestResultCache | None = None,
+        tree_exclude: list[str] | None = None,
+    ):
+        # Use --output-format stream-json and save artifacts as they arrive
+        self.stream = stream
+        # Response cache shared by all agents (None disables caching)
+        self.cache = cache
+        # CLI executable (e.g. fake_claude.py for offline benchmarking)
+        self.claude_bin = claude_bin or os.environ.get("TASK_PIPELINE_CLAUDE_BIN", "claude")
+        # Adaptive timeouts and retries (None: fixed TIMEOUT_SECONDS, no retries)
+        self.policy = policy
+        # Machine-wide CLI concurrency / rate limits (None: unlimited)
+        self.limiter = limiter
+        # Warm vitest servers for RED/GREEN verification (None: npx vitest run)
+        self.test_servers = test_servers
+        # Results of unchanged verification test files (None: always run)
+        self.test_cache = test_cache
+        # Paths under the project root written by the pipeline itself (task
+        # directories), left out of the tree hashes that key the caches
+        self.tree_exclude = tree_exclude or []
 
 
 class BaseAgent(ABC):
@@ -64,14 +81,33 @@ class BaseAgent(ABC):
     # Timeout for CLI execution (10 minutes default)
     TIMEOUT_SECONDS: int = 600
 
+    # Role of the agent in the pipeline; durations for adaptive timeouts are
+    # kept per role, agent file and model (agents share agent files)
+    POLICY_KEY: str = ""
+
+    # Whether responses may be served from the response cache. Agents whose
+    # work is side effects on the project tree (Executor) must disable this.
+    CACHEABLE: bool = True
+
+    # Subdirectory of artifact_dir for CLI and test output logs
+    LOG_DIR: str = "logs"
+
+    # Record of a running invocation, kept in artifact_dir until it finishes
+    INFLIGHT_FILE: str = "inflight.json"
+
+    # Per-test records of the agent's verification run, in artifact_dir
+    TEST_RESULTS_FILE: str = "test-results.json"
+
     def __init__(
         self,
         artifact_dir: Path | str,
         project_root: Path | str,
         model_override: str | None = None,
+        options: AgentOptions | None = None,
     ):
         self.artifact_dir = Path(artifact_dir)
         self.project_root = Path(project_root).resolve()
+        self.options = options or AgentOptions()
 
         # Load agent config from .claude/agents/
         self.config = self._load_agent_config()
@@ -80,18 +116,405 @@ class BaseAgent(ABC):
         self.model = model_override or self.config.model
         self.artifacts: dict[str, str] = {}
 
+        # Per-run timeout, derived from history when a run policy is set
+        if self.options.policy is not None:
+            self.timeout_seconds = self.options.policy.timeout_for(
+                self.policy_key, self.model, self.TIMEOUT_SECONDS
+            )
+        else:
+            self.timeout_seconds = self.TIMEOUT_SECONDS
+
+        # CLI processes started by this agent (numbers their logs)
+        self._cli_attempts = 0
+
+        # Metrics of the last finished CLI invocation (see _finish_run)
+        self.last_metrics: dict[str, Any] | None = None
+
+        # CLI session to continue (see resume_from) and the id of the
+        # session used by the last run
+        self.resume_session: str | None = None
+        self.fork_session = False
+        self.session_id: str | None = None
+
+        # Session id assigned up front (--session-id) so an interrupted run
+        # can be resumed before the CLI has reported anything
+        self.new_session_id: str | None = None
+        self._inflight: dict[str, Any] | None = None
+
+    def resume_from(self, session_id: str, fork: bool = False) -> None:
+        """Continue an existing CLI session instead of starting fresh.
+
+        Args:
+            session_id: Session id from an earlier agent run
+            fork: Start a new session branched from it (--fork-session)
+                  instead of appending to the original
+        """
+        self.resume_session = session_id
+        self.fork_session = fork
+
+    @property
+    def policy_key(self) -> str:
+        """Duration-history key for this agent (without the model), e.g. "executor/dx-engineer"."""
+        return f"{self.POLICY_KEY or type(self).__name__}/{self.AGENT_FILE}"
+
     def _load_agent_config(self) -> AgentConfig:
-        """Load agent config from .claude/agents/ directory."""
+        """Load agent config from .claude/agents/ (parsed once per process)."""
         if not self.AGENT_FILE:
             raise ValueError("AGENT_FILE must be set in subclass")
 
-        agents_dir = self.project_root / ".claude" / "agents"
-        agent_path = agents_dir / f"{self.AGENT_FILE}.md"
+        return AgentRegistry.for_project(self.project_root).get(self.AGENT_FILE)
 
-        if not agent_path.exists():
-            raise FileNotFoundError(f"Agent definition not found: {agent_path}")
+    def _build_command(self, input_context: str) -> list[str]:
+        """Build the Claude CLI command line for a single invocation."""
+        cmd = [
+            self.options.claude_bin,
+            "--print",
+            "--agent", self.AGENT_FILE,
+            "--model", self.model,
+        ]
+        if self.options.stream:
+            # stream-json requires --verbose in --print mode
+            cmd += ["--output-format", "stream-json", "--verbose"]
+        else:
+            cmd += ["--output-format", "json"]
+        if self.resume_session:
+            cmd += ["--resume", self.resume_session]
+            if self.fork_session:
+                cmd.append("--fork-session")
+        if self.new_session_id:
+            cmd += ["--session-id", self.new_session_id]
+        cmd += [
+            "--permission-mode", "bypassPermissions",
+            input_context
+        ]
+        return cmd
 
-        return AgentConfig.from_file(agent_path)
+    def _process_output(self, returncode: int, stdout: str, stderr: str) -> dict[str, Any]:
+        """Turn a finished CLI process into the agent result dict."""
+        if returncode != 0:
+            self.log(f"CLI error (exit {returncode}): {stderr}")
+            return {
+                "status": "error",
+                "exit_code": returncode,
+                "error": stderr,
+                "output": stdout,
+                "artifacts": self.artifacts
+            }
+
+        # Parse JSON output
+        metrics = {}
+        try:
+            output_data = json.loads(stdout)
+            output_text = output_data.get("result", stdout)
+            metrics = extract_usage(output_data)
+            self.session_id = output_data.get("session_id")
+        except json.JSONDecodeError:
+            # If not JSON, use raw output
+            output_text = stdout
+
+        # Extract artifacts from output
+        self._extract_artifacts(output_text)
+
+        self.log("Complete")
+        return {
+            "status": "complete",
+            "output": output_text,
+            "artifacts": self.artifacts,
+            "metrics": metrics,
+            "session_id": self.session_id
+        }
+
+    def _process_stream_output(
+        self, returncode: int, consumer: StreamJsonConsumer, stderr: str
+    ) -> dict[str, Any]:
+        """Turn a finished stream-json CLI process into the agent result dict.
+
+        Artifacts were already collected while streaming; the final result
+        text is still passed to _extract_artifacts() for fallbacks and limits.
+        """
+        result_event = consumer.result_event or {}
+        output_text = result_event.get("result", "")
+        metrics = extract_usage(result_event) if result_event else {}
+        self.session_id = consumer.session_id
+
+        if returncode != 0 or result_event.get("is_error"):
+            self.log(f"CLI error (exit {returncode}): {stderr}")
+            return {
+                "status": "error",
+                "exit_code": returncode,
+                "error": stderr or output_text,
+                "output": output_text,
+                "artifacts": self.artifacts,
+                "metrics": metrics
+            }
+
+        self._extract_artifacts(output_text)
+
+        self.log("Complete")
+        return {
+            "status": "complete",
+            "output": output_text,
+            "artifacts": self.artifacts,
+            "metrics": metrics,
+            "session_id": self.session_id
+        }
+
+    def _on_streamed_artifact(self, name: str, content: str) -> None:
+        """Record and immediately persist an artifact parsed from the stream."""
+        self.add_artifact(name, content)
+        self._write_artifact(name, content)
+        self.log(f"Streamed artifact: {name}")
+
+        if self._inflight is not None and name not in self._inflight["artifacts"]:
+            self._inflight["artifacts"].append(name)
+            self._write_inflight()
+
+    def _resume_inflight(self, input_context: str) -> str:
+        """Pick up an invocation that was interrupted by a timeout or crash.
+
+        If artifact_dir holds an in-flight record for the same agent and
+        input, continue its CLI session with a short continuation prompt
+        and reload the artifacts it already streamed to disk.
+
+        Returns:
+            The input context to send (the original one if nothing to resume)
+        """
+        input_sha = hashlib.sha256(input_context.encode()).hexdigest()
+        self._inflight = {
+            "agent": self.AGENT_FILE,
+            "model": self.model,
+            "input_sha256": input_sha,
+            "artifacts": [],
+        }
+
+        path = self.artifact_dir / self.INFLIGHT_FILE
+        try:
+            record = json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return input_context
+
+        if (
+            self.resume_session
+            or not record.get("session_id")
+            or record.get("agent") != self.AGENT_FILE
+            or record.get("input_sha256") != input_sha
+        ):
+            return input_context
+
+        session_id = record["session_id"]
+        self.log(f"Resuming interrupted session {session_id}")
+        self.resume_from(session_id)
+
+        saved = []
+        for name in record.get("artifacts", []):
+            artifact_path = self.artifact_dir / name
+            if artifact_path.exists():
+                self.artifacts[name] = artifact_path.read_text()
+                saved.append(name)
+        self._inflight["artifacts"] = saved
+        self._inflight["resumed_at"] = datetime.now().isoformat()
+
+        saved_list = "\n".join(f"- {name}" for name in saved) or "- (none)"
+        return f"""Your previous run of this task was interrupted before it finished.
+
+Artifacts already saved:
+{saved_list}
+
+Continue from where you stopped. Do not redo finished work. Output every
+remaining artifact (and any that were cut off) using <artifact> tags.
+"""
+
+    def _begin_inflight(self) -> None:
+        """Write the in-flight record before the CLI process starts."""
+        if self.resume_session and not self.fork_session:
+            self.new_session_id = None
+            session_id = self.resume_session
+        else:
+            self.new_session_id = str(uuid.uuid4())
+            session_id = self.new_session_id
+
+        self._inflight["session_id"] = session_id
+        self._inflight["started_at"] = datetime.now().isoformat()
+        self._write_inflight()
+
+    def _write_inflight(self) -> None:
+        """Persist the in-flight record (small file, rewritten atomically)."""
+        if self._inflight is None:
+            return
+        self.artifact_dir.mkdir(parents=True, exist_ok=True)
+        path = self.artifact_dir / self.INFLIGHT_FILE
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._inflight, indent=2))
+        tmp_path.replace(path)
+
+    def _end_inflight(self, result: dict[str, Any]) -> None:
+        """Drop the in-flight record unless the run can still be resumed.
+
+        Timeouts keep it, so the next attempt continues the same session.
+        """
+        if result.get("status") == "timeout":
+            return
+        self._inflight = None
+        (self.artifact_dir / self.INFLIGHT_FILE).unlink(missing_ok=True)
+
+    def _cache_key(self, input_context: str) -> str | None:
+        """Compute the response cache key, or None if caching doesn't apply."""
+        if self.options.cache is None or not self.CACHEABLE or self.resume_session:
+            return None
+
+        tree_hash = project_tree_hash(self.project_root, self.options.tree_exclude)
+        if tree_hash is None:
+            return None
+
+        return ResponseCache.make_key(
+            f"{self.options.claude_bin}:{type(self).__name__}:{self.AGENT_FILE}",
+            self.config.prompt,
+            self.model,
+            input_context,
+            tree_hash,
+        )
+
+    def _load_cached(self, cache_key: str | None) -> dict[str, Any] | None:
+        """Return a result rebuilt from the response cache, if present."""
+        if cache_key is None:
+            return None
+
+        entry = self.options.cache.get(cache_key)
+        if entry is None:
+            return None
+
+        self.log(f"Cache hit ({cache_key[:12]})")
+        self.artifacts.update(entry.get("artifacts", {}))
+        # The agent did not run, so nothing it would have written exists yet
+        # (the TDD agent's RED verification runs the tests from disk)
+        for name, content in entry.get("artifacts", {}).items():
+            self._write_artifact(name, content)
+        return {
+            "status": "complete",
+            "output": entry.get("output", ""),
+            "artifacts": self.artifacts,
+            "cached": True
+        }
+
+    def _store_cached(self, cache_key: str | None, result: dict[str, Any]) -> None:
+        """Store a completed result in the response cache."""
+        if cache_key is None or result.get("status") != "complete":
+            return
+
+        self.options.cache.put(cache_key, {
+            "agent": self.AGENT_FILE,
+            "model": self.model,
+            "output": result.get("output", ""),
+            "artifacts": dict(self.artifacts),
+        })
+
+    def _retry_delay(self, result: dict[str, Any], retries: dict[str, int]) -> float | None:
+        """Ask the run policy whether (and when) to retry this attempt."""
+        policy = self.options.policy
+        status = result.get("status")
+        if policy is None or status not in retries:
+            return None
+        group = active_process_group()
+        if group is not None and group.cancelled:
+            return None  # the pipeline is giving up; never back off and retry
+
+        delay = policy.retry_delay(result, retries[status])
+        if delay is None:
+            return None
+
+        retries[status] += 1
+        if status == "timeout":
+            self.log(f"Retrying after timeout, continuing the session (retry {retries[status]})")
+        else:
+            self.log(f"Transient CLI failure, retrying in {delay:.0f}s (retry {retries[status]})")
+        return delay
+
+    @staticmethod
+    async def _in_thread(func: Any, *args: Any) -> Any:
+        """asyncio.to_thread() that, when cancelled, waits for the thread to exit.
+
+        The thread itself cannot be interrupted, but its child processes can
+        (ProcessGroup.terminate), after which it returns quickly. Callers can
+        then clean up what it was working on once the cancellation completes.
+        """
+        future = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            with contextlib.suppress(Exception):
+                await future
+            raise
+
+    def _finish_run(
+        self,
+        result: dict[str, Any],
+        started: float,
+        timings: dict[str, float],
+        retries: dict[str, int],
+    ) -> None:
+        """Add timings to result["metrics"], salvage state and duration history.
+
+        wall_ms covers the whole invocation (all attempts) as seen by the
+        pipeline; queue_wait_ms is the part spent waiting for the CLI limiter
+        and cli_overhead_ms the rest the CLI itself did not report (process
+        startup, auth, shutdown).
+        """
+        wall_seconds = time.monotonic() - started
+        metrics = result.setdefault("metrics", {})
+        metrics["wall_ms"] = round(wall_seconds * 1000)
+        metrics["spawn_ms"] = round(timings.get("spawn_ms", 0.0), 1)
+        metrics["queue_wait_ms"] = round(timings.get("queue_wait_ms", 0.0))
+        if metrics.get("duration_ms"):
+            metrics["cli_overhead_ms"] = max(
+                0, metrics["wall_ms"] - metrics["queue_wait_ms"] - metrics["duration_ms"]
+            )
+        self.last_metrics = metrics
+        metrics["model"] = self.model
+        metrics["status"] = result.get("status", "unknown")
+        metrics["timeout_seconds"] = self.timeout_seconds
+        metrics["retries"] = sum(retries.values())
+        if self.resume_session:
+            metrics["resumed_session"] = self.resume_session
+        if result.get("cached"):
+            metrics["cached"] = True
+
+        if result.get("status") == "timeout":
+            # Keep whatever was streamed before the deadline
+            result["salvaged"] = bool(self.artifacts)
+            if self.artifacts:
+                self.log(f"Salvaged {len(self.artifacts)} artifact(s) produced before the timeout")
+        elif (
+            result.get("status") == "complete"
+            and not result.get("cached")
+            and not self.resume_session
+            and not metrics["retries"]
+            and self.options.policy is not None
+        ):
+            self.options.policy.record_duration(self.policy_key, self.model, wall_seconds)
+
+    def _record_queue_wait(self, slot: CLISlot, timings: dict[str, float]) -> None:
+        """Note how long the CLI limiter held this attempt back."""
+        timings["queue_wait_ms"] = slot.wait_ms
+        if slot.wait_ms >= 1000:
+            self.log(f"Waited {slot.wait_ms / 1000:.1f}s for a CLI slot")
+
+    def _timeout_result(self) -> dict[str, Any]:
+        """Result dict for a CLI run that exceeded TIMEOUT_SECONDS."""
+        self.log(f"Timeout after {self.timeout_seconds}s")
+        return {
+            "status": "timeout",
+            "error": f"Execution timed out after {self.timeout_seconds} seconds",
+            "artifacts": self.artifacts
+        }
+
+    def _cli_not_found_result(self) -> dict[str, Any]:
+        """Result dict for when the claude executable is missing."""
+        self.log(f"Error: '{self.options.claude_bin}' CLI not found")
+        return {
+            "status": "error",
+            "error": f"Claude CLI not found ({self.options.claude_bin}). Install with: npm install -g @anthropic-ai/claude-code",
+            "artifacts": self.artifacts
+        }
 
     def run(self, input_context: str) -> dict[str, Any]:
         """Run the agent with the given input context using Claude CLI.
@@ -103,69 +526,208 @@ class BaseAgent(ABC):
         """
         self.log("Starting...")
 
-        # Build CLI command
-        cmd = [
-            "claude",
-            "--print",
-            "--agent", self.AGENT_FILE,
-            "--model", self.model,
-            "--output-format", "json",
-            "--permission-mode", "bypassPermissions",
-            input_context
-        ]
+        started = time.monotonic()
+        retries = {"timeout": 0, "error": 0}
+        queue_wait_ms = 0.0
+        while True:
+            timings: dict[str, float] = {}
+            result = self._run_attempt(input_context, timings)
+            queue_wait_ms += timings.get("queue_wait_ms", 0.0)
+
+            delay = self._retry_delay(result, retries)
+            if delay is None:
+                break
+            time.sleep(delay)
+
+        timings["queue_wait_ms"] = queue_wait_ms
+        self._finish_run(result, started, timings, retries)
+        return result
+
+    def _run_attempt(self, input_context: str, timings: dict[str, float]) -> dict[str, Any]:
+        """One CLI invocation (or cache hit), resuming an in-flight session."""
+        input_context = self._resume_inflight(input_context)
+        cache_key = self._cache_key(input_context)
+        result = self._load_cached(cache_key)
+        if result is not None:
+            return result
+
+        slot = None
+        if self.options.limiter is not None:
+            slot = self.options.limiter.acquire()
+            self._record_queue_wait(slot, timings)
+
+        try:
+            self._begin_inflight()
+            cmd = self._build_command(input_context)
+            self.log(
+                f"Running: {self.options.claude_bin} --print --agent {self.AGENT_FILE} "
+                f"--model {self.model} (timeout {self.timeout_seconds}s)"
+            )
 
-        self.log(f"Running: claude --print --agent {self.AGENT_FILE} --model {self.model}")
+            if self.options.stream:
+                result = self._run_streaming(cmd, timings)
+            else:
+                result = self._run_json(cmd, timings)
+        finally:
+            if slot is not None:
+                slot.release()
 
+        self._end_inflight(result)
+        self._store_cached(cache_key, result)
+        return result
+
+    def _cli_logs(self) -> dict[str, Path]:
+        """Log files receiving the CLI's stdout/stderr for the next CLI process.
+
+        Retries get numbered logs (cli-stdout.2.log, ...) so the output of
+        the attempt that failed is kept.
+        """
+        self._cli_attempts += 1
+        suffix = ".log" if self._cli_attempts == 1 else f".{self._cli_attempts}.log"
+        log_dir = self.artifact_dir / self.LOG_DIR
+        return {
+            "log_path": log_dir / f"cli-stdout{suffix}",
+            "stderr_log_path": log_dir / f"cli-stderr{suffix}",
+        }
+
+    def _run_json(self, cmd: list[str], timings: dict[str, float]) -> dict[str, Any]:
+        """Run the CLI with --output-format json and wait for the envelope."""
         try:
-            result = subprocess.run(
+            proc = run_process(
                 cmd,
-                capture_output=True,
-                text=True,
-                timeout=self.TIMEOUT_SECONDS,
-                cwd=str(self.project_root)
+                cwd=self.project_root,
+                timeout=self.timeout_seconds,
+                **self._cli_logs()
             )
+        except FileNotFoundError:
+            return self._cli_not_found_result()
+        return self._process_json_result(proc, timings)
 
-            if result.returncode != 0:
-                self.log(f"CLI error (exit {result.returncode}): {result.stderr}")
-                return {
-                    "status": "error",
-                    "error": result.stderr,
-                    "output": result.stdout,
-                    "artifacts": self.artifacts
-                }
-
-            # Parse JSON output
-            try:
-                output_data = json.loads(result.stdout)
-                output_text = output_data.get("result", result.stdout)
-            except json.JSONDecodeError:
-                # If not JSON, use raw output
-                output_text = result.stdout
-
-            # Extract artifacts from output
-            self._extract_artifacts(output_text)
-
-            self.log("Complete")
-            return {
-                "status": "complete",
-                "output": output_text,
-                "artifacts": self.artifacts
-            }
+    def _run_streaming(self, cmd: list[str], timings: dict[str, float]) -> dict[str, Any]:
+        """Run the CLI in stream-json mode, saving artifacts as they complete.
 
-        except subprocess.TimeoutExpired:
-            self.log(f"Timeout after {self.TIMEOUT_SECONDS}s")
-            return {
-                "status": "timeout",
-                "error": f"Execution timed out after {self.TIMEOUT_SECONDS} seconds",
-                "artifacts": self.artifacts
-            }
+        On timeout the artifacts streamed so far are kept.
+        """
+        consumer = StreamJsonConsumer(self._on_streamed_artifact)
+        try:
+            proc = run_process(
+                cmd,
+                cwd=self.project_root,
+                timeout=self.timeout_seconds,
+                on_stdout_line=consumer.feed_line,
+                **self._cli_logs()
+            )
         except FileNotFoundError:
-            self.log("Error: 'claude' CLI not found")
-            return {
-                "status": "error",
-                "error": "Claude CLI not found. Install with: npm install -g @anthropic-ai/claude-code",
-                "artifacts": self.artifacts
-            }
+            return self._cli_not_found_result()
+        return self._process_stream_result(proc, consumer, timings)
+
+    def _process_json_result(self, proc: ProcessResult, timings: dict[str, float]) -> dict[str, Any]:
+        """Turn a finished json-mode CLI process into a result dict."""
+        timings["spawn_ms"] = proc.spawn_ms
+        if proc.timed_out:
+            return self._timeout_result()
+        # Only a successful run needs the full envelope; errors use the tail
+        stdout = proc.read_stdout() if proc.returncode == 0 else proc.stdout_tail
+        return self._process_output(proc.returncode, stdout, proc.stderr_tail)
+
+    def _process_stream_result(
+        self,
+        proc: ProcessResult,
+        consumer: StreamJsonConsumer,
+        timings: dict[str, float],
+    ) -> dict[str, Any]:
+        """Turn a finished stream-json CLI process into a result dict."""
+        timings["spawn_ms"] = proc.spawn_ms
+        if proc.timed_out:
+            return self._timeout_result()
+        return self._process_stream_output(proc.returncode, consumer, proc.stderr_tail)
+
+    async def arun(self, input_context: str) -> dict[str, Any]:
+        """Async variant of run() built on asyncio subprocesses.
+
+        Does not block the event loop while the CLI works, so several
+        agents can run at once (see AgentPool). Cancelling the awaiting
+        task kills the CLI process.
+        """
+        self.log("Starting...")
+
+        started = time.monotonic()
+        retries = {"timeout": 0, "error": 0}
+        queue_wait_ms = 0.0
+        while True:
+            timings: dict[str, float] = {}
+            result = await self._arun_attempt(input_context, timings)
+            queue_wait_ms += timings.get("queue_wait_ms", 0.0)
+
+            delay = self._retry_delay(result, retries)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+
+        timings["queue_wait_ms"] = queue_wait_ms
+        self._finish_run(result, started, timings, retries)
+        return result
+
+    async def _arun_attempt(self, input_context: str, timings: dict[str, float]) -> dict[str, Any]:
+        """Async variant of _run_attempt()."""
+        input_context = self._resume_inflight(input_context)
+        cache_key = await asyncio.to_thread(self._cache_key, input_context)
+        result = self._load_cached(cache_key)
+        if result is not None:
+            return result
+
+        slot = None
+        if self.options.limiter is not None:
+            slot = await self.options.limiter.aacquire()
+            self._record_queue_wait(slot, timings)
+
+        try:
+            self._begin_inflight()
+            cmd = self._build_command(input_context)
+            self.log(
+                f"Running (async): {self.options.claude_bin} --print --agent {self.AGENT_FILE} "
+                f"--model {self.model} (timeout {self.timeout_seconds}s)"
+            )
+
+            if self.options.stream:
+                result = await self._arun_streaming(cmd, timings)
+            else:
+                result = await self._arun_json(cmd, timings)
+        finally:
+            if slot is not None:
+                slot.release()
+
+        self._end_inflight(result)
+        self._store_cached(cache_key, result)
+        return result
+
+    async def _arun_json(self, cmd: list[str], timings: dict[str, float]) -> dict[str, Any]:
+        """Async variant of _run_json()."""
+        try:
+            proc = await arun_process(
+                cmd,
+                cwd=self.project_root,
+                timeout=self.timeout_seconds,
+                **self._cli_logs()
+            )
+        except FileNotFoundError:
+            return self._cli_not_found_result()
+        return self._process_json_result(proc, timings)
+
+    async def _arun_streaming(self, cmd: list[str], timings: dict[str, float]) -> dict[str, Any]:
+        """Async variant of _run_streaming()."""
+        consumer = StreamJsonConsumer(self._on_streamed_artifact)
+        try:
+            proc = await arun_process(
+                cmd,
+                cwd=self.project_root,
+                timeout=self.timeout_seconds,
+                on_stdout_line=consumer.feed_line,
+                **self._cli_logs()
+            )
+        except FileNotFoundError:
+            return self._cli_not_found_result()
+        return self._process_stream_result(proc, consumer, timings)
 
     @abstractmethod
     def _extract_artifacts(self, output: str) -> None:
@@ -178,14 +740,18 @@ class BaseAgent(ABC):
 
     def save_artifacts(self) -> None:
         """Save all artifacts to the artifact directory."""
-        self.artifact_dir.mkdir(parents=True, exist_ok=True)
         for name, content in self.artifacts.items():
-            artifact_path = self.artifact_dir / name
-            # Create parent directories for nested artifact paths (e.g., "tests/unit/foo.sh")
-            artifact_path.parent.mkdir(parents=True, exist_ok=True)
-            artifact_path.write_text(content)
+            artifact_path = self._write_artifact(name, content)
             print(f"  Saved: {artifact_path}")
 
+    def _write_artifact(self, name: str, content: str) -> Path:
+        """Write a single artifact file and return its path."""
+        artifact_path = self.artifact_dir / name
+        # Create parent directories for nested artifact paths (e.g., "tests/unit/foo.sh")
+        artifact_path.parent.mkdir(parents=True, exist_ok=True)
+        artifact_path.write_text(content)
+        return artifact_path
+
     def add_artifact(self, name: str, content: str) -> None:
         """Add an artifact to be saved later."""
         self.artifacts[name] = content
@@ -0,0 +1,266 @@
+"""Content-addressed on-disk cache for agent responses.
+
+Re-running a task after a crash or a prompt tweak would otherwise pay again
+for identical Architect/Planner/TDD calls that take minutes each. Entries
+are keyed by everything that determines the agent's answer: the agent
+definition, model, input context and the state of the project tree.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Iterable
+
+
+def default_cache_root() -> Path:
+    """Root directory for task-pipeline caches (honors XDG_CACHE_HOME)."""
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "task-pipeline"
+
+
+def project_tree_hash(
+    project_root: Path, exclude: Iterable[str] = (), contents: bool = False
+) -> str | None:
+    """Hash the current state of a git working tree.
+
+    Combines the HEAD tree id, the diff of tracked files against HEAD and
+    the size/mtime (or, with contents, the content) of untracked files.
+    Returns None if project_root is not a git repository (responses are
+    then not cached).
+
+    Args:
+        project_root: Root of the working tree
+        exclude: Paths (relative to project_root) left out of the diff and
+                 the untracked files - the pipeline's own outputs, such as
+                 the tasks directory, which change on every run
+        contents: Hash untracked files' content instead of size/mtime
+    """
+    def git(*args: str) -> bytes:
+        return subprocess.run(
+            ["git", *args],
+            capture_output=True,
+            check=True,
+            cwd=str(project_root)
+        ).stdout
+
+    exclude = list(exclude)
+    pathspec = ["--", ".", *(f":(exclude){path}" for path in exclude)] if exclude else []
+    try:
+        digest = hashlib.sha256(git("rev-parse", "HEAD^{tree}"))
+        digest.update(git("diff", "HEAD", "--binary", *pathspec))
+        untracked = git("ls-files", "--others", "--exclude-standard", "-z", *pathspec)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+    for name in sorted(filter(None, untracked.split(b"\0"))):
+        path = project_root / os.fsdecode(name)
+        try:
+            if contents:
+                digest.update(name + b":" + hashlib.sha256(path.read_bytes()).digest() + b"\n")
+            else:
+                stat = path.stat()
+                digest.update(name + f":{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        except OSError:
+            continue
+
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Persistent response cache with size-based LRU eviction.
+
+    Each entry is one JSON file named after its key. Reads bump the file's
+    mtime, so eviction (oldest mtime first) approximates least-recently-used.
+    """
+
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+    def __init__(self, cache_dir: Path | str | None = None, max_bytes: int | None = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_root() / "responses"
+        self.max_bytes = max_bytes or self.DEFAULT_MAX_BYTES
+
+        # Counters for this process (reported in task.json)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(
+        agent_name: str,
+        prompt: str,
+        model: str,
+        input_context: str,
+        tree_hash: str,
+    ) -> str:
+        """Build a cache key from everything that determines a response."""
+        digest = hashlib.sha256()
+        for part in (agent_name, prompt, model, input_context, tree_hash):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Return the cached entry for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: dict[str, Any]) -> None:
+        """Store an entry atomically, then evict old entries if over budget."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".tmp.{os.getpid()}")
+        tmp_path.write_text(json.dumps(entry))
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        """Delete least-recently-used entries until under max_bytes."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        """Counters for reporting."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _digest_path(digest: "hashlib._Hash", root: Path, relative: str) -> None:
+    """Feed a file's (or a directory's files') name and content into digest."""
+    path = root / relative
+    if path.is_dir():
+        for child in sorted(p for p in path.rglob("*") if p.is_file()):
+            _digest_path(digest, root, str(child.relative_to(root)))
+        return
+    digest.update(relative.encode() + b"\0")
+    try:
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    except OSError:
+        digest.update(b"missing")
+
+
+class TestResultCache(ResponseCache):
+    """Outcomes of verification test runs, keyed by the content of their inputs.
+
+    A test file's result is reused only by the same verification phase
+    (RED or GREEN) for the same test file, while the working tree, the test
+    directory and the package lockfile/test config are unchanged - typically
+    when a task is resumed after a failure and completed verifications
+    would otherwise run again. Entries hold one per-file record (see
+    tools/test_runner.py).
+    """
+
+    # Files (relative to the directory tests run in) that affect every test,
+    # hashed in addition to the tree in case they are git-ignored
+    CONFIG_FILES = (
+        "package.json",
+        "package-lock.json",
+        "pnpm-lock.yaml",
+        "yarn.lock",
+        "bun.lockb",
+        "tsconfig.json",
+        "vitest.config.ts",
+        "vitest.config.mts",
+        "vitest.config.js",
+        "vite.config.ts",
+        "vite.config.mts",
+        "vite.config.js",
+    )
+
+    def __init__(self, cache_dir: Path | str | None = None, max_bytes: int | None = None):
+        super().__init__(cache_dir or default_cache_root() / "test-results", max_bytes)
+
+    def inputs_digest(
+        self,
+        project_root: Path,
+        test_dir: Path,
+        config_dir: Path,
+        exclude: Iterable[str] = (),
+    ) -> str | None:
+        """Hash everything a verification run's outcome depends on.
+
+        Args:
+            project_root: Checkout the tests run against; its whole working
+                          tree (HEAD, tracked changes, untracked content) is
+                          hashed, not just the files a subtask declares
+            test_dir: Directory holding the test files and their helpers
+            config_dir: Directory holding the lockfile and test config
+            exclude: Paths left out of the tree hash (see project_tree_hash)
+
+        Returns:
+            The digest, or None if project_root is not a git repository
+            (results are then not cached)
+        """
+        tree_hash = project_tree_hash(project_root, exclude, contents=True)
+        if tree_hash is None:
+            return None
+        digest = hashlib.sha256(tree_hash.encode())
+        digest.update(b"\0tests\0")
+        if test_dir.is_dir():
+            _digest_path(digest, test_dir.parent, test_dir.name)
+        digest.update(b"\0config\0")
+        for name in self.CONFIG_FILES:
+            if (config_dir / name).exists():
+                _digest_path(digest, config_dir, name)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_test_key(phase: str, runner: str, test_file: Path, root: Path, inputs_digest: str) -> str:
+        """Key for one test file in a verification phase.
+
+        Args:
+            phase: "red" or "green" - results are never shared between phases
+            runner: "vitest" or "bash"
+            test_file: The test file (its content is part of the key)
+            root: test_file's path relative to this is part of the key
+                  (same-named files of different subtasks never collide)
+            inputs_digest: inputs_digest() of the run
+        """
+        name = str(test_file.relative_to(root)) if test_file.is_relative_to(root) else str(test_file)
+        digest = hashlib.sha256()
+        for part in (phase, runner, name, inputs_digest):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        try:
+            digest.update(test_file.read_bytes())
+        except OSError:
+            digest.update(b"missing")
+        return digest.hexdigest()
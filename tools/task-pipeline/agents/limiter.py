@@ -0,0 +1,172 @@
+"""Machine-wide limits on claude CLI processes.
+
+Pipelines started independently (cron, manual runs, the daemon) all spend
+the same subscription quota. Without coordination they overrun it and the
+resulting throttling surfaces as timeouts. CLILimiter coordinates every
+process on the machine through files in the task-pipeline cache directory:
+
+- Concurrency: N slot files, each held with an exclusive flock for as long
+  as one CLI process runs. The kernel drops the lock when its holder dies,
+  so a crashed pipeline never leaks a slot.
+- Rate: a token bucket (bucket.json, updated under an flock) refilled at
+  requests_per_minute / 60 tokens per second.
+
+Every process should be given the same limits (from_env() reads them from
+the environment): a process asking for fewer slots only competes for the
+first few slot files.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import time
+from pathlib import Path
+
+from agents.cache import default_cache_root
+
+
+class CLISlot:
+    """A granted CLI slot; release() (or leaving the with block) frees it."""
+
+    def __init__(self, fd: int | None, wait_ms: float):
+        self._fd = fd
+        # Time spent queueing for the slot and a rate token
+        self.wait_ms = wait_ms
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)  # drops the flock
+            self._fd = None
+
+    def __enter__(self) -> "CLISlot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class CLILimiter:
+    """Cross-process concurrency and requests-per-minute limits.
+
+    Usage:
+        limiter = CLILimiter(max_concurrent=4, requests_per_minute=30)
+        with limiter.acquire() as slot:          # or: await limiter.aacquire()
+            run_cli()
+        metrics["queue_wait_ms"] = slot.wait_ms
+    """
+
+    # Environment variables read by from_env()
+    SLOTS_ENV = "TASK_PIPELINE_CLI_SLOTS"
+    RPM_ENV = "TASK_PIPELINE_CLI_RPM"
+
+    # Seconds between attempts while every slot is taken
+    POLL_SECONDS = 0.25
+
+    # Bucket capacity in seconds of refill (allowed burst after idling)
+    BURST_SECONDS = 10
+
+    def __init__(
+        self,
+        max_concurrent: int | None = None,
+        requests_per_minute: float | None = None,
+        lock_dir: Path | str | None = None,
+    ):
+        """Initialize the limiter.
+
+        Args:
+            max_concurrent: CLI processes allowed at once on this machine
+                            (None: unlimited)
+            requests_per_minute: CLI starts allowed per minute (None: unlimited)
+            lock_dir: Where slot and bucket files live
+                      (default: <cache>/limiter)
+        """
+        if max_concurrent is not None and max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        if requests_per_minute is not None and requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute
+        self.lock_dir = Path(lock_dir) if lock_dir else default_cache_root() / "limiter"
+
+    @classmethod
+    def from_env(cls) -> "CLILimiter | None":
+        """Limiter configured by $TASK_PIPELINE_CLI_SLOTS / $TASK_PIPELINE_CLI_RPM, if set."""
+        slots = os.environ.get(cls.SLOTS_ENV)
+        rpm = os.environ.get(cls.RPM_ENV)
+        if not slots and not rpm:
+            return None
+        return cls(
+            max_concurrent=int(slots) if slots else None,
+            requests_per_minute=float(rpm) if rpm else None,
+        )
+
+    def _take_slot(self) -> int | None:
+        """Lock a free slot file; its fd, or None if all are taken."""
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(self.max_concurrent):
+            fd = os.open(self.lock_dir / f"slot-{i}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def _take_token(self) -> float:
+        """Take a rate token; 0 on success, else seconds until one is available."""
+        rate = self.requests_per_minute / 60
+        capacity = max(1.0, rate * self.BURST_SECONDS)
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        bucket_path = self.lock_dir / "bucket.json"
+
+        with open(self.lock_dir / "bucket.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            now = time.time()
+            try:
+                state = json.loads(bucket_path.read_text())
+                tokens = min(capacity, state["tokens"] + (now - state["updated"]) * rate)
+            except (OSError, ValueError, KeyError, TypeError):
+                tokens = capacity
+
+            delay = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                delay = (1 - tokens) / rate
+            bucket_path.write_text(json.dumps({"tokens": tokens, "updated": now}))
+        return delay
+
+    def acquire(self) -> CLISlot:
+        """Block until a slot and a rate token are available."""
+        started = time.monotonic()
+        fd = None
+        if self.max_concurrent:
+            while (fd := self._take_slot()) is None:
+                time.sleep(self.POLL_SECONDS)
+        try:
+            if self.requests_per_minute:
+                while (delay := self._take_token()) > 0:
+                    time.sleep(delay)
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            raise
+        return CLISlot(fd, (time.monotonic() - started) * 1000)
+
+    async def aacquire(self) -> CLISlot:
+        """Async variant of acquire() (polls without blocking the event loop)."""
+        started = time.monotonic()
+        fd = None
+        if self.max_concurrent:
+            while (fd := self._take_slot()) is None:
+                await asyncio.sleep(self.POLL_SECONDS)
+        try:
+            if self.requests_per_minute:
+                while (delay := self._take_token()) > 0:
+                    await asyncio.sleep(delay)
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            raise
+        return CLISlot(fd, (time.monotonic() - started) * 1000)
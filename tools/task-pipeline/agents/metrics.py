@@ -0,0 +1,175 @@
+"""Per-invocation token, cost and latency metrics for agent runs.
+
+The Claude CLI's JSON envelope (and the final stream-json `result` event)
+carries usage and timing fields; BaseAgent adds its own wall-clock and
+spawn timings. MetricsCollector aggregates them per agent and per phase
+so it is clear which agent or phase dominates pipeline latency and cost.
+
+Invocations are appended to metrics.jsonl, one line each, so several
+processes (e.g. workers on one task) add to the same record without
+overwriting each other. metrics.json is derived from it.
+"""
+
+import contextlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, ContextManager
+
+
+# Fields summed when aggregating
+SUMMED_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+    "cost_usd",
+    "duration_ms",
+    "duration_api_ms",
+    "num_turns",
+    "wall_ms",
+    "spawn_ms",
+    "cli_overhead_ms",
+    "retries",
+    "queue_wait_ms",
+)
+
+
+def extract_usage(envelope: dict[str, Any]) -> dict[str, Any]:
+    """Pull usage/timing fields out of a CLI result envelope."""
+    usage = envelope.get("usage") or {}
+    metrics = {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "cache_creation_input_tokens": usage.get("cache_creation_input_tokens", 0),
+        "cache_read_input_tokens": usage.get("cache_read_input_tokens", 0),
+        "cost_usd": envelope.get("total_cost_usd", envelope.get("cost_usd", 0.0)),
+        "duration_ms": envelope.get("duration_ms", 0),
+        "duration_api_ms": envelope.get("duration_api_ms", 0),
+        "num_turns": envelope.get("num_turns", 0),
+    }
+    if envelope.get("session_id"):
+        metrics["session_id"] = envelope["session_id"]
+    return metrics
+
+
+class MetricsCollector:
+    """Collects per-invocation metrics for one task and aggregates them.
+
+    Each invocation is appended to metrics.jsonl in the task directory while
+    `lock` is held; write() derives metrics.json (the raw invocation records
+    of every process plus totals by agent and by phase) from that log.
+
+    Usage:
+        metrics = MetricsCollector(task_dir, lock=journal.locked)
+        metrics.record("architect", "architect:opus", result["metrics"])
+        metrics.write()   # atomically replaces metrics.json
+    """
+
+    LOG_FILE = "metrics.jsonl"
+    SUMMARY_FILE = "metrics.json"
+
+    def __init__(self, task_dir: Path | str, lock: Callable[[], ContextManager] | None = None):
+        self.task_dir = Path(task_dir)
+        self.log_path = self.task_dir / self.LOG_FILE
+        self.summary_path = self.task_dir / self.SUMMARY_FILE
+        self._lock = lock or contextlib.nullcontext
+        # Invocations recorded by this process
+        self.invocations: list[dict[str, Any]] = []
+
+    def record(self, phase: str, agent: str, metrics: dict[str, Any] | None) -> None:
+        """Record one agent invocation (no-op if there are no metrics)."""
+        if not metrics:
+            return
+        record = {"phase": phase, "agent": agent, **metrics}
+        self.invocations.append(record)
+        with self._lock():
+            self._import_summary()
+            self._append([record])
+
+    def _append(self, records: list[dict[str, Any]]) -> None:
+        self.task_dir.mkdir(parents=True, exist_ok=True)
+        data = "".join(json.dumps(r) + "\n" for r in records).encode()
+        # One write() to an O_APPEND descriptor
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _import_summary(self) -> None:
+        """Seed the log from a metrics.json written before metrics.jsonl existed."""
+        if self.log_path.exists() or not self.summary_path.exists():
+            return
+        try:
+            records = json.loads(self.summary_path.read_text()).get("invocations", [])
+        except json.JSONDecodeError:
+            return
+        if records:
+            self._append(records)
+
+    def _read_log(self) -> list[dict[str, Any]]:
+        """Every recorded invocation; a torn line (crash mid-append) is skipped."""
+        try:
+            lines = self.log_path.read_bytes().splitlines()
+        except FileNotFoundError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records
+
+    def all_invocations(self) -> list[dict[str, Any]]:
+        """Invocations recorded by every process for this task."""
+        with self._lock():
+            self._import_summary()
+            return self._read_log()
+
+    @staticmethod
+    def _aggregate(records: list[dict[str, Any]]) -> dict[str, Any]:
+        totals: dict[str, Any] = {field: 0 for field in SUMMED_FIELDS}
+        for record in records:
+            for field in SUMMED_FIELDS:
+                totals[field] += record.get(field) or 0
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        totals["spawn_ms"] = round(totals["spawn_ms"], 1)
+        totals["invocations"] = len(records)
+        totals["cache_hits"] = sum(1 for r in records if r.get("cached"))
+        return totals
+
+    def summary(self, records: list[dict[str, Any]] | None = None) -> dict[str, Any]:
+        """Totals overall, by agent and by phase (default: every process's invocations)."""
+        if records is None:
+            records = self.all_invocations()
+        by_agent: dict[str, list] = {}
+        by_phase: dict[str, list] = {}
+        for record in records:
+            by_agent.setdefault(record["agent"], []).append(record)
+            by_phase.setdefault(record["phase"], []).append(record)
+
+        return {
+            "totals": self._aggregate(records),
+            "by_agent": {name: self._aggregate(r) for name, r in by_agent.items()},
+            "by_phase": {name: self._aggregate(r) for name, r in by_phase.items()},
+        }
+
+    def write(self) -> dict[str, Any]:
+        """Derive metrics.json from the log (atomically replaced).
+
+        Returns:
+            The summary written
+        """
+        with self._lock():
+            self._import_summary()
+            records = self._read_log()
+            summary = self.summary(records)
+            tmp = self.summary_path.with_name(f".{self.SUMMARY_FILE}.{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump({"summary": summary, "invocations": records}, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.summary_path)
+        return summary
@@ -7,7 +7,7 @@ import re
 from pathlib import Path
 from typing import Any
 
-from agents.base import BaseAgent
+from agents.base import AgentOptions, BaseAgent
 
 
 class PlannerAgent(BaseAgent):
@@ -29,10 +29,16 @@ class PlannerAgent(BaseAgent):
     """
 
     AGENT_FILE = "architect"  # Reuses architect.md
-
-    def __init__(self, artifact_dir: Path | str, project_root: Path | str):
+    POLICY_KEY = "planner"
+
+    def __init__(
+        self,
+        artifact_dir: Path | str,
+        project_root: Path | str,
+        options: AgentOptions | None = None,
+    ):
         # Use sonnet instead of opus for planning (faster, cheaper)
-        super().__init__(artifact_dir, project_root, model_override="sonnet")
+        super().__init__(artifact_dir, project_root, model_override="sonnet", options=options)
 
     def _extract_artifacts(self, output: str) -> None:
         """Extract artifacts from <artifact> tags in output."""
@@ -46,16 +52,9 @@ class PlannerAgent(BaseAgent):
         if not self.artifacts:
             self.add_artifact("plan.md", output)
 
-    def run(self, architect_analysis: str) -> dict[str, Any]:
-        """Run the planner agent on the architect's analysis.
-
-        Args:
-            architect_analysis: The analysis.md content from architect phase
-
-        Returns:
-            Dict with status, output text, and artifacts dict
-        """
-        input_context = f"""# Architect Analysis to Plan
+    def _build_input(self, architect_analysis: str) -> str:
+        """Format the architect's analysis into the planner prompt."""
+        return f"""# Architect Analysis to Plan
 
 {architect_analysis}
 
@@ -105,6 +104,21 @@ Each subtask in the JSON MUST have:
 DO NOT write exhaustive documentation. Point to existing code instead.
 """
 
-        result = super().run(input_context)
+    def run(self, architect_analysis: str) -> dict[str, Any]:
+        """Run the planner agent on the architect's analysis.
+
+        Args:
+            architect_analysis: The analysis.md content from architect phase
+
+        Returns:
+            Dict with status, output text, and artifacts dict
+        """
+        result = super().run(self._build_input(architect_analysis))
+        self.log(f"Artifacts produced: {list(result['artifacts'].keys())}")
+        return result
+
+    async def arun(self, architect_analysis: str) -> dict[str, Any]:
+        """Async variant of run()."""
+        result = await super().arun(self._build_input(architect_analysis))
         self.log(f"Artifacts produced: {list(result['artifacts'].keys())}")
         return result
@@ -0,0 +1,155 @@
+"""Timeout and retry policy for agent invocations.
+
+A fixed 10 minute timeout is wrong for most agents: the Planner usually
+finishes in a fraction of it, while a slow Architect call can burn all of
+it and produce nothing. RunPolicy derives per-agent/per-model timeouts
+from recorded durations, retries transient CLI failures with exponential
+backoff, and lets a timed-out run continue its session once.
+"""
+
+import json
+import os
+import random
+import re
+import signal
+from pathlib import Path
+from typing import Any
+
+from agents.cache import default_cache_root
+
+
+class RunPolicy:
+    """Adaptive timeouts and retry decisions for BaseAgent runs.
+
+    Durations of successful runs are kept per "agent:model" in a small
+    JSON history file shared by all pipelines on the machine. The agent key
+    names the agent's role as well as its definition file (see
+    BaseAgent.policy_key): TDD and Executor runs share tdd-developer.md but
+    take very different times.
+    """
+
+    # Timeout bounds (seconds)
+    MIN_TIMEOUT_SECONDS = 120
+    MAX_TIMEOUT_SECONDS = 1800
+
+    # Timeout = p95 of recent durations * multiplier (needs MIN_SAMPLES)
+    TIMEOUT_MULTIPLIER = 2.0
+    MIN_SAMPLES = 3
+    MAX_SAMPLES = 50
+
+    # Exponential backoff for transient failures (seconds)
+    BACKOFF_BASE_SECONDS = 10.0
+    BACKOFF_MAX_SECONDS = 120.0
+
+    # stderr/error fragments that indicate a transient failure
+    TRANSIENT_PATTERNS = (
+        "rate limit",
+        "rate_limit",
+        "overloaded",
+        "econnreset",
+        "etimedout",
+        "socket hang up",
+        "network error",
+    )
+
+    # Retryable HTTP statuses, only where the text reports a status (e.g.
+    # "API Error: 529", "HTTP 503", "status code 429"); the bare digits also
+    # turn up as line numbers, PIDs or byte counts in stderr tails
+    TRANSIENT_STATUS = re.compile(
+        r"\b(?:api error|status(?: code)?|http(?:/[\d.]+)?|error)\W{0,3}(?:429|502|503|529)\b"
+    )
+
+    # Exit codes treated as transient: EX_TEMPFAIL, and SIGKILL from
+    # outside the pipeline (e.g. the OOM killer). SIGTERM is how the
+    # pipeline itself stops a run, so it is not retried.
+    TRANSIENT_EXIT_CODES = frozenset({75, -signal.SIGKILL})
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        timeout_retries: int = 1,
+        adaptive_timeouts: bool = True,
+        history_path: Path | str | None = None,
+    ):
+        """Initialize the policy.
+
+        Args:
+            max_retries: Retries for transient CLI failures
+            timeout_retries: Extra attempts after a timeout; each one
+                             continues the interrupted session
+            adaptive_timeouts: Derive timeouts from recorded durations
+            history_path: Duration history file (default: under the
+                          task-pipeline cache directory)
+        """
+        self.max_retries = max_retries
+        self.timeout_retries = timeout_retries
+        self.adaptive_timeouts = adaptive_timeouts
+        self.history_path = Path(history_path) if history_path else default_cache_root() / "durations.json"
+        self._history: dict[str, list[float]] | None = None
+
+    def _load_history(self) -> dict[str, list[float]]:
+        if self._history is None:
+            try:
+                self._history = json.loads(self.history_path.read_text())
+            except (OSError, json.JSONDecodeError):
+                self._history = {}
+        return self._history
+
+    def timeout_for(self, agent: str, model: str, default: int) -> int:
+        """Timeout in seconds for the next run of agent (a policy key) on model."""
+        if not self.adaptive_timeouts:
+            return default
+
+        samples = sorted(self._load_history().get(f"{agent}:{model}", []))
+        if len(samples) < self.MIN_SAMPLES:
+            return default
+
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        timeout = int(p95 * self.TIMEOUT_MULTIPLIER)
+        return max(self.MIN_TIMEOUT_SECONDS, min(self.MAX_TIMEOUT_SECONDS, timeout))
+
+    def record_duration(self, agent: str, model: str, seconds: float) -> None:
+        """Record the duration of a successful run."""
+        history = self._load_history()
+        samples = history.setdefault(f"{agent}:{model}", [])
+        samples.append(round(seconds, 1))
+        del samples[:-self.MAX_SAMPLES]
+
+        try:
+            self.history_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.history_path.with_suffix(f".tmp.{os.getpid()}")
+            tmp_path.write_text(json.dumps(history, indent=2))
+            os.replace(tmp_path, self.history_path)
+        except OSError:
+            pass
+
+    def is_transient(self, result: dict[str, Any]) -> bool:
+        """Whether an error result is worth retrying."""
+        if result.get("status") != "error":
+            return False
+
+        exit_code = result.get("exit_code")
+        if exit_code in self.TRANSIENT_EXIT_CODES:
+            return True
+
+        error_text = str(result.get("error", "")).lower()
+        return (
+            any(pattern in error_text for pattern in self.TRANSIENT_PATTERNS)
+            or self.TRANSIENT_STATUS.search(error_text) is not None
+        )
+
+    def retry_delay(self, result: dict[str, Any], attempt: int) -> float | None:
+        """Seconds to wait before retrying, or None to stop.
+
+        Args:
+            result: Result dict of the attempt that just finished
+            attempt: Retries already made for this kind of failure
+                     (timeouts and errors are counted separately)
+        """
+        status = result.get("status")
+        if status == "timeout":
+            return 0.0 if attempt < self.timeout_retries else None
+        if self.is_transient(result) and attempt < self.max_retries:
+            delay = min(self.BACKOFF_MAX_SECONDS, self.BACKOFF_BASE_SECONDS * (2 ** attempt))
+            return delay * random.uniform(0.8, 1.2)
+        return None
@@ -0,0 +1,96 @@
+"""Agent pool - bounded concurrent execution of agent runs.
+
+Agent wall-clock time is almost entirely spent waiting on `claude --print`
+subprocesses. The pool lets the orchestrator overlap that waiting while
+capping how many CLI processes run at once.
+
+Slots are a thread-safe semaphore rather than an asyncio one, so a single
+pool can budget several pipelines running in their own threads and event
+loops (see daemon.py).
+"""
+
+import asyncio
+import threading
+from typing import Any
+
+from agents.base import BaseAgent
+
+
+class AgentPool:
+    """Semaphore-controlled executor for BaseAgent.arun() calls.
+
+    One pool is shared by everything a TaskPipeline runs, so the
+    concurrency limit applies across phases and subtasks (and across
+    pipelines, when they are given the same pool).
+
+    Usage:
+        pool = AgentPool(max_concurrency=3)
+        result = await pool.submit(tdd_agent, subtask)
+        result = pool.run(architect, issue)          # blocking callers
+        results = pool.run_all([(architect, (issue,)), (planner, (analysis,))])
+    """
+
+    # Default number of concurrent claude processes
+    DEFAULT_MAX_CONCURRENCY = 3
+
+    # Seconds between attempts to take a slot from async code
+    ACQUIRE_POLL_SECONDS = 0.05
+
+    def __init__(self, max_concurrency: int | None = None):
+        self.max_concurrency = max_concurrency or self.DEFAULT_MAX_CONCURRENCY
+        if self.max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.active = 0
+        self.peak_active = 0
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._counter_lock = threading.Lock()
+
+    def _enter(self) -> None:
+        with self._counter_lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def _exit(self) -> None:
+        with self._counter_lock:
+            self.active -= 1
+        self._slots.release()
+
+    async def _acquire(self) -> None:
+        """Take a slot without blocking the event loop (cancellation-safe)."""
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(self.ACQUIRE_POLL_SECONDS)
+
+    async def submit(self, agent: BaseAgent, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        """Run agent.arun(*args, **kwargs) once a slot is free.
+
+        Returns:
+            The agent's result dict
+        """
+        await self._acquire()
+        self._enter()
+        try:
+            return await agent.arun(*args, **kwargs)
+        finally:
+            self._exit()
+
+    def run(self, agent: BaseAgent, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        """Blocking variant of submit() using agent.run()."""
+        self._slots.acquire()
+        self._enter()
+        try:
+            return agent.run(*args, **kwargs)
+        finally:
+            self._exit()
+
+    async def gather(self, calls: list[tuple[BaseAgent, tuple]]) -> list[dict[str, Any]]:
+        """Run several (agent, args) calls concurrently, bounded by the pool.
+
+        Returns:
+            Result dicts in the same order as `calls`
+        """
+        return await asyncio.gather(*(self.submit(agent, *args) for agent, args in calls))
+
+    def run_all(self, calls: list[tuple[BaseAgent, tuple]]) -> list[dict[str, Any]]:
+        """Synchronous wrapper around gather() for non-async callers."""
+        return asyncio.run(self.gather(calls))
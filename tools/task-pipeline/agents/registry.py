@@ -0,0 +1,155 @@
+"""Process-wide registry of parsed agent definitions.
+
+Every agent instance used to re-read and YAML-parse its
+.claude/agents/<name>.md file, once per TDD/Executor instance of every
+subtask. The registry parses and validates each definition once and hands
+the same immutable AgentConfig to all instances, re-parsing only when the
+file's mtime or size changes.
+"""
+
+import re
+import threading
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+
+class AgentConfig:
+    """Configuration parsed from agent definition YAML frontmatter.
+
+    Instances are shared between agents and are read-only.
+    """
+
+    FRONTMATTER = re.compile(r"^---\n(.*?)\n---\n(.*)$", re.DOTALL)
+
+    def __init__(self, name: str, description: str, tools: list[str] | tuple[str, ...], model: str, prompt: str):
+        self.name = name
+        self.description = description
+        self.tools = tuple(tools)
+        self.model = model
+        self.prompt = prompt
+        self._frozen = True
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"AgentConfig is read-only (tried to set {name!r})")
+        super().__setattr__(name, value)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "AgentConfig":
+        """Parse agent config from markdown file with YAML frontmatter."""
+        content = path.read_text()
+
+        # Extract YAML frontmatter between --- markers
+        match = cls.FRONTMATTER.match(content)
+        if not match:
+            raise ValueError(f"No YAML frontmatter found in {path}")
+
+        frontmatter = yaml.safe_load(match.group(1))
+        if not isinstance(frontmatter, dict):
+            raise ValueError(f"Frontmatter in {path} is not a mapping")
+        prompt = match.group(2).strip()
+
+        # tools may be a comma-separated string or a YAML list
+        tools = frontmatter.get("tools") or []
+        if isinstance(tools, str):
+            tools = tools.split(",")
+
+        return cls(
+            name=frontmatter.get("name", path.stem),
+            description=frontmatter.get("description", ""),
+            tools=[str(t).strip() for t in tools if str(t).strip()],
+            model=frontmatter.get("model", "sonnet"),
+            prompt=prompt,
+        )
+
+    def validate(self, path: Path) -> None:
+        """Raise ValueError if the definition is unusable."""
+        if not isinstance(self.model, str) or not self.model.strip():
+            raise ValueError(f"Agent definition {path} has no valid model")
+        if not isinstance(self.name, str) or not self.name.strip():
+            raise ValueError(f"Agent definition {path} has no valid name")
+        if not self.prompt:
+            raise ValueError(f"Agent definition {path} has an empty prompt")
+
+
+class AgentRegistry:
+    """Parsed agent definitions of one .claude/agents directory.
+
+    Use AgentRegistry.for_project() to get the shared instance; entries are
+    keyed by agent file name (without .md).
+    """
+
+    _instances: dict[Path, "AgentRegistry"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, agents_dir: Path | str):
+        self.agents_dir = Path(agents_dir)
+        self._lock = threading.Lock()
+        # name -> ((mtime_ns, size), config)
+        self._entries: dict[str, tuple[tuple[int, int], AgentConfig]] = {}
+
+    @classmethod
+    def for_project(cls, project_root: Path | str) -> "AgentRegistry":
+        """Shared registry for project_root/.claude/agents."""
+        agents_dir = (Path(project_root) / ".claude" / "agents").resolve()
+        with cls._instances_lock:
+            registry = cls._instances.get(agents_dir)
+            if registry is None:
+                registry = cls._instances[agents_dir] = cls(agents_dir)
+            return registry
+
+    def path_for(self, name: str) -> Path:
+        return self.agents_dir / f"{name}.md"
+
+    def get(self, name: str) -> AgentConfig:
+        """Return the config for an agent, parsing it on first use or change.
+
+        Raises:
+            FileNotFoundError: If the definition file does not exist
+            ValueError: If it cannot be parsed or fails validation
+        """
+        path = self.path_for(name)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(name, None)
+            raise FileNotFoundError(f"Agent definition not found: {path}") from None
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+            config = AgentConfig.from_file(path)
+            config.validate(path)
+            self._entries[name] = (version, config)
+            return config
+
+    def load_all(self) -> dict[str, AgentConfig]:
+        """Parse and validate every definition in the directory.
+
+        Raises:
+            ValueError: Listing every definition that failed to load
+        """
+        configs = {}
+        errors = []
+        for path in sorted(self.agents_dir.glob("*.md")):
+            try:
+                configs[path.stem] = self.get(path.stem)
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                errors.append(f"{path.name}: {e}")
+        if errors:
+            raise ValueError("Invalid agent definitions:\n  " + "\n  ".join(errors))
+        return configs
+
+    def tools(self, name: str) -> tuple[str, ...]:
+        """Tool list declared by an agent."""
+        return self.get(name).tools
+
+    def models(self) -> dict[str, str]:
+        """Default model of every agent in the directory."""
+        return {name: config.model for name, config in self.load_all().items()}
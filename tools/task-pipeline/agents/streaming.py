@@ -0,0 +1,110 @@
+"""Incremental parsing of `claude --output-format stream-json` output.
+
+With stream-json the CLI prints one JSON event per line while the agent
+works. Artifacts are picked out of assistant text as soon as their closing
+tag arrives, instead of running a regex over the whole transcript at the end.
+"""
+
+import json
+import re
+from typing import Any, Callable
+
+
+class ArtifactStreamParser:
+    """Incremental parser for <artifact name="..."> ... </artifact> blocks.
+
+    Text can be fed in arbitrary chunks. Only the content of the artifact
+    currently being written (plus a short tail that may hold a partial
+    opening tag) is kept in memory; everything else is discarded once seen.
+    """
+
+    OPEN_TAG = re.compile(r'<artifact name="([^"]+)">')
+    CLOSE_TAG = "</artifact>"
+
+    # Longest tail kept while looking for an opening tag split across chunks
+    MAX_PENDING_TAG = 512
+
+    def __init__(self, on_artifact: Callable[[str, str], None] | None = None):
+        self.on_artifact = on_artifact
+        self.current_name: str | None = None
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        """Feed a chunk of text.
+
+        Returns:
+            List of (name, content) tuples for artifacts completed by this chunk
+        """
+        self._buffer += text
+        completed = []
+
+        while True:
+            if self.current_name is None:
+                match = self.OPEN_TAG.search(self._buffer)
+                if not match:
+                    # Keep only what could be the start of a split opening tag
+                    tail_start = self._buffer.rfind("<")
+                    if tail_start == -1 or len(self._buffer) - tail_start > self.MAX_PENDING_TAG:
+                        self._buffer = ""
+                    else:
+                        self._buffer = self._buffer[tail_start:]
+                    break
+                self.current_name = match.group(1)
+                self._buffer = self._buffer[match.end():]
+            else:
+                end = self._buffer.find(self.CLOSE_TAG)
+                if end == -1:
+                    break
+                artifact = (self.current_name, self._buffer[:end].strip())
+                self._buffer = self._buffer[end + len(self.CLOSE_TAG):]
+                self.current_name = None
+                completed.append(artifact)
+                if self.on_artifact:
+                    self.on_artifact(*artifact)
+
+        return completed
+
+    def partial(self) -> tuple[str, str] | None:
+        """Return the (name, content) of an unterminated artifact, if any."""
+        if self.current_name is None:
+            return None
+        return self.current_name, self._buffer.strip()
+
+
+class StreamJsonConsumer:
+    """Consumes stream-json event lines from the Claude CLI.
+
+    Tracks the session id, feeds assistant text into an ArtifactStreamParser
+    and keeps the final `result` event (the same envelope --output-format
+    json would have printed).
+    """
+
+    def __init__(self, on_artifact: Callable[[str, str], None] | None = None):
+        self.parser = ArtifactStreamParser(on_artifact)
+        self.session_id: str | None = None
+        self.result_event: dict[str, Any] | None = None
+        self.event_count = 0
+
+    def feed_line(self, line: str) -> None:
+        """Process one line of CLI output. Non-JSON lines are ignored."""
+        line = line.strip()
+        if not line:
+            return
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(event, dict):
+            return
+
+        self.event_count += 1
+        if event.get("session_id"):
+            self.session_id = event["session_id"]
+
+        event_type = event.get("type")
+        if event_type == "assistant":
+            for block in event.get("message", {}).get("content", []):
+                if isinstance(block, dict) and block.get("type") == "text":
+                    self.parser.feed(block.get("text", "") + "\n")
+        elif event_type == "result":
+            self.result_event = event
@@ -9,12 +9,16 @@ After writing tests, this agent MUST verify that tests fail.
 This ensures we're actually testing new behavior, not existing code.
 """
 
+import asyncio
+import contextlib
+import functools
 import re
-import subprocess
 from pathlib import Path
 from typing import Any
 
-from agents.base import BaseAgent
+from agents.base import AgentOptions, BaseAgent
+from tools.process import ProcessCancelled, run_process
+from tools.test_runner import run_bash_tests, run_cached, run_vitest, write_test_report, write_test_results
 
 
 # Task type to agent mapping
@@ -54,6 +58,7 @@ class TDDAgent(BaseAgent):
     """
 
     AGENT_FILE = "tdd-developer"  # Default, can be overridden
+    POLICY_KEY = "tdd"
     TEST_TIMEOUT_SECONDS = 120  # 2 minutes for test execution
 
     # Artifact size limits
@@ -64,11 +69,16 @@ class TDDAgent(BaseAgent):
         artifact_dir: Path | str,
         project_root: Path | str,
         task_type: str = "app",
+        options: AgentOptions | None = None,
+        tree_lock: asyncio.Lock | None = None,
     ):
         self.task_type = task_type
+        # Held during RED verification when an Executor may be editing the
+        # same tree concurrently (pipelined subtasks)
+        self.tree_lock = tree_lock
         # Select agent based on task type
         self.AGENT_FILE = TASK_TYPE_AGENTS.get(task_type, "tdd-developer")
-        super().__init__(artifact_dir, project_root, model_override="sonnet")
+        super().__init__(artifact_dir, project_root, model_override="sonnet", options=options)
 
     def _extract_artifacts(self, output: str) -> None:
         """Extract artifacts from <artifact> tags in output."""
@@ -137,24 +147,12 @@ class TDDAgent(BaseAgent):
         lines.append("")
         return "\n".join(lines)
 
-    def run(self, subtask: dict[str, Any]) -> dict[str, Any]:
-        """Run the TDD agent to write failing tests for a subtask.
-
-        Args:
-            subtask: Subtask dict with number, title, description, files, reference_files
-
-        Returns:
-            Dict with status, output text, and artifacts dict.
-            Status will be:
-            - "red_verified": Tests were written and verified to fail (expected)
-            - "red_not_verified": Tests were written but didn't fail (problem!)
-            - "complete": Tests written but verification not possible
-            - "timeout"/"error": Agent failed
-        """
+    def _build_input(self, subtask: dict[str, Any]) -> str:
+        """Format the subtask into the TDD prompt."""
         reference_section = self._format_reference_files(subtask)
         test_extension = ".test.sh" if self.task_type == "infrastructure" else ".test.ts"
 
-        input_context = f"""# Subtask to Test
+        return f"""# Subtask to Test
 
 **Subtask {subtask.get('number', '?')}:** {subtask.get('title', 'Unknown')}
 
@@ -209,15 +207,55 @@ Brief acceptance criteria (max {self.MAX_SPEC_LINES} lines):
 After writing tests, RUN THEM to verify they fail.
 """
 
-        result = super().run(input_context)
+    def run(self, subtask: dict[str, Any]) -> dict[str, Any]:
+        """Run the TDD agent to write failing tests for a subtask.
+
+        Args:
+            subtask: Subtask dict with number, title, description, files, reference_files
+
+        Returns:
+            Dict with status, output text, and artifacts dict.
+            Status will be:
+            - "red_verified": Tests were written and verified to fail (expected)
+            - "red_not_verified": Tests were written but didn't fail (problem!)
+            - "complete": Tests written but verification not possible
+            - "timeout"/"error": Agent failed
+        """
+        result = super().run(self._build_input(subtask))
+        return self._apply_red_verification(result)
+
+    async def arun(self, subtask: dict[str, Any]) -> dict[str, Any]:
+        """Async variant of run().
+
+        RED verification spawns blocking test processes, so it runs in a
+        worker thread to keep the event loop free for other agents.
+        """
+        result = await super().arun(self._build_input(subtask))
+        async with self.tree_lock or contextlib.nullcontext():
+            return await self._in_thread(self._apply_red_verification, result)
+
+    def _apply_red_verification(self, result: dict[str, Any]) -> dict[str, Any]:
+        """Verify the RED phase and fold the outcome into the result status."""
         self.log(f"Artifacts produced: {list(result['artifacts'].keys())}")
 
-        # If agent failed, return as-is
-        if result.get("status") in ("timeout", "error"):
+        # If agent failed, return as-is - unless it timed out after the
+        # test files were already streamed out (they are worth verifying)
+        if result.get("status") == "error":
+            return result
+        if result.get("status") == "timeout" and not result.get("salvaged"):
             return result
 
         # Verify RED phase - run the tests to confirm they fail
         red_result = self._verify_red_phase()
+        if "tests" in red_result:
+            result["tests"] = red_result["tests"]
+        if result.get("status") == "timeout":
+            # Salvaged tests are only usable if they demonstrably fail
+            if red_result["verified"]:
+                result["status"] = "red_verified"
+                self.log("RED phase verified on salvaged tests")
+            return result
+
         if red_result["verified"]:
             result["status"] = "red_verified"
             self.log("RED phase verified - tests fail as expected")
@@ -240,6 +278,7 @@ After writing tests, RUN THEM to verify they fail.
             Dict with:
             - verified: True if tests fail as expected
             - skipped: True if tests couldn't be run
+            - tests: Summary of the per-test results (see write_test_results())
             - reason: Explanation of result
         """
         self.log("Verifying RED phase (tests should fail)...")
@@ -256,82 +295,94 @@ After writing tests, RUN THEM to verify they fail.
                 "reason": "No test files found in artifacts"
             }
 
-        # Determine test command based on task type
         if self.task_type == "app":
             # TypeScript tests - need to run from app directory
             # Note: Tests may be in task dir, not app/tests
-            test_cmd = ["npx", "vitest", "run", "--reporter=verbose"]
             test_cwd = self.project_root / "app"
 
-            # Check if vitest is available
-            try:
-                check = subprocess.run(
-                    ["npx", "vitest", "--version"],
-                    capture_output=True,
-                    timeout=10,
-                    cwd=str(test_cwd)
-                )
-                if check.returncode != 0:
+            # A warm vitest server also means vitest is available
+            test_servers = self.options.test_servers
+            server = test_servers.get(test_cwd) if test_servers is not None else None
+            if server is None:
+                # Check if vitest is available
+                try:
+                    check = run_process(["npx", "vitest", "--version"], cwd=test_cwd, timeout=10)
+                    if check.timed_out:
+                        return {
+                            "verified": False,
+                            "skipped": True,
+                            "reason": "Could not check vitest availability"
+                        }
+                    if check.returncode != 0:
+                        return {
+                            "verified": False,
+                            "skipped": True,
+                            "reason": "vitest not available"
+                        }
+                except FileNotFoundError:
                     return {
                         "verified": False,
                         "skipped": True,
-                        "reason": "vitest not available"
+                        "reason": "Could not check vitest availability"
                     }
-            except (subprocess.TimeoutExpired, FileNotFoundError):
-                return {
-                    "verified": False,
-                    "skipped": True,
-                    "reason": "Could not check vitest availability"
-                }
 
+        # Run the test files (all of them in one vitest process for app tasks)
+        log_dir = self.artifact_dir / self.LOG_DIR
+        if self.task_type == "app":
+            runner, config_dir = "vitest", test_cwd
+            run_tests = functools.partial(
+                run_vitest,
+                cwd=test_cwd,
+                timeout=self.TEST_TIMEOUT_SECONDS * len(test_files),
+                log_path=log_dir / "red-vitest.log",
+                report_path=log_dir / "red-vitest.json",
+                server=server,
+            )
         else:
             # Infrastructure tests - bash scripts
-            test_cmd = ["bash"]
-            test_cwd = self.artifact_dir
-
-        # Run each test file
-        all_failed = True
-        test_results = []
-
-        for test_file in test_files[:5]:  # Limit to first 5 test files
-            try:
-                if self.task_type == "app":
-                    cmd = test_cmd + [str(test_file)]
-                else:
-                    cmd = test_cmd + [str(test_file)]
-
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=self.TEST_TIMEOUT_SECONDS,
-                    cwd=str(test_cwd)
+            runner, config_dir = "bash", self.project_root
+            run_tests = functools.partial(
+                run_bash_tests,
+                cwd=self.artifact_dir,
+                timeout=self.TEST_TIMEOUT_SECONDS,
+                log_dir=log_dir,
+                log_prefix="red",
+            )
+
+        # Files whose inputs are unchanged since an earlier run are not run again
+        test_cache = self.options.test_cache
+        try:
+            inputs = (
+                test_cache.inputs_digest(
+                    self.project_root, self.artifact_dir / "tests", config_dir, self.options.tree_exclude
                 )
+                if test_cache is not None else None
+            )
+            test_results = run_cached(
+                test_files, run_tests, test_cache, "red", runner, self.project_root, inputs
+            )
+        except ProcessCancelled:
+            raise
+        except Exception as e:
+            test_results = [{"file": str(f), "error": str(e)} for f in test_files]
+        report_path = log_dir / "red-report.json"
+        summary = write_test_report(test_results, report_path, root=self.artifact_dir)
+        tests = write_test_results(test_results, self.artifact_dir / self.TEST_RESULTS_FILE, root=self.artifact_dir)
+        if summary["cached"]:
+            self.log(f"Using cached results for {summary['cached']} of {summary['files']} unchanged test file(s)")
 
-                test_results.append({
-                    "file": str(test_file),
-                    "exit_code": result.returncode,
-                    "passed": result.returncode == 0
-                })
-
-                if result.returncode == 0:
-                    all_failed = False
-                    self.log(f"WARNING: Test passed (should fail): {test_file.name}")
-
-            except subprocess.TimeoutExpired:
-                test_results.append({
-                    "file": str(test_file),
-                    "timeout": True
-                })
-            except Exception as e:
-                test_results.append({
-                    "file": str(test_file),
-                    "error": str(e)
-                })
+        all_failed = True
+        for record in test_results:
+            if record.get("passed"):
+                all_failed = False
+                self.log(f"WARNING: Test passed (should fail): {Path(record['file']).name}")
 
         return {
             "verified": all_failed,
             "skipped": False,
             "test_results": test_results,
+            "summary": summary,
+            "tests": tests,
+            "report": str(report_path),
             "reason": "All tests fail as expected" if all_failed else "Some tests passed unexpectedly"
         }
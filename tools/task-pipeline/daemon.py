@@ -0,0 +1,283 @@
+"""Long-running daemon that runs a TaskPipeline for every queued issue.
+
+Each `run.py` invocation pays Python startup, agent-definition parsing and
+cold caches again. TaskDaemon stays up, watches a spool directory and runs
+up to max_tasks pipelines at once in threads. All of them share one
+AgentPool (the global budget of claude CLI processes), one ResponseCache,
+the AgentRegistry and one NodeModulesStore. Each task keeps its own task
+directory and, in a git project, its own worktrees and branches.
+
+Spool layout (<spool>/):
+    incoming/   jobs waiting to run, oldest first
+    running/    jobs claimed by a daemon (moved back once their daemon is gone)
+    done/       finished jobs, each with <name>.result.json
+    failed/     jobs whose pipeline failed or raised
+
+A job is either an issue file (`*.md`, like run.py --file) or a JSON file:
+    {"issue": 48, "repo": "owner/repo", "task_type": "infrastructure"}
+Jobs are claimed by renaming them into running/, so dropping a file into
+incoming/ (write elsewhere, then mv) is all a producer needs to do.
+
+Several daemons may share one spool. The daemon running a job holds an
+exclusive flock on running/.<job>.lock until the job is filed, and a
+starting daemon requeues only the jobs in running/ whose lock it can take,
+i.e. whose daemon has exited.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from agents.cache import ResponseCache
+from agents.pool import AgentPool
+from agents.registry import AgentRegistry
+from node_store import NodeModulesStore
+from orchestrator import TaskPipeline, create_task_dir, extract_title_from_issue, fetch_github_issue, slugify
+from worktrees import WorktreeManager
+
+
+class TaskDaemon:
+    """Runs queued issues through TaskPipelines under a shared budget.
+
+    Usage:
+        daemon = TaskDaemon("spool", project_root, max_tasks=2, max_concurrency=4)
+        daemon.serve()              # until stopped (Ctrl-C / SIGTERM)
+        daemon.serve(once=True)     # drain the queue, then return
+    """
+
+    SPOOL_DIRS = ("incoming", "running", "done", "failed")
+    JOB_SUFFIXES = (".md", ".json")
+
+    # Seconds between checks of incoming/ while idle
+    POLL_SECONDS = 5
+
+    def __init__(
+        self,
+        spool_dir: Path | str,
+        project_root: Path | str,
+        tasks_dir: Path | str | None = None,
+        max_tasks: int = 2,
+        max_concurrency: int | None = None,
+        task_type: str = "app",
+        use_cache: bool = True,
+        pipeline_options: dict[str, Any] | None = None,
+    ):
+        """Initialize the daemon.
+
+        Args:
+            spool_dir: Directory holding incoming/running/done/failed
+            project_root: Project all tasks work on
+            tasks_dir: Base directory for task dirs (default: <project_root>/tasks)
+            max_tasks: Pipelines run at once
+            max_concurrency: claude CLI processes run at once, across all
+                             pipelines
+            task_type: Default task type for jobs that do not set one
+            use_cache: Share a response cache between pipelines
+            pipeline_options: Further TaskPipeline keyword arguments
+                              (stream, claude_bin, max_failures, ...)
+        """
+        if max_tasks < 1:
+            raise ValueError("max_tasks must be at least 1")
+        self.spool_dir = Path(spool_dir).resolve()
+        self.project_root = Path(project_root).resolve()
+        self.tasks_dir = Path(tasks_dir) if tasks_dir else self.project_root / "tasks"
+        self.task_type = task_type
+        self.pipeline_options = dict(pipeline_options or {})
+
+        # Concurrent tasks write the project tree; isolate them in worktrees
+        self.max_tasks = max_tasks
+        if max_tasks > 1:
+            if WorktreeManager.is_available(self.project_root):
+                self.pipeline_options.setdefault("worktrees", "always")
+            else:
+                print("[WARN] Project root is not a git repository with commits; running one task at a time")
+                self.max_tasks = 1
+
+        # Warm across tasks
+        self.agent_pool = AgentPool(max_concurrency)
+        self.response_cache = ResponseCache() if use_cache else None
+        self.node_store = NodeModulesStore()
+        self.agent_registry = AgentRegistry.for_project(self.project_root)
+
+        self._stop = threading.Event()
+        # Owner-lock descriptors of the jobs this daemon has claimed, by job name
+        self._job_locks: dict[str, int] = {}
+        for name in self.SPOOL_DIRS:
+            (self.spool_dir / name).mkdir(parents=True, exist_ok=True)
+
+    def stop(self) -> None:
+        """Stop claiming jobs; running pipelines finish."""
+        self._stop.set()
+
+    def _lock_path(self, name: str) -> Path:
+        return self.spool_dir / "running" / f".{name}.lock"
+
+    def _lock_job(self, name: str) -> int | None:
+        """Take a job's owner lock without blocking; None if another daemon holds it."""
+        path = self._lock_path(name)
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            # Removed by its previous owner after we opened it; try a fresh file
+            os.close(fd)
+
+    def _unlock_job(self, name: str, fd: int) -> None:
+        """Remove a job's lock file and release the lock."""
+        try:
+            os.unlink(self._lock_path(name))
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+    def recover(self) -> list[Path]:
+        """Requeue jobs left in running/ by daemons that exited without filing them.
+
+        Jobs whose owner lock is still held belong to a live daemon on the
+        same spool and are left alone.
+        """
+        requeued = []
+        for job in sorted((self.spool_dir / "running").iterdir()):
+            if job.suffix not in self.JOB_SUFFIXES or job.name.startswith("."):
+                continue
+            fd = self._lock_job(job.name)
+            if fd is None:
+                continue  # still running under another daemon
+            try:
+                target = self.spool_dir / "incoming" / job.name
+                os.rename(job, target)
+                requeued.append(target)
+            except FileNotFoundError:
+                pass  # filed by its daemon in the meantime
+            finally:
+                self._unlock_job(job.name, fd)
+        return requeued
+
+    def _claim(self) -> Path | None:
+        """Move the oldest incoming job to running/; None if there is none."""
+        jobs = [
+            p for p in (self.spool_dir / "incoming").iterdir()
+            if p.suffix in self.JOB_SUFFIXES and not p.name.startswith(".")
+        ]
+        for job in sorted(jobs, key=lambda p: (p.stat().st_mtime, p.name)):
+            # Own the job before it appears in running/, so recover() skips it
+            fd = self._lock_job(job.name)
+            if fd is None:
+                continue  # being claimed by another daemon on the same spool
+            target = self.spool_dir / "running" / job.name
+            try:
+                os.rename(job, target)
+            except FileNotFoundError:
+                self._unlock_job(job.name, fd)
+                continue  # claimed by another daemon on the same spool
+            self._job_locks[job.name] = fd
+            return target
+        return None
+
+    def _prepare(self, job: Path) -> tuple[Path, str, str]:
+        """Resolve a job to (task_dir, issue_content, task_type)."""
+        if job.suffix == ".md":
+            issue_content = job.read_text()
+            # Stable pseudo issue number, so a requeued job resumes its task dir
+            pseudo_issue = int(hashlib.sha1(job.stem.encode()).hexdigest(), 16) % 100000
+            return create_task_dir(pseudo_issue, slugify(job.stem), self.tasks_dir), issue_content, self.task_type
+
+        spec = json.loads(job.read_text())
+        task_type = spec.get("task_type", self.task_type)
+        issue = int(spec["issue"])
+        existing = sorted(self.tasks_dir.glob(f"{issue:05d}-*"))
+        if existing and (existing[0] / "issue.md").exists():
+            return existing[0], (existing[0] / "issue.md").read_text(), task_type
+
+        issue_content = fetch_github_issue(issue, spec.get("repo"))
+        title_slug = slugify(extract_title_from_issue(issue_content))
+        return create_task_dir(issue, title_slug, self.tasks_dir), issue_content, task_type
+
+    def _run_job(self, job: Path) -> dict[str, Any]:
+        """Run one job's pipeline and file the job under done/ or failed/."""
+        started = datetime.now()
+        try:
+            task_dir, issue_content, task_type = self._prepare(job)
+            print(f"\n[DAEMON] {job.name}: running in {task_dir}")
+            pipeline = TaskPipeline(
+                task_dir=task_dir,
+                project_root=self.project_root,
+                task_type=task_type,
+                use_cache=self.response_cache is not None,
+                agent_pool=self.agent_pool,
+                response_cache=self.response_cache,
+                node_store=self.node_store,
+                **self.pipeline_options,
+            )
+            result = pipeline.run(issue_content)
+        except Exception as e:
+            result = {"status": "failed", "error": str(e), "traceback": traceback.format_exc()}
+
+        outcome = "done" if result.get("status") == "complete" else "failed"
+        record = {
+            "job": job.name,
+            "started_at": started.isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "result": result,
+        }
+        target_dir = self.spool_dir / outcome
+        (target_dir / f"{job.name}.result.json").write_text(json.dumps(record, indent=2, default=str))
+        os.rename(job, target_dir / job.name)
+        self._unlock_job(job.name, self._job_locks.pop(job.name))
+        print(f"\n[DAEMON] {job.name}: {result.get('status', 'unknown')}")
+        return record
+
+    def serve(self, once: bool = False) -> list[dict[str, Any]]:
+        """Run jobs until stopped (or, with once, until the queue is empty).
+
+        Returns:
+            Records of the jobs run, in completion order
+        """
+        for job in self.recover():
+            print(f"[DAEMON] Requeued interrupted job {job.name}")
+        print(
+            f"[DAEMON] Watching {self.spool_dir / 'incoming'} "
+            f"(tasks: {self.max_tasks}, CLI processes: {self.agent_pool.max_concurrency})"
+        )
+
+        records = []
+        running: dict[Future, Path] = {}
+        with ThreadPoolExecutor(max_workers=self.max_tasks, thread_name_prefix="task") as executor:
+            try:
+                while True:
+                    while not self._stop.is_set() and len(running) < self.max_tasks:
+                        job = self._claim()
+                        if job is None:
+                            break
+                        running[executor.submit(self._run_job, job)] = job
+
+                    if not running and (once or self._stop.is_set()):
+                        break
+                    if running:
+                        done, _ = wait(running, timeout=self.POLL_SECONDS, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            running.pop(future)
+                            records.append(future.result())
+                    else:
+                        self._stop.wait(self.POLL_SECONDS)
+            except KeyboardInterrupt:
+                print(f"\n[DAEMON] Stopping; waiting for {len(running)} running task(s)")
+                self.stop()
+                for future in running:
+                    records.append(future.result())
+        return records
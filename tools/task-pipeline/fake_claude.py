@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Record/replay stand-in for the `claude` CLI.
+
+Lets the pipeline run end-to-end without network access, e.g. to benchmark
+TaskPipeline.run and measure orchestrator overhead. Point the pipeline at
+this script with --claude-bin (or TASK_PIPELINE_CLAUDE_BIN).
+
+Usage:
+    # Record real CLI runs (proxies to the real claude binary)
+    FAKE_CLAUDE_MODE=record FAKE_CLAUDE_DIR=bench/transcripts \\
+        python run.py --file issue.md --phase all --claude-bin ./fake_claude.py
+
+    # Replay them with the original latency profile
+    FAKE_CLAUDE_DIR=bench/transcripts \\
+        python run.py --file issue.md --phase all --claude-bin ./fake_claude.py
+
+    # Replay with no delays (pure orchestrator overhead)
+    FAKE_CLAUDE_SPEED=0 FAKE_CLAUDE_DIR=bench/transcripts ...
+
+Environment:
+    FAKE_CLAUDE_DIR       Transcript directory (required)
+    FAKE_CLAUDE_MODE      "replay" (default) or "record"
+    FAKE_CLAUDE_REAL_BIN  Real CLI used when recording (default: claude)
+    FAKE_CLAUDE_SPEED     Latency multiplier for replay (default: 1.0)
+
+Transcripts are JSON files named <agent>-<prompt hash>.json holding the
+timed stdout lines, stderr, exit code and the project files the agent
+created or changed. Replay writes those files into the working directory.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+
+def parse_cli_args(argv: list[str]) -> argparse.Namespace:
+    """Parse the subset of claude CLI arguments the transcripts are keyed on."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--agent", default="default")
+    parser.add_argument("--model", default="")
+    parser.add_argument("--output-format", default="text")
+    args, _ = parser.parse_known_args(argv)
+    # The prompt is always the final positional argument
+    args.prompt = argv[-1] if argv and not argv[-1].startswith("-") else ""
+    return args
+
+
+def transcript_name(agent: str, prompt: str) -> str:
+    """File name for the transcript of one (agent, prompt) invocation."""
+    prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+    return f"{agent}-{prompt_hash}.json"
+
+
+def snapshot_dirty_files(cwd: Path) -> dict[str, str]:
+    """Map each modified/untracked file in the git tree to a content hash."""
+    try:
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "-z", "--untracked-files=all"],
+            capture_output=True,
+            check=True,
+            cwd=str(cwd)
+        ).stdout
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return {}
+
+    snapshot = {}
+    for entry in filter(None, status.decode(errors="replace").split("\0")):
+        rel_path = entry[3:]
+        path = cwd / rel_path
+        if path.is_file():
+            snapshot[rel_path] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return snapshot
+
+
+def record(argv: list[str], transcript_dir: Path) -> int:
+    """Run the real CLI, mirror its output and save a transcript."""
+    args = parse_cli_args(argv)
+    real_bin = os.environ.get("FAKE_CLAUDE_REAL_BIN", "claude")
+    cwd = Path.cwd()
+
+    before = snapshot_dirty_files(cwd)
+    start = time.monotonic()
+    lines = []
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(
+            [real_bin, *argv],
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            text=True
+        )
+        for line in proc.stdout:
+            lines.append({"t": round(time.monotonic() - start, 3), "line": line.rstrip("\n")})
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        returncode = proc.wait()
+        wall_seconds = time.monotonic() - start
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors="replace")
+    sys.stderr.write(stderr)
+
+    # Files the agent created or changed during this invocation
+    files = {}
+    for rel_path, digest in snapshot_dirty_files(cwd).items():
+        if before.get(rel_path) == digest:
+            continue
+        try:
+            files[rel_path] = (cwd / rel_path).read_text()
+        except (OSError, UnicodeDecodeError):
+            continue
+
+    transcript = {
+        "agent": args.agent,
+        "model": args.model,
+        "output_format": args.output_format,
+        "prompt_sha256": hashlib.sha256(args.prompt.encode()).hexdigest(),
+        "returncode": returncode,
+        "stderr": stderr,
+        "wall_seconds": round(wall_seconds, 3),
+        "lines": lines,
+        "files": files,
+    }
+    transcript_dir.mkdir(parents=True, exist_ok=True)
+    path = transcript_dir / transcript_name(args.agent, args.prompt)
+    tmp_path = path.with_suffix(f".tmp.{os.getpid()}")
+    tmp_path.write_text(json.dumps(transcript, indent=2))
+    os.replace(tmp_path, path)
+    return returncode
+
+
+def find_transcript(transcript_dir: Path, agent: str, prompt: str) -> Path | None:
+    """Exact (agent, prompt) match, else the first transcript for the agent."""
+    exact = transcript_dir / transcript_name(agent, prompt)
+    if exact.exists():
+        return exact
+
+    candidates = sorted(transcript_dir.glob(f"{agent}-*.json"))
+    if candidates:
+        print(f"fake_claude: no exact transcript, using {candidates[0].name}", file=sys.stderr)
+        return candidates[0]
+    return None
+
+
+def convert_lines(lines: list[dict[str, Any]], recorded: str, wanted: str) -> list[dict[str, Any]]:
+    """Adapt recorded stdout to the requested --output-format."""
+    if recorded == wanted or wanted not in ("json", "stream-json"):
+        return lines
+
+    events = []
+    for entry in lines:
+        try:
+            events.append(json.loads(entry["line"]))
+        except json.JSONDecodeError:
+            continue
+    result = next((e for e in reversed(events) if e.get("type") == "result"), None)
+    if result is None:
+        return lines
+    end = lines[-1]["t"] if lines else 0.0
+
+    if wanted == "json":
+        return [{"t": end, "line": json.dumps(result)}]
+
+    # json -> stream-json: synthesize init / assistant / result events
+    session = result.get("session_id", "")
+    text = result.get("result", "")
+    return [
+        {"t": 0.0, "line": json.dumps({"type": "system", "subtype": "init", "session_id": session})},
+        {"t": end, "line": json.dumps({
+            "type": "assistant",
+            "session_id": session,
+            "message": {"content": [{"type": "text", "text": text}]},
+        })},
+        {"t": end, "line": json.dumps(result)},
+    ]
+
+
+def replay(argv: list[str], transcript_dir: Path) -> int:
+    """Replay a recorded transcript with its original timing."""
+    args = parse_cli_args(argv)
+    speed = float(os.environ.get("FAKE_CLAUDE_SPEED", "1.0"))
+
+    path = find_transcript(transcript_dir, args.agent, args.prompt)
+    if path is None:
+        print(f"fake_claude: no transcript for agent '{args.agent}' in {transcript_dir}", file=sys.stderr)
+        return 1
+
+    transcript = json.loads(path.read_text())
+    lines = convert_lines(
+        transcript.get("lines", []),
+        transcript.get("output_format", "json"),
+        args.output_format
+    )
+
+    def write_files() -> None:
+        for rel_path, content in transcript.get("files", {}).items():
+            target = Path.cwd() / rel_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(content)
+
+    if not lines:
+        write_files()
+
+    start = time.monotonic()
+    for index, entry in enumerate(lines):
+        # Agent file edits happen before the final output line
+        if index == len(lines) - 1:
+            write_files()
+
+        delay = entry.get("t", 0.0) * speed - (time.monotonic() - start)
+        if delay > 0:
+            time.sleep(delay)
+        sys.stdout.write(entry["line"] + "\n")
+        sys.stdout.flush()
+
+    sys.stderr.write(transcript.get("stderr", ""))
+    return transcript.get("returncode", 0)
+
+
+def main() -> int:
+    transcript_dir = os.environ.get("FAKE_CLAUDE_DIR")
+    if not transcript_dir:
+        print("fake_claude: FAKE_CLAUDE_DIR must be set", file=sys.stderr)
+        return 2
+
+    argv = sys.argv[1:]
+    if os.environ.get("FAKE_CLAUDE_MODE", "replay") == "record":
+        return record(argv, Path(transcript_dir))
+    return replay(argv, Path(transcript_dir))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
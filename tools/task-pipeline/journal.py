@@ -0,0 +1,206 @@
+"""Append-only journal of task state.
+
+Rewriting the whole task.json after every phase costs O(state) per write
+and can lose state when a crash (or a second worker) interrupts a rewrite.
+TaskJournal instead appends one JSON line per change to task.journal.jsonl
+and materializes the state by replaying those events over the last
+snapshot. The snapshot is the familiar task.json; compaction folds the
+journal into it (atomically replaced) and truncates the journal.
+
+Every event carries a sequence number and the snapshot records the last
+one it includes, so a crash between writing the snapshot and truncating the
+journal replays nothing twice. Appends and compaction hold an exclusive
+flock on a lock file, so several processes can share a task directory.
+
+Events:
+    {"seq": 7, "ts": "...", "op": "update", "value": {"status": "planner_complete"}}
+    {"seq": 8, "ts": "...", "op": "phase", "value": {"phase": "subtask-1", ...}}
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+
+class TaskJournal:
+    """Event journal plus materialized snapshot for one task directory.
+
+    Usage:
+        journal = TaskJournal(task_dir)
+        state = journal.load() or {"phases_completed": []}
+        journal.append("update", {"status": "architect_complete"})
+        journal.append("phase", {"phase": "architect", "status": "complete"})
+        journal.compact()   # rewrites task.json, empties the journal
+    """
+
+    SNAPSHOT_FILE = "task.json"
+    JOURNAL_FILE = "task.journal.jsonl"
+    LOCK_FILE = ".task.lock"
+
+    # Operations understood by apply()
+    OPS = ("update", "phase")
+
+    # Journal events after which append() compacts on its own
+    COMPACT_EVERY = 50
+
+    # Snapshot key holding the sequence number of the last event it includes
+    SEQ_KEY = "journal_seq"
+
+    def __init__(self, task_dir: Path | str):
+        self.task_dir = Path(task_dir)
+        self.snapshot_path = self.task_dir / self.SNAPSHOT_FILE
+        self.journal_path = self.task_dir / self.JOURNAL_FILE
+        self.lock_path = self.task_dir / self.LOCK_FILE
+        # Sequence number the current snapshot covers (cached per process)
+        self._snapshot_seq: int | None = None
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold the exclusive task lock (shared by every writer in the task directory)."""
+        self.task_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def exists(self) -> bool:
+        """Whether any state has been written for this task."""
+        return self.snapshot_path.exists() or self.journal_path.exists()
+
+    @classmethod
+    def apply(cls, state: dict[str, Any], event: dict[str, Any]) -> None:
+        """Apply one event to a materialized state (in place)."""
+        op, value = event.get("op"), event.get("value")
+        if op == "update":
+            state.update(value)
+        elif op == "phase":
+            state.setdefault("phases_completed", []).append(value)
+
+    def _read_snapshot(self) -> dict[str, Any] | None:
+        try:
+            state = json.loads(self.snapshot_path.read_text())
+        except FileNotFoundError:
+            return None
+        self._snapshot_seq = state.get(self.SEQ_KEY, 0)
+        return state
+
+    def _read_events(self) -> list[dict[str, Any]]:
+        """Journal events in order; a torn final line (crash mid-append) is ignored."""
+        try:
+            lines = self.journal_path.read_bytes().splitlines()
+        except FileNotFoundError:
+            return []
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events
+
+    def _materialize(self) -> dict[str, Any] | None:
+        state = self._read_snapshot()
+        events = self._read_events()
+        if state is None and not events:
+            return None
+
+        state = state if state is not None else {}
+        seq = state.get(self.SEQ_KEY, 0)
+        for event in events:
+            if event.get("seq", 0) > seq:
+                self.apply(state, event)
+                seq = event["seq"]
+        state[self.SEQ_KEY] = seq
+        return state
+
+    def load(self) -> dict[str, Any] | None:
+        """The current state (snapshot plus journal), or None for a new task."""
+        with self.locked():
+            return self._materialize()
+
+    def _tail(self) -> bytes:
+        """Last 64KB of the journal."""
+        try:
+            with open(self.journal_path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 64 * 1024))
+                return f.read()
+        except FileNotFoundError:
+            return b""
+
+    def _last_seq(self, tail: bytes) -> int:
+        """Sequence number of the newest event."""
+        for line in reversed(tail.splitlines()):
+            try:
+                return json.loads(line)["seq"]
+            except (ValueError, KeyError, TypeError):
+                continue
+
+        # Empty journal: continue from the snapshot (possibly compacted by another process)
+        self._read_snapshot()
+        return self._snapshot_seq or 0
+
+    def append(self, op: str, value: dict[str, Any]) -> int:
+        """Durably append one event (compacting every COMPACT_EVERY events).
+
+        Returns:
+            The event's sequence number
+        """
+        if op not in self.OPS:
+            raise ValueError(f"op must be one of {self.OPS}")
+
+        with self.locked():
+            tail = self._tail()
+            seq = self._last_seq(tail) + 1
+            event = {"seq": seq, "ts": datetime.now().isoformat(), "op": op, "value": value}
+            line = (json.dumps(event) + "\n").encode()
+            if tail and not tail.endswith(b"\n"):
+                # Terminate a line torn by a crash so this event stays readable
+                line = b"\n" + line
+
+            # One write() to an O_APPEND descriptor, synced before returning
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            if seq - (self._snapshot_seq or 0) >= self.COMPACT_EVERY:
+                self._compact()
+        return seq
+
+    def compact(self) -> dict[str, Any] | None:
+        """Fold the journal into task.json and empty the journal.
+
+        Returns:
+            The materialized state (None if nothing was ever written)
+        """
+        with self.locked():
+            return self._compact()
+
+    def _compact(self) -> dict[str, Any] | None:
+        state = self._materialize()
+        if state is None:
+            return None
+
+        tmp = self.snapshot_path.with_name(f".{self.SNAPSHOT_FILE}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self._snapshot_seq = state[self.SEQ_KEY]
+
+        # Events up to journal_seq are in the snapshot now
+        try:
+            os.truncate(self.journal_path, 0)
+        except FileNotFoundError:
+            pass
+        return state
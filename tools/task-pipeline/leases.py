@@ -0,0 +1,193 @@
+"""Subtask leases for workers sharing a task directory.
+
+Several `run.py --worker` processes (possibly on different machines with a
+shared filesystem) split one task's subtasks between them. A worker claims a
+subtask by creating its lease file, then keeps the lease alive by rewriting
+it every few seconds. A lease whose holder stopped heartbeating (crash, lost
+machine) expires and can be reclaimed by any other worker.
+
+Every read-then-write of a lease (acquire, reclaim, renew, remove) holds an
+exclusive flock on the subtask's lock file, so a renewal and a reclaim can
+never interleave and two workers never hold the same subtask.
+
+Layout: <task_dir>/leases/subtask-NN.lease (plus subtask-NN.lease.lock),
+each lease a JSON document:
+    {"worker": "build-3:4182:9f2c", "token": "...", "subtask": 2,
+     "acquired_at": 1760000000.0, "heartbeat_at": ..., "expires_at": ...}
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+
+def default_worker_id() -> str:
+    """host:pid:random, unique enough to tell workers apart in lease files."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:4]}"
+
+
+class Lease:
+    """A held subtask lease, kept alive by a heartbeat thread.
+
+    `lost` is set when the heartbeat finds the lease taken over by another
+    worker (after expiring); the holder should abandon the subtask.
+    """
+
+    def __init__(self, manager: "LeaseManager", subtask_num: int, token: str):
+        self.manager = manager
+        self.subtask_num = subtask_num
+        self.token = token
+        self.path = manager.lease_path(subtask_num)
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start_heartbeat(self) -> None:
+        self._thread = threading.Thread(
+            target=self._heartbeat, name=f"lease-{self.subtask_num}", daemon=True
+        )
+        self._thread.start()
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.manager.heartbeat_seconds):
+            if not self.manager.renew(self):
+                self.lost.set()
+                return
+
+    def release(self) -> None:
+        """Stop heartbeating and remove the lease file (if still ours)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not self.lost.is_set():
+            self.manager.remove(self)
+
+
+class LeaseManager:
+    """Creates, renews, reclaims and releases the lease files of one task.
+
+    Usage:
+        leases = LeaseManager(task_dir)
+        lease = leases.try_acquire(2)
+        if lease is not None:
+            lease.start_heartbeat()
+            ...  # run subtask 2, checking lease.lost
+            lease.release()
+    """
+
+    LEASE_DIR = "leases"
+
+    # Seconds a lease stays valid without a heartbeat
+    DEFAULT_TTL_SECONDS = 120
+
+    # Leases are renewed this many times per TTL
+    HEARTBEATS_PER_TTL = 4
+
+    def __init__(
+        self,
+        task_dir: Path | str,
+        worker_id: str | None = None,
+        ttl_seconds: float | None = None,
+    ):
+        self.lease_dir = Path(task_dir) / self.LEASE_DIR
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl_seconds = ttl_seconds or self.DEFAULT_TTL_SECONDS
+        self.heartbeat_seconds = self.ttl_seconds / self.HEARTBEATS_PER_TTL
+
+    def lease_path(self, subtask_num: int) -> Path:
+        return self.lease_dir / f"subtask-{subtask_num:02d}.lease"
+
+    def _read(self, path: Path) -> dict[str, Any] | None:
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Torn (e.g. a crash on a filesystem without atomic rename); judged by mtime instead
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                return None
+            return {"token": None, "expires_at": mtime + self.ttl_seconds}
+
+    def _document(self, subtask_num: int, token: str, acquired_at: float) -> str:
+        now = time.time()
+        return json.dumps({
+            "worker": self.worker_id,
+            "token": token,
+            "subtask": subtask_num,
+            "acquired_at": acquired_at,
+            "heartbeat_at": now,
+            "expires_at": now + self.ttl_seconds,
+        })
+
+    def holder(self, subtask_num: int) -> dict[str, Any] | None:
+        """The live lease on a subtask, or None if it is free or expired."""
+        lease = self._read(self.lease_path(subtask_num))
+        if lease is None or lease.get("expires_at", 0) < time.time():
+            return None
+        return lease
+
+    @contextlib.contextmanager
+    def _locked(self, path: Path):
+        """Hold the exclusive lock of one lease file."""
+        with open(path.with_name(path.name + ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write(self, path: Path, document: str) -> None:
+        """Replace a lease file atomically (callers hold its lock)."""
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        tmp.write_text(document)
+        os.replace(tmp, path)
+
+    def try_acquire(self, subtask_num: int) -> Lease | None:
+        """Claim a subtask, reclaiming an expired lease.
+
+        Returns:
+            The Lease (heartbeat not started), or None if another worker
+            holds a live lease
+        """
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+        path = self.lease_path(subtask_num)
+
+        with self._locked(path):
+            existing = self._read(path)
+            if existing is not None and existing.get("expires_at", 0) >= time.time():
+                return None
+            # Free, or expired (checked under the lock, so not just renewed)
+
+            token = uuid.uuid4().hex
+            self._write(path, self._document(subtask_num, token, time.time()))
+        return Lease(self, subtask_num, token)
+
+    def renew(self, lease: Lease) -> bool:
+        """Extend a lease; False if it is no longer ours."""
+        with self._locked(lease.path):
+            current = self._read(lease.path)
+            if current is None or current.get("token") != lease.token:
+                return False
+            self._write(
+                lease.path,
+                self._document(lease.subtask_num, lease.token, current.get("acquired_at", time.time())),
+            )
+        return True
+
+    def remove(self, lease: Lease) -> None:
+        with self._locked(lease.path):
+            current = self._read(lease.path)
+            if current is not None and current.get("token") == lease.token:
+                try:
+                    lease.path.unlink()
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,234 @@
+"""Shared node_modules for subtask worktrees.
+
+A fresh git worktree has no node_modules, so `npx vitest` in it would need
+a full `npm install` first. NodeModulesStore keeps one installed copy per
+lockfile hash under the task-pipeline cache directory. A store entry is
+filled by copying the main checkout's node_modules when its lockfile matches,
+or by `npm ci` otherwise, and is then made read-only.
+
+A worktree gets a node_modules directory of its own holding a symlink to
+each package in the store. Tools that write caches under node_modules (vite
+and vitest use node_modules/.vite) therefore write into the worktree, never
+into the shared entry.
+
+Every provisioned worktree holds a shared flock on its entry's lock file
+until it is released (or its process exits); pruning skips entries that are
+locked or were used recently.
+"""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import stat
+import threading
+import time
+from pathlib import Path
+
+from agents.cache import default_cache_root
+from tools.process import run_process
+
+
+class NodeModulesStore:
+    """Lockfile-keyed store of installed node_modules trees.
+
+    Layout: <store_dir>/<lockfile sha256[:16]>/node_modules (read-only)
+            <store_dir>/<lockfile sha256[:16]>/.users.lock
+    """
+
+    LOCKFILE = "package-lock.json"
+
+    # Lock file in each entry, shared-locked by the worktrees using it
+    USERS_LOCK = ".users.lock"
+
+    # Caches left in the main checkout's node_modules, not copied
+    COPY_IGNORE = (".vite", ".cache")
+
+    # Store entries kept (least recently used are removed)
+    MAX_ENTRIES = 3
+
+    # Entries used this recently are never pruned (seconds)
+    PRUNE_GRACE_SECONDS = 3600
+
+    # Timeout for `npm ci` when no matching install exists (seconds)
+    INSTALL_TIMEOUT_SECONDS = 900
+
+    def __init__(self, store_dir: Path | str | None = None):
+        self.store_dir = Path(store_dir) if store_dir else default_cache_root() / "node_modules"
+        self._lock = threading.Lock()
+        # Lock descriptors held for provisioned package dirs
+        self._held: dict[Path, int] = {}
+
+    @classmethod
+    def lockfile_hash(cls, package_dir: Path) -> str | None:
+        """Hash of package_dir's lockfile, or None if it has none."""
+        try:
+            return hashlib.sha256((package_dir / cls.LOCKFILE).read_bytes()).hexdigest()[:16]
+        except OSError:
+            return None
+
+    def provision(self, package_dir: Path, source_dir: Path | None = None) -> str:
+        """Give package_dir a node_modules of symlinks into the store.
+
+        The store entry stays in use (not pruned) until release().
+
+        Args:
+            package_dir: Directory with package.json/package-lock.json (in a
+                         worktree) that needs node_modules
+            source_dir: Same package in the main checkout; its node_modules
+                        is reused when the lockfiles match
+
+        Returns:
+            Short description of what was done (for logging)
+        """
+        target = package_dir / "node_modules"
+        if target.exists() or target.is_symlink():
+            return "node_modules already present"
+
+        key = self.lockfile_hash(package_dir)
+        if key is None:
+            return f"no {self.LOCKFILE}"
+
+        with self._lock:
+            entry = self.store_dir / key
+            how = "reused store entry"
+            if not (entry / "node_modules").is_dir():
+                how = self._fill(entry, package_dir, source_dir, key)
+                self._prune(keep=entry)
+            os.utime(entry)
+            self._hold(entry, package_dir)
+
+        self._link_packages(entry / "node_modules", target)
+        return f"{how} ({key})"
+
+    def _hold(self, entry: Path, package_dir: Path) -> None:
+        """Shared-lock an entry on behalf of package_dir."""
+        fd = os.open(entry / self.USERS_LOCK, os.O_RDONLY | os.O_CREAT, 0o444)
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        previous = self._held.pop(package_dir.resolve(), None)
+        if previous is not None:
+            os.close(previous)
+        self._held[package_dir.resolve()] = fd
+
+    def release(self, root: Path) -> None:
+        """Stop using the entries of package dirs under root (e.g. a removed worktree)."""
+        root = root.resolve()
+        with self._lock:
+            for package_dir in [p for p in self._held if p.is_relative_to(root)]:
+                os.close(self._held.pop(package_dir))
+
+    @staticmethod
+    def _link_packages(store_modules: Path, target: Path) -> None:
+        """Create target with one symlink per entry of the store's node_modules."""
+        target.mkdir()
+        for child in os.scandir(store_modules):
+            (target / child.name).symlink_to(child.path, target_is_directory=child.is_dir())
+
+    def _fill(self, entry: Path, package_dir: Path, source_dir: Path | None, key: str) -> str:
+        """Create a store entry; staged and renamed so it is never half-written."""
+        self._remove(entry)  # incomplete leftover, if any
+        staging = self.store_dir / f".{key}.tmp.{os.getpid()}"
+        self._remove(staging)
+        staging.mkdir(parents=True)
+
+        try:
+            source = source_dir / "node_modules" if source_dir else None
+            if source is not None and source.is_dir() and self.lockfile_hash(source_dir) == key:
+                how = self._copy_tree(source, staging / "node_modules")
+            else:
+                how = self._install(package_dir, staging)
+                for name in self.COPY_IGNORE:
+                    self._remove(staging / "node_modules" / name)
+            (staging / self.USERS_LOCK).touch()
+            self._make_read_only(staging / "node_modules")
+
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # Another pipeline filled the same entry first
+                if not (entry / "node_modules").is_dir():
+                    raise
+        finally:
+            self._remove(staging)
+        return how
+
+    def _copy_tree(self, source: Path, destination: Path) -> str:
+        """Copy the main checkout's node_modules (without caches).
+
+        Not hardlinked: a write through a worktree would change the main
+        checkout's files, and making the store read-only would change theirs.
+        """
+        shutil.copytree(
+            source, destination, symlinks=True, ignore=shutil.ignore_patterns(*self.COPY_IGNORE)
+        )
+        return "copied from main checkout"
+
+    @staticmethod
+    def _make_read_only(root: Path) -> None:
+        """Drop the write bits of a tree (symlinks are left as they are)."""
+        no_write = ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+        for dirpath, dirnames, filenames in os.walk(root):
+            for name in filenames + dirnames:
+                path = os.path.join(dirpath, name)
+                mode = os.lstat(path).st_mode
+                if not stat.S_ISLNK(mode):
+                    os.chmod(path, stat.S_IMODE(mode) & no_write)
+        os.chmod(root, stat.S_IMODE(os.stat(root).st_mode) & no_write)
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        """rmtree that also removes read-only store trees."""
+        if not path.exists() and not path.is_symlink():
+            return
+        for dirpath, dirnames, _ in os.walk(path):
+            for name in dirnames:
+                sub = os.path.join(dirpath, name)
+                if not os.path.islink(sub):
+                    os.chmod(sub, 0o755)
+        if path.is_dir() and not path.is_symlink():
+            os.chmod(path, 0o755)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _install(self, package_dir: Path, staging: Path) -> str:
+        """Run `npm ci` for package_dir's lockfile into staging."""
+        for name in ("package.json", self.LOCKFILE, ".npmrc"):
+            if (package_dir / name).exists():
+                shutil.copy2(package_dir / name, staging / name)
+
+        started = time.monotonic()
+        result = run_process(
+            ["npm", "ci", "--no-audit", "--no-fund"],
+            cwd=staging,
+            timeout=self.INSTALL_TIMEOUT_SECONDS,
+            log_path=self.store_dir / "npm-ci.log"
+        )
+        if not result.ok:
+            reason = "timed out" if result.timed_out else result.stderr_tail.strip()[-500:]
+            raise OSError(f"npm ci failed: {reason}")
+        return f"installed with npm ci in {time.monotonic() - started:.0f}s"
+
+    def _prune(self, keep: Path) -> None:
+        """Remove least recently used entries beyond MAX_ENTRIES.
+
+        Entries used within PRUNE_GRACE_SECONDS, or locked by a worktree of
+        any process, are kept.
+        """
+        entries = [p for p in self.store_dir.iterdir() if p.is_dir() and not p.name.startswith(".")]
+        entries.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+        cutoff = time.time() - self.PRUNE_GRACE_SECONDS
+        for old in [p for p in entries if p != keep][self.MAX_ENTRIES - 1:]:
+            if old.stat().st_mtime > cutoff:
+                continue
+            try:
+                fd = os.open(old / self.USERS_LOCK, os.O_RDONLY | os.O_CREAT, 0o444)
+            except OSError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue  # in use
+            try:
+                self._remove(old)
+            finally:
+                os.close(fd)
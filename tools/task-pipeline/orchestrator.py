@@ -3,16 +3,37 @@
 Uses Claude CLI (via Max subscription) instead of Anthropic Python SDK.
 """
 
+import asyncio
+import contextlib
 import json
+import re
 import subprocess
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+import yaml
+
+from agents.base import AgentOptions
+from agents.policy import RunPolicy
 from agents.architect import ArchitectAgent
 from agents.planner import PlannerAgent
-from agents.tdd import TDDAgent
+from agents.tdd import TASK_TYPE_AGENTS, TDDAgent
 from agents.executor import ExecutorAgent
+from agents.cache import ResponseCache, TestResultCache
+from agents.limiter import CLILimiter
+from agents.metrics import MetricsCollector
+from agents.pool import AgentPool
+from agents.registry import AgentRegistry
+from journal import TaskJournal
+from leases import Lease, LeaseManager
+from node_store import NodeModulesStore
+from scheduler import SubtaskGraph, SubtaskScheduler
+from tools.process import ProcessGroup, active_process_group, run_process
+from tools.test_runner import read_vitest_report, run_bash_tests, write_test_report, write_test_results
+from tools.vitest_server import VitestServers
+from worktrees import Worktree, WorktreeError, WorktreeManager
 
 
 class TaskPipeline:
@@ -34,12 +55,40 @@ class TaskPipeline:
     # Default failure threshold - stop pipeline if this many subtasks fail
     DEFAULT_MAX_FAILURES = 3
 
+    # How the Executor may reuse the TDD agent's CLI session
+    EXECUTOR_SESSION_MODES = ("fresh", "resume", "fork")
+
+    # When subtasks run in their own git worktrees
+    WORKTREE_MODES = ("auto", "always", "never")
+
+    # Written next to a finished stage's artifacts (used when resuming)
+    STAGE_RESULT_FILE = "stage-result.json"
+
+    # Seconds between a worker's checks for claimable subtasks
+    WORKER_POLL_SECONDS = 5
+
     def __init__(
         self,
         task_dir: Path | str,
         project_root: Path | str | None = None,
         task_type: str = "app",
         max_failures: int | None = None,
+        max_concurrency: int | None = None,
+        stream: bool = False,
+        use_cache: bool = True,
+        claude_bin: str | None = None,
+        executor_session: str = "fresh",
+        max_retries: int = 2,
+        adaptive_timeouts: bool = True,
+        parallel_subtasks: int = 1,
+        worktrees: str = "auto",
+        pipeline: bool = False,
+        speculative: int = 1,
+        agent_pool: AgentPool | None = None,
+        response_cache: ResponseCache | None = None,
+        node_store: NodeModulesStore | None = None,
+        cli_limiter: CLILimiter | None = None,
+        vitest_server: bool = True,
     ):
         """Initialize the pipeline.
 
@@ -51,36 +100,181 @@ class TaskPipeline:
                        agent to use for TDD and Executor phases.
             max_failures: Maximum subtask failures before stopping pipeline.
                           Default: 3. Set to 0 for unlimited failures.
+            max_concurrency: Maximum number of claude CLI processes the
+                             pipeline runs at once. Default: 3.
+            stream: Use stream-json CLI output so artifacts are written as
+                    soon as each one is complete (and survive timeouts).
+            use_cache: Serve identical agent invocations from the on-disk
+                       response cache, and verification test files whose
+                       inputs are unchanged from the test result cache.
+                       Set False to always call the CLI and run the tests.
+            claude_bin: Claude CLI executable (default: "claude", or
+                        $TASK_PIPELINE_CLAUDE_BIN). Point at fake_claude.py
+                        to replay recorded transcripts.
+            executor_session: How the Executor relates to the TDD agent's CLI
+                              session: "fresh" (new session), "resume"
+                              (continue it) or "fork" (branch from it).
+            max_retries: Retries for transient CLI failures (rate limits,
+                         network errors). A timed-out run is additionally
+                         continued once in its own session.
+            adaptive_timeouts: Derive per-agent timeouts from the durations
+                               of earlier runs instead of a fixed 10 minutes.
+            parallel_subtasks: Maximum number of subtasks run at once; a
+                               subtask starts once its depends_on are done.
+                               Default: 1 (one at a time, dependency order).
+            worktrees: Run each subtask in its own git worktree and merge
+                       the results back: "auto" (when parallel_subtasks > 1 or
+                       speculative > 1), "always" or "never".
+            pipeline: Overlap stages in the shared tree: while one subtask's
+                      Executor runs, the next independent subtask's TDD agent
+                      writes its tests. Executors and RED verification take
+                      a writer lock, so only one touches the tree at a time.
+            speculative: Executor candidates launched per subtask, each in
+                         its own worktree; the first to pass GREEN
+                         verification is kept and the others are
+                         cancelled. Values above 1 need worktrees.
+            agent_pool: Pool to run agents in (default: a new one with
+                        max_concurrency slots). Pipelines given the same
+                        pool share its CLI process budget.
+            response_cache: Response cache to use when use_cache is set
+                            (default: a new one)
+            node_store: node_modules store for worktrees (default: a new
+                        one); share it between pipelines running at once
+            cli_limiter: Machine-wide CLI concurrency / rate limits shared
+                         with every other pipeline on this machine
+                         (default: from $TASK_PIPELINE_CLI_SLOTS and
+                         $TASK_PIPELINE_CLI_RPM; unlimited if unset)
+            vitest_server: For app tasks, run RED/GREEN verification in a
+                           warm vitest process per checkout instead of a
+                           new `npx vitest run` each time
         """
         self.task_dir = Path(task_dir).resolve()
         self.project_root = Path(project_root).resolve() if project_root else Path.cwd()
         self.task_type = task_type
+        if executor_session not in self.EXECUTOR_SESSION_MODES:
+            raise ValueError(f"executor_session must be one of {self.EXECUTOR_SESSION_MODES}")
+        self.executor_session = executor_session
         self.max_failures = max_failures if max_failures is not None else self.DEFAULT_MAX_FAILURES
+        if parallel_subtasks < 1:
+            raise ValueError("parallel_subtasks must be at least 1")
+        self.parallel_subtasks = parallel_subtasks
+        if worktrees not in self.WORKTREE_MODES:
+            raise ValueError(f"worktrees must be one of {self.WORKTREE_MODES}")
+        self.worktree_mode = worktrees
+        # Set up by run() when subtasks use worktrees
+        self.worktrees: WorktreeManager | None = None
+        self.pipeline = pipeline
+        if speculative < 1:
+            raise ValueError("speculative must be at least 1")
+        self.speculative = speculative
+        # Writer lock for the shared tree (set up by run() in pipeline mode)
+        self.tree_lock: asyncio.Lock | None = None
+        # Child processes of the subtask loop, terminated when the failure
+        # threshold is reached (set up by run())
+        self.process_group: ProcessGroup | None = None
+        # Set by run_worker(); recorded with each subtask
+        self.worker_id: str | None = None
+
+        # Parsed agent definitions, shared by every agent instance
+        self.agent_registry = AgentRegistry.for_project(self.project_root)
+
+        # Shared executor for async agent runs (bounds concurrent CLI processes)
+        self.agent_pool = agent_pool or AgentPool(max_concurrency)
+
+        # Per-invocation token/cost/latency metrics (metrics.jsonl, summarized
+        # in metrics.json); appended under the same lock as the task journal
+        self.journal = TaskJournal(self.task_dir)
+        self.metrics = MetricsCollector(self.task_dir, lock=self.journal.locked)
+
+        # Response cache for repeated agent invocations (e.g. on resume)
+        self.response_cache = (response_cache or ResponseCache()) if use_cache else None
+        # Results of verification test files whose inputs did not change
+        self.test_cache = TestResultCache() if use_cache else None
+        self.node_store = node_store
+
+        # Warm vitest processes for verification, started with Phase 3 and
+        # shut down when it ends
+        self.vitest_servers = (
+            VitestServers(self.task_dir / "logs") if task_type == "app" and vitest_server else None
+        )
+
+        # Runtime options passed to every agent
+        self.agent_options = AgentOptions(
+            stream=stream,
+            cache=self.response_cache,
+            claude_bin=claude_bin,
+            policy=RunPolicy(max_retries=max_retries, adaptive_timeouts=adaptive_timeouts),
+            limiter=cli_limiter or CLILimiter.from_env(),
+            test_servers=self.vitest_servers,
+            test_cache=self.test_cache,
+            tree_exclude=self._pipeline_outputs(),
+        )
 
         # Failure tracking
         self.failure_count = 0
         self.failed_subtasks: list[dict] = []
 
-        # Task metadata
+        # Task metadata: changes are appended to a journal, task.json is
+        # its compacted snapshot (see TaskJournal)
+        self._journal_started = False
         self.task_metadata: dict[str, Any] = {
             "created_at": datetime.now().isoformat(),
             "status": "initialized",
             "task_type": task_type,
             "max_failures": self.max_failures,
+            "executor_session": executor_session,
+            "parallel_subtasks": parallel_subtasks,
+            "worktrees": worktrees,
+            "pipeline": pipeline,
+            "speculative": speculative,
             "phases_completed": []
         }
 
-    def _save_task_metadata(self) -> None:
-        """Save task metadata to task.json."""
-        self.task_dir.mkdir(parents=True, exist_ok=True)
-        metadata_path = self.task_dir / "task.json"
-        metadata_path.write_text(json.dumps(self.task_metadata, indent=2))
+    def _pipeline_outputs(self) -> list[str]:
+        """Paths under the project root that the pipeline writes itself.
+
+        The tasks directory (logs, journals, metrics and artifacts of every
+        task) changes on each run, so it is kept out of the cache keys.
+        """
+        if not self.task_dir.is_relative_to(self.project_root):
+            return []
+        return [str(self.task_dir.parent.relative_to(self.project_root))]
+
+    def _append_task_event(self, op: str, value: dict[str, Any]) -> None:
+        """Journal a change already applied to self.task_metadata."""
+        if not self._journal_started:
+            self._journal_started = True
+            if not self.journal.exists():
+                # New task: the first event carries the whole initial metadata
+                self.journal.append("update", self.task_metadata)
+                return
+        self.journal.append(op, value)
+
+    def _update_task(self, **fields: Any) -> None:
+        """Set top-level task metadata fields (journaled)."""
+        self.task_metadata.update(fields)
+        self._append_task_event("update", fields)
+
+    def _record_phase(self, record: dict[str, Any]) -> None:
+        """Add a phase record to the task metadata (journaled)."""
+        self.task_metadata["phases_completed"].append(record)
+        self._append_task_event("phase", record)
+
+    def _compact_task_metadata(self) -> None:
+        """Fold the journal into task.json and derive metrics.json from metrics.jsonl."""
+        if self.response_cache is not None:
+            self._update_task(cache=self.response_cache.stats())
+        if self.test_cache is not None:
+            self._update_task(test_cache=self.test_cache.stats())
+        self.journal.compact()
+        self.metrics.write()
 
     def _load_task_metadata(self) -> None:
-        """Load task metadata from task.json if it exists."""
-        metadata_path = self.task_dir / "task.json"
-        if metadata_path.exists():
-            self.task_metadata = json.loads(metadata_path.read_text())
+        """Load task metadata (task.json plus journal) if the task has any."""
+        state = self.journal.load()
+        if state is not None:
+            self.task_metadata = state
+            self._journal_started = True
 
     def save_issue(self, issue_content: str) -> None:
         """Save the original issue to the task directory."""
@@ -108,23 +302,27 @@ class TaskPipeline:
         # Run architect agent (uses Claude CLI)
         architect = ArchitectAgent(
             artifact_dir=architect_dir,
-            project_root=self.project_root
+            project_root=self.project_root,
+            options=self.agent_options,
         )
 
-        result = architect.run(issue_content)
+        result = self.agent_pool.run(architect, issue_content)
 
         # Save artifacts
         architect.save_artifacts()
 
         # Update metadata
-        self.task_metadata["status"] = "architect_complete"
-        self.task_metadata["phases_completed"].append({
+        self.metrics.record("architect", f"{architect.AGENT_FILE}:{architect.model}", result.get("metrics"))
+        self._update_task(status="architect_complete")
+        self._record_phase({
             "phase": "architect",
             "completed_at": datetime.now().isoformat(),
             "status": result.get("status", "unknown"),
-            "artifacts": list(result["artifacts"].keys())
+            "artifacts": list(result["artifacts"].keys()),
+            "metrics": result.get("metrics", {})
         })
-        self._save_task_metadata()
+        # task.json is current after the phase, also when it is run on its own
+        self._compact_task_metadata()
 
         print("\nArchitect phase complete.")
         print(f"Artifacts saved to: {architect_dir}")
@@ -148,20 +346,24 @@ class TaskPipeline:
 
         planner = PlannerAgent(
             artifact_dir=planner_dir,
-            project_root=self.project_root
+            project_root=self.project_root,
+            options=self.agent_options,
         )
 
-        result = planner.run(architect_analysis)
+        result = self.agent_pool.run(planner, architect_analysis)
         planner.save_artifacts()
 
-        self.task_metadata["status"] = "planner_complete"
-        self.task_metadata["phases_completed"].append({
+        self.metrics.record("planner", f"{planner.AGENT_FILE}:{planner.model}", result.get("metrics"))
+        self._update_task(status="planner_complete")
+        self._record_phase({
             "phase": "planner",
             "completed_at": datetime.now().isoformat(),
             "status": result.get("status", "unknown"),
-            "artifacts": list(result["artifacts"].keys())
+            "artifacts": list(result["artifacts"].keys()),
+            "metrics": result.get("metrics", {})
         })
-        self._save_task_metadata()
+        # task.json is current after the phase, also when it is run on its own
+        self._compact_task_metadata()
 
         print("\nPlanner phase complete.")
         print(f"Artifacts saved to: {planner_dir}")
@@ -178,6 +380,14 @@ class TaskPipeline:
         Returns:
             Result dict with TDD and executor results, including overall status
         """
+        return asyncio.run(self.arun_subtask(subtask, subtask_num))
+
+    async def arun_subtask(self, subtask: dict, subtask_num: int) -> dict[str, Any]:
+        """Async variant of run_subtask().
+
+        Agent runs go through the shared AgentPool, so several subtasks can
+        be awaited concurrently without exceeding max_concurrency.
+        """
         print("\n" + "-" * 40)
         print(f"SUBTASK {subtask_num}: {subtask.get('title', 'Unknown')}")
         print("-" * 40)
@@ -186,16 +396,45 @@ class TaskPipeline:
         subtask_failed = False
         failure_reason = None
 
+        # With worktrees, agents work in the subtask's own checkout and the
+        # subtask dir is mirrored there (copied back by finish())
+        project_root = self.project_root
+        worktree = None
+        if self.worktrees is not None:
+            try:
+                worktree = await asyncio.to_thread(self.worktrees.create, subtask_num, subtask_dir)
+            except WorktreeError as e:
+                return self._record_subtask_setup_failure(subtask_num, f"Could not create worktree: {e}")
+            project_root = worktree.path
+            subtask_dir = worktree.task_path(subtask_dir)
+            if self.vitest_servers is not None:
+                # Starts while the TDD agent writes the tests
+                self.vitest_servers.warm(worktree.path / "app")
+            print(f"[WORKTREE] {worktree.path} (branch {worktree.branch})")
+            for package, how in worktree.node_modules.items():
+                print(f"[WORKTREE] {package}/node_modules: {how}")
+
         # Phase 3a: TDD - Write failing tests
-        print(f"\n[TDD] Writing failing tests... (agent: {self.task_type})")
         tdd_dir = subtask_dir / "tdd"
-        tdd_agent = TDDAgent(
-            artifact_dir=tdd_dir,
-            project_root=self.project_root,
-            task_type=self.task_type,
-        )
-        tdd_result = tdd_agent.run(subtask)
-        tdd_agent.save_artifacts()
+        tdd_result = self._load_stage_result(tdd_dir)
+        if tdd_result is not None:
+            # Resuming: tests were written before the run was interrupted
+            print(f"\n[SKIP] TDD already complete for subtask {subtask_num} (status: {tdd_result['status']})")
+        else:
+            print(f"\n[TDD] Writing failing tests... (agent: {self.task_type})")
+            tdd_agent = TDDAgent(
+                artifact_dir=tdd_dir,
+                project_root=project_root,
+                task_type=self.task_type,
+                options=self.agent_options,
+                tree_lock=self.tree_lock if worktree is None else None,
+            )
+            tdd_result = await self.agent_pool.submit(tdd_agent, subtask)
+            tdd_agent.save_artifacts()
+            self._save_stage_result(tdd_dir, tdd_result)
+            self.metrics.record(
+                f"subtask-{subtask_num}/tdd", f"{tdd_agent.AGENT_FILE}:{tdd_agent.model}", tdd_result.get("metrics")
+            )
 
         # Check TDD result - must have RED verification
         tdd_status = tdd_result.get("status", "unknown")
@@ -216,16 +455,52 @@ class TaskPipeline:
 
         # Phase 3b: Executor - Implement to pass tests (only if TDD didn't fail)
         exec_result = {"status": "skipped", "artifacts": {}}
+        tree_lock_wait_ms = 0
         if not subtask_failed:
             print(f"\n[EXECUTOR] Implementing code... (agent: {self.task_type})")
             exec_dir = subtask_dir / "executor"
-            executor = ExecutorAgent(
-                artifact_dir=exec_dir,
-                project_root=self.project_root,
-                task_type=self.task_type,
-            )
-            exec_result = executor.run(subtask, test_spec)
-            executor.save_artifacts()
+            if worktree is not None and self.speculative > 1:
+                try:
+                    exec_result = await self._arun_speculative_executors(
+                        subtask, subtask_num, worktree, test_spec
+                    )
+                except WorktreeError as e:
+                    exec_result = {"status": "error", "error": f"Speculative executors failed: {e}", "artifacts": {}}
+            else:
+                tdd_session = tdd_result.get("session_id") if self.executor_session != "fresh" else None
+                executor = ExecutorAgent(
+                    artifact_dir=exec_dir,
+                    project_root=project_root,
+                    task_type=self.task_type,
+                    tdd_artifact_dir=tdd_dir,
+                    options=self.agent_options,
+                    resume_session=tdd_session,
+                    fork_session=self.executor_session == "fork",
+                )
+                if tdd_session:
+                    print(f"[EXECUTOR] Continuing TDD session {tdd_session} ({self.executor_session})")
+                # Only one Executor writes to a shared tree at a time
+                lock_requested = time.monotonic()
+                async with self._tree_writer(worktree):
+                    tree_lock_wait_ms = round((time.monotonic() - lock_requested) * 1000)
+                    exec_result = await self.agent_pool.submit(executor, subtask, test_spec)
+
+                    if tdd_session and exec_result.get("status") == "error":
+                        # The session may have expired or been removed - start fresh
+                        print("[WARN] Resuming TDD session failed, retrying with a fresh session")
+                        executor = ExecutorAgent(
+                            artifact_dir=exec_dir,
+                            project_root=project_root,
+                            task_type=self.task_type,
+                            tdd_artifact_dir=tdd_dir,
+                            options=self.agent_options,
+                        )
+                        exec_result = await self.agent_pool.submit(executor, subtask, test_spec)
+                executor.save_artifacts()
+                self.metrics.record(
+                    f"subtask-{subtask_num}/executor", f"{executor.AGENT_FILE}:{executor.model}",
+                    exec_result.get("metrics")
+                )
 
             # Check executor result
             exec_status = exec_result.get("status", "unknown")
@@ -240,9 +515,20 @@ class TaskPipeline:
             elif exec_status not in ("complete", "green_verified"):
                 print(f"\n[WARN] Executor GREEN phase not verified (status: {exec_status})")
 
+        # Merge the subtask's changes back (conflicts fail the subtask)
+        if worktree is not None:
+            self._close_test_server(worktree)
+            merge_error = await asyncio.to_thread(
+                self.worktrees.finish, worktree, subtask.get("title", "Unknown"), not subtask_failed
+            )
+            if merge_error:
+                subtask_failed = True
+                failure_reason = merge_error
+                print(f"\n[ERROR] {failure_reason}")
+
         # Update metadata
         subtask_status = "failed" if subtask_failed else "complete"
-        self.task_metadata["phases_completed"].append({
+        self._record_phase({
             "phase": f"subtask-{subtask_num}",
             "completed_at": datetime.now().isoformat(),
             "status": subtask_status,
@@ -250,9 +536,17 @@ class TaskPipeline:
             "tdd_status": tdd_result.get("status", "unknown"),
             "executor_status": exec_result.get("status", "unknown"),
             "tdd_artifacts": list(tdd_result["artifacts"].keys()),
-            "executor_artifacts": list(exec_result["artifacts"].keys())
+            "executor_artifacts": list(exec_result["artifacts"].keys()),
+            "tdd_session_id": tdd_result.get("session_id"),
+            "tdd_metrics": tdd_result.get("metrics", {}),
+            "executor_metrics": exec_result.get("metrics", {}),
+            "tdd_tests": tdd_result.get("tests"),
+            "executor_tests": exec_result.get("tests"),
+            "worktree": worktree.to_dict() if worktree else None,
+            "tree_lock_wait_ms": tree_lock_wait_ms,
+            "speculative": exec_result.get("speculative"),
+            **({"worker": self.worker_id} if self.worker_id else {})
         })
-        self._save_task_metadata()
 
         if subtask_failed:
             print(f"\n[FAILED] Subtask {subtask_num} failed: {failure_reason}")
@@ -266,6 +560,291 @@ class TaskPipeline:
             "executor": exec_result
         }
 
+    # Executor statuses in the order a speculative winner is preferred
+    # when no candidate passed GREEN verification
+    SPECULATIVE_FALLBACK_ORDER = ("green_not_verified", "timeout", "error")
+
+    async def _arun_speculative_executors(
+        self,
+        subtask: dict,
+        subtask_num: int,
+        worktree: Worktree,
+        test_spec: str,
+    ) -> dict[str, Any]:
+        """Race self.speculative Executor candidates; the first green one wins.
+
+        Each candidate works in its own checkout of the subtask worktree,
+        with its own ProcessGroup. As soon as one passes GREEN verification
+        (or finishes with verification unavailable) the others' groups are
+        terminated, which kills their CLI and test processes, and their
+        runs are cancelled and awaited (including verification threads)
+        before their checkouts are removed. The winner's changes and
+        artifacts are adopted into the subtask worktree.
+
+        Candidates always start fresh CLI sessions: a resumed TDD session
+        would point them at the subtask worktree rather than their own.
+
+        Returns:
+            The winning candidate's result, with a "speculative" summary
+
+        Raises:
+            WorktreeError: If a candidate checkout cannot be created or the
+                           winner's changes cannot be adopted
+        """
+        print(f"[EXECUTOR] Racing {self.speculative} candidates")
+        if self.executor_session != "fresh":
+            print(f"[EXECUTOR] Ignoring executor_session={self.executor_session} for speculative candidates")
+
+        candidates: list[Worktree] = []
+        try:
+            for k in range(1, self.speculative + 1):
+                candidates.append(await asyncio.to_thread(self.worktrees.create_candidate, worktree, k))
+        except WorktreeError:
+            for candidate in candidates:
+                await asyncio.to_thread(self.worktrees.discard, candidate)
+            raise
+
+        runs: dict[asyncio.Task, tuple[Worktree, ExecutorAgent]] = {}
+        groups: dict[asyncio.Task, ProcessGroup] = {}
+        started = time.monotonic()
+        for candidate in candidates:
+            candidate_dir = candidate.task_path(worktree.subtask_dir)
+            executor = ExecutorAgent(
+                artifact_dir=candidate_dir / "executor",
+                project_root=candidate.path,
+                task_type=self.task_type,
+                tdd_artifact_dir=candidate_dir / "tdd",
+                options=self.agent_options,
+            )
+            # Tasks copy the context, so the candidate's children register with its group
+            group = ProcessGroup(parent=active_process_group())
+            with group.activate():
+                task = asyncio.create_task(self.agent_pool.submit(executor, subtask, test_spec))
+            runs[task] = (candidate, executor)
+            groups[task] = group
+
+        finished: list[tuple[Worktree, ExecutorAgent, dict[str, Any]]] = []
+        winner = None
+        pending = set(runs)
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: runs[t][0].candidate):
+                    candidate, executor = runs[task]
+                    result = task.result()
+                    finished.append((candidate, executor, result))
+                    self.metrics.record(
+                        f"subtask-{subtask_num}/executor", f"{executor.AGENT_FILE}:{executor.model}",
+                        result.get("metrics")
+                    )
+                    print(f"[EXECUTOR] Candidate {candidate.candidate}: {result.get('status', 'unknown')}")
+                    if winner is None and result.get("status") in ("green_verified", "complete"):
+                        winner = finished[-1]
+        finally:
+            for task in pending:
+                groups[task].terminate(f"candidate lost the race for subtask {subtask_num}", grace_seconds=1.0)
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            for task in pending:
+                # Cancelled mid-run: keep what the CLI reported (if it finished)
+                candidate, executor = runs[task]
+                metrics = dict(executor.last_metrics or {"model": executor.model})
+                metrics.setdefault("wall_ms", round((time.monotonic() - started) * 1000))
+                metrics["status"] = "cancelled"
+                self.metrics.record(
+                    f"subtask-{subtask_num}/executor", f"{executor.AGENT_FILE}:{executor.model}", metrics
+                )
+
+        if winner is None:
+            rank = {status: i for i, status in enumerate(self.SPECULATIVE_FALLBACK_ORDER)}
+            winner = min(finished, key=lambda f: rank.get(f[2].get("status"), len(rank)))
+        candidate, executor, exec_result = winner
+        executor.save_artifacts()
+        print(f"[EXECUTOR] Keeping candidate {candidate.candidate} ({len(pending)} cancelled)")
+
+        try:
+            for other in candidates:
+                if other is not candidate:
+                    await asyncio.to_thread(self.worktrees.discard, other)
+            await asyncio.to_thread(
+                self.worktrees.adopt, worktree, candidate, subtask.get("title", "Unknown"),
+                exec_result.get("status") not in ("timeout", "error")
+            )
+        finally:
+            for other in candidates:
+                self._close_test_server(other)
+            exec_result["speculative"] = {
+                "candidates": self.speculative,
+                "winner": candidate.candidate,
+                "finished": {f[0].candidate: f[2].get("status", "unknown") for f in finished},
+                "cancelled": sorted(runs[task][0].candidate for task in pending),
+            }
+        return exec_result
+
+    def _close_test_server(self, worktree: Worktree) -> None:
+        """Shut down the vitest server of a worktree about to be removed."""
+        if self.vitest_servers is not None:
+            self.vitest_servers.close(worktree.path / "app")
+
+    def _tree_writer(self, worktree: Worktree | None) -> contextlib.AbstractAsyncContextManager:
+        """Writer lock for the Executor (a no-op in a worktree or without pipelining)."""
+        if self.tree_lock is None or worktree is not None:
+            return contextlib.nullcontext()
+        return self.tree_lock
+
+    def _setup_worktrees(self, shared: bool = False) -> int:
+        """Create the worktree manager if subtasks should be isolated.
+
+        Args:
+            shared: Other worker processes use the same worktrees (see
+                    run_worker); worktrees are then used in "auto" mode
+
+        Returns:
+            Number of subtasks that may run at once (1 if parallel runs were
+            requested but worktrees are disabled or unavailable)
+        """
+        wanted = self.worktree_mode == "always" or (
+            self.worktree_mode == "auto" and (self.parallel_subtasks > 1 or self.speculative > 1 or shared)
+        )
+        if not wanted:
+            if self.parallel_subtasks > 1:
+                # Executors would write the main checkout concurrently
+                print("[WARN] Parallel subtasks need worktrees; running subtasks one at a time")
+            if self.speculative > 1:
+                print("[WARN] Speculative executors need worktrees; running one Executor per subtask")
+            return 1
+
+        if WorktreeManager.is_available(self.project_root):
+            manager = WorktreeManager(self.project_root, self.task_dir, node_store=self.node_store, shared=shared)
+            try:
+                manager.setup()
+                self.worktrees = manager
+                print(f"Subtasks run in git worktrees under {manager.root}")
+                return self.parallel_subtasks
+            except WorktreeError as e:
+                print(f"[WARN] Could not set up worktrees: {e}")
+        else:
+            print("[WARN] Project root is not a git repository with commits; worktrees unavailable")
+
+        if self.parallel_subtasks > 1:
+            print("[WARN] Running subtasks one at a time in the main checkout")
+        if self.speculative > 1:
+            print("[WARN] Running one Executor per subtask (speculation needs worktrees)")
+        return 1
+
+    def _record_subtask_setup_failure(self, subtask_num: int, failure_reason: str) -> dict[str, Any]:
+        """Record a subtask that failed before any agent ran."""
+        print(f"\n[FAILED] Subtask {subtask_num} failed: {failure_reason}")
+        self._record_phase({
+            "phase": f"subtask-{subtask_num}",
+            "completed_at": datetime.now().isoformat(),
+            "status": "failed",
+            "failure_reason": failure_reason
+        })
+        return {"status": "failed", "failure_reason": failure_reason}
+
+    def _on_subtask_finished(self, subtask_num: int, subtask: dict, result: dict[str, Any]) -> bool:
+        """Track a finished subtask; returns True once the failure threshold is hit.
+
+        Hitting the threshold also terminates every process still running
+        for other subtasks (CLI runs and their test processes), so the
+        scheduler's cancellation does not wait on them.
+        """
+        if result.get("status") != "failed":
+            return False
+
+        self.failure_count += 1
+        self.failed_subtasks.append({
+            "subtask_num": subtask_num,
+            "title": subtask.get("title", "Unknown"),
+            "reason": result.get("failure_reason", "Unknown")
+        })
+        if not (self.max_failures > 0 and self.failure_count >= self.max_failures):
+            return False
+
+        if self.process_group is not None:
+            terminated = self.process_group.terminate(
+                f"failure threshold reached ({self.failure_count}/{self.max_failures})"
+            )
+            if terminated:
+                print(f"\n[STOP] Failure threshold reached; terminating {terminated} running process group(s)")
+        return True
+
+    def _check_agent_definitions(self) -> str | None:
+        """Load the definitions this pipeline needs into the agent registry.
+
+        Returns:
+            Error message, or None if all definitions are valid
+        """
+        agent_files = (
+            ArchitectAgent.AGENT_FILE,
+            PlannerAgent.AGENT_FILE,
+            TASK_TYPE_AGENTS.get(self.task_type, "tdd-developer"),
+        )
+        errors = []
+        for agent_file in agent_files:
+            try:
+                self.agent_registry.get(agent_file)
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                errors.append(str(e))
+        return "; ".join(errors) or None
+
+    @staticmethod
+    def _is_usable(result: dict[str, Any], required_artifact: str) -> bool:
+        """Whether a phase result can feed the next phase.
+
+        A timed-out run still counts if the artifact the next phase needs
+        was streamed out before the deadline.
+        """
+        if result.get("status") == "complete":
+            return True
+        if result.get("status") == "timeout" and required_artifact in result["artifacts"]:
+            print(f"\n[WARN] Phase timed out; continuing with salvaged {required_artifact}")
+            return True
+        return False
+
+    def _save_stage_result(self, stage_dir: Path, result: dict[str, Any]) -> None:
+        """Persist a finished agent stage so a resumed run can skip it.
+
+        Only successful stages are recorded; timeouts and errors are rerun
+        (continuing the agent's in-flight session where possible).
+        """
+        if result.get("status") in ("timeout", "error"):
+            return
+        stage_dir.mkdir(parents=True, exist_ok=True)
+        (stage_dir / self.STAGE_RESULT_FILE).write_text(json.dumps({
+            "status": result.get("status"),
+            "session_id": result.get("session_id"),
+            "artifacts": list(result["artifacts"].keys()),
+            "tests": result.get("tests"),
+            "completed_at": datetime.now().isoformat()
+        }, indent=2))
+
+    def _load_stage_result(self, stage_dir: Path) -> dict[str, Any] | None:
+        """Rebuild a result dict saved by _save_stage_result(), if any."""
+        path = stage_dir / self.STAGE_RESULT_FILE
+        if not path.exists():
+            return None
+        try:
+            saved = json.loads(path.read_text())
+        except json.JSONDecodeError:
+            return None
+
+        artifacts = {}
+        for name in saved.get("artifacts", []):
+            artifact_path = stage_dir / name
+            if artifact_path.exists():
+                artifacts[name] = artifact_path.read_text()
+
+        return {
+            "status": saved.get("status", "complete"),
+            "session_id": saved.get("session_id"),
+            "artifacts": artifacts,
+            "tests": saved.get("tests"),
+            "resumed": True
+        }
+
     def run(self, issue_content: str) -> dict[str, Any]:
         """Run the full pipeline.
 
@@ -286,6 +865,12 @@ class TaskPipeline:
         print(f"Task directory: {self.task_dir}")
         print(f"Project root: {self.project_root}")
 
+        # Parse and validate every agent definition up front
+        definition_error = self._check_agent_definitions()
+        if definition_error:
+            print(f"\nInvalid agent definitions: {definition_error}")
+            return {"status": "failed", "phase": "setup", "error": definition_error}
+
         # Load existing state if resuming
         self._load_task_metadata()
         completed_phases = {p["phase"] for p in self.task_metadata.get("phases_completed", [])}
@@ -301,7 +886,7 @@ class TaskPipeline:
         else:
             architect_result = self.run_architect(issue_content)
 
-            if architect_result.get("status") != "complete":
+            if not self._is_usable(architect_result, "analysis.md"):
                 print("\nArchitect phase failed. Stopping pipeline.")
                 return {"status": "failed", "phase": "architect", "error": architect_result}
 
@@ -319,7 +904,7 @@ class TaskPipeline:
         else:
             planner_result = self.run_planner(analysis)
 
-            if planner_result.get("status") != "complete":
+            if not self._is_usable(planner_result, "subtasks.json"):
                 print("\nPlanner phase failed. Stopping pipeline.")
                 return {"status": "failed", "phase": "planner", "error": planner_result}
 
@@ -333,55 +918,80 @@ class TaskPipeline:
         if self.max_failures > 0:
             print(f"Failure threshold: {self.max_failures} (pipeline stops if exceeded)")
 
+        # Snapshot before the long-running phase; subtasks only append
+        self._compact_task_metadata()
+
         # Phase 3: TDD + Executor loop
         print("\n" + "=" * 60)
         print("PHASE 3: TDD + EXECUTOR LOOP")
         print("=" * 60)
 
-        # Check which subtasks are already complete
-        completed_subtasks = self._get_completed_subtasks()
-
-        subtask_results = []
-        for i, subtask in enumerate(subtasks, 1):
-            if i in completed_subtasks:
+        # Subtasks run as soon as their depends_on are complete, up to
+        # parallel_subtasks at a time; finished ones are not run again
+        scheduler = SubtaskScheduler(
+            subtasks,
+            width=self.parallel_subtasks,
+            previous=self._get_subtask_statuses(),
+        )
+        for warning in scheduler.warnings:
+            print(f"[WARN] {warning}")
+        for i, status in scheduler.status.items():
+            if status.startswith("skipped"):
                 print(f"\n[SKIP] Subtask {i} already complete")
-                continue
-
-            result = self.run_subtask(subtask, i)
-            subtask_results.append(result)
-
-            # Track failures
-            if result.get("status") == "failed":
-                self.failure_count += 1
-                self.failed_subtasks.append({
-                    "subtask_num": i,
-                    "title": subtask.get("title", "Unknown"),
-                    "reason": result.get("failure_reason", "Unknown")
-                })
 
-                # Check failure threshold
-                if self.max_failures > 0 and self.failure_count >= self.max_failures:
-                    print("\n" + "=" * 60)
-                    print("PIPELINE STOPPED - FAILURE THRESHOLD EXCEEDED")
-                    print("=" * 60)
-                    print(f"\nFailed subtasks ({self.failure_count}/{self.max_failures}):")
-                    for f in self.failed_subtasks:
-                        print(f"  - Subtask {f['subtask_num']}: {f['title']}")
-                        print(f"    Reason: {f['reason']}")
-
-                    self.task_metadata["status"] = "failed_threshold"
-                    self.task_metadata["failure_count"] = self.failure_count
-                    self.task_metadata["failed_subtasks"] = self.failed_subtasks
-                    self._save_task_metadata()
+        scheduler.width = self._setup_worktrees()
+        if self.pipeline and self.worktrees is None:
+            # Two stages: one subtask's Executor plus the next one's TDD
+            self.tree_lock = asyncio.Lock()
+            scheduler.width = max(scheduler.width, 2)
+            print("Pipelined subtasks: TDD runs ahead while the Executor holds the tree")
+        if self.vitest_servers is not None and self.worktrees is None:
+            self.vitest_servers.warm(self.project_root / "app")
+        self.process_group = ProcessGroup()
+        try:
+            with self.process_group.activate():
+                subtask_results = asyncio.run(scheduler.run(self.arun_subtask, self._on_subtask_finished))
+        finally:
+            if self.vitest_servers is not None:
+                self.vitest_servers.close_all()
+            if self.worktrees is not None:
+                self.worktrees.cleanup()
+
+        self._update_task(schedule=scheduler.schedule())
+        blocked = [i for i, status in scheduler.status.items() if status == "blocked"]
+        if blocked:
+            print(f"\n[BLOCKED] Subtasks not run because a dependency failed: {blocked}")
+        cancelled = [i for i, status in scheduler.status.items() if status == "cancelled"]
+        if cancelled:
+            # Finished stages were saved; resuming reruns only what was cut short
+            print(f"\n[CANCELLED] Subtasks stopped when the failure threshold was reached: {cancelled}")
+        self._compact_task_metadata()
+
+        # Check failure threshold
+        if self.max_failures > 0 and self.failure_count >= self.max_failures:
+            print("\n" + "=" * 60)
+            print("PIPELINE STOPPED - FAILURE THRESHOLD EXCEEDED")
+            print("=" * 60)
+            print(f"\nFailed subtasks ({self.failure_count}/{self.max_failures}):")
+            for f in self.failed_subtasks:
+                print(f"  - Subtask {f['subtask_num']}: {f['title']}")
+                print(f"    Reason: {f['reason']}")
+
+            self._update_task(
+                status="failed_threshold",
+                failure_count=self.failure_count,
+                failed_subtasks=self.failed_subtasks,
+            )
+            self._compact_task_metadata()
 
-                    return {
-                        "task_dir": str(self.task_dir),
-                        "status": "failed",
-                        "reason": "failure_threshold_exceeded",
-                        "failure_count": self.failure_count,
-                        "failed_subtasks": self.failed_subtasks,
-                        "subtasks_completed": len(subtask_results) - self.failure_count
-                    }
+            return {
+                "task_dir": str(self.task_dir),
+                "status": "failed",
+                "reason": "failure_threshold_exceeded",
+                "failure_count": self.failure_count,
+                "failed_subtasks": self.failed_subtasks,
+                "subtasks_completed": len(subtask_results) - self.failure_count
+            }
 
         # Phase 4: Integration Test
         print("\n" + "=" * 60)
@@ -390,8 +1000,8 @@ class TaskPipeline:
         integration_result = self.run_integration_test(subtasks)
         if integration_result.get("status") != "passed":
             print(f"\n[FAILED] Integration test failed: {integration_result.get('error', 'unknown')}")
-            self.task_metadata["status"] = "integration_failed"
-            self._save_task_metadata()
+            self._update_task(status="integration_failed")
+            self._compact_task_metadata()
             return {
                 "task_dir": str(self.task_dir),
                 "status": "failed",
@@ -407,8 +1017,8 @@ class TaskPipeline:
         smoke_result = self.run_smoke_test()
         if smoke_result.get("status") != "passed":
             print(f"\n[FAILED] Smoke test failed: {smoke_result.get('error', 'unknown')}")
-            self.task_metadata["status"] = "smoke_test_failed"
-            self._save_task_metadata()
+            self._update_task(status="smoke_test_failed")
+            self._compact_task_metadata()
             return {
                 "task_dir": str(self.task_dir),
                 "status": "failed",
@@ -418,11 +1028,11 @@ class TaskPipeline:
             }
 
         # Update final status
-        self.task_metadata["status"] = "complete"
-        self.task_metadata["failure_count"] = self.failure_count
+        final = {"status": "complete", "failure_count": self.failure_count}
         if self.failed_subtasks:
-            self.task_metadata["failed_subtasks"] = self.failed_subtasks
-        self._save_task_metadata()
+            final["failed_subtasks"] = self.failed_subtasks
+        self._update_task(**final)
+        self._compact_task_metadata()
 
         # Generate summary
         summary = {
@@ -443,19 +1053,168 @@ class TaskPipeline:
 
         return summary
 
-    def _get_completed_subtasks(self) -> set[int]:
-        """Get set of completed subtask numbers from metadata."""
+    def run_worker(self, worker_id: str | None = None, lease_ttl: float | None = None) -> dict[str, Any]:
+        """Run Phase 3 subtasks of a planned task alongside other workers.
+
+        Workers (on this or other machines sharing the task directory) claim
+        subtasks through lease files (see LeaseManager). A subtask is claimed
+        once its dependencies are recorded as complete by any worker, and its
+        result is journaled before the lease is released. Expired leases of
+        crashed workers are reclaimed, and the new holder resumes from the
+        stages already saved. A worker that loses its lease abandons the
+        subtask.
+
+        The worker exits when no subtask is left to run (or the failure
+        threshold is reached). Integration and smoke tests are then run by
+        `run.py --task DIR --phase all`, which skips the recorded subtasks.
+
+        Every worker appends its agent invocations to the task's metrics.jsonl,
+        so metrics.json (and the returned task_metrics) cover all workers.
+
+        Args:
+            worker_id: Name recorded in leases and subtask records
+                       (default: host:pid:random)
+            lease_ttl: Seconds a lease survives without a heartbeat
+
+        Returns:
+            Summary dict with the subtasks this worker ran and the task's
+            metric totals
+        """
         self._load_task_metadata()
-        completed = set()
+        completed_phases = {p["phase"] for p in self.task_metadata.get("phases_completed", [])}
+        subtasks_path = self.task_dir / "02-planner" / "subtasks.json"
+        if "planner" not in completed_phases or not subtasks_path.exists():
+            print("\nTask has not been planned yet. Run the architect and planner phases first.")
+            return {"status": "failed", "phase": "worker", "error": "Task not planned"}
+        subtasks = json.loads(subtasks_path.read_text())
+
+        leases = LeaseManager(self.task_dir, worker_id, lease_ttl)
+        self.worker_id = leases.worker_id
+        print("\n" + "=" * 60)
+        print(f"WORKER {self.worker_id}: {len(subtasks)} subtasks in {self.task_dir}")
+        print("=" * 60)
+
+        width = self._setup_worktrees(shared=True)
+        if self.worktrees is None:
+            print("[WARN] Workers share the main checkout; run one worker per checkout")
+
+        if self.vitest_servers is not None and self.worktrees is None:
+            self.vitest_servers.warm(self.project_root / "app")
+        self.process_group = ProcessGroup()
+        try:
+            with self.process_group.activate():
+                ran, stopped = asyncio.run(self._arun_worker(subtasks, leases, width))
+        finally:
+            if self.vitest_servers is not None:
+                self.vitest_servers.close_all()
+            if self.worktrees is not None:
+                self.worktrees.cleanup()
+        # Totals over every worker's invocations, not just this one's
+        totals = self.metrics.write()["totals"]
+
+        print(f"\n[WORKER] Done: ran {len(ran)} subtask(s)" + (" (failure threshold reached)" if stopped else ""))
+        print(f"[WORKER] Task so far: {totals['invocations']} agent invocation(s), ${totals['cost_usd']:.2f}")
+        return {
+            "task_dir": str(self.task_dir),
+            "status": "failed" if stopped else "complete",
+            "worker": self.worker_id,
+            "subtasks_run": ran,
+            "task_metrics": totals,
+        }
+
+    async def _arun_worker(
+        self, subtasks: list[dict], leases: LeaseManager, width: int
+    ) -> tuple[list[dict[str, Any]], bool]:
+        """Claim and run subtasks until none is left; returns (runs, stopped)."""
+        graph = SubtaskGraph(subtasks)
+        running: dict[asyncio.Task, Lease] = {}
+        ran = []
+        stopped = False
+
+        try:
+            while True:
+                # Other workers journal their results; pick them up
+                self._load_task_metadata()
+                statuses = self._get_subtask_statuses()
+                failed = [i for i, status in statuses.items() if status == "failed"]
+                stopped = self.max_failures > 0 and len(failed) >= self.max_failures
+                if stopped:
+                    if running:
+                        terminated = self.process_group.terminate("failure threshold reached")
+                        print(f"\n[STOP] Failure threshold reached; terminating {terminated} running process group(s)")
+                    break
+
+                blocked = set().union(*(graph.blocked_by_failure(i) for i in failed if i in graph.subtasks))
+                active = {lease.subtask_num for lease in running.values()}
+                pending = [i for i in graph.subtasks if i not in statuses and i not in blocked]
+
+                for i in pending:
+                    if len(running) >= width:
+                        break
+                    if i in active or any(statuses.get(dep) != "complete" for dep in graph.dependencies[i]):
+                        continue
+                    lease = leases.try_acquire(i)
+                    if lease is None:
+                        continue
+                    lease.start_heartbeat()
+                    print(f"\n[WORKER] Claimed subtask {i}")
+                    task = asyncio.create_task(self._arun_leased_subtask(graph.subtasks[i], i, lease))
+                    running[task] = lease
+
+                if not running:
+                    if not pending:
+                        break
+                    # Remaining subtasks are leased by, or wait on, other workers
+                    await asyncio.sleep(self.WORKER_POLL_SECONDS)
+                    continue
+
+                # Wake up for finished subtasks, and poll for newly claimable ones
+                done, _ = await asyncio.wait(
+                    running, timeout=self.WORKER_POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    lease = running.pop(task)
+                    lease.release()
+                    result = task.result()
+                    ran.append({"subtask": lease.subtask_num, "status": result.get("status")})
+        finally:
+            for task, lease in running.items():
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            for lease in running.values():
+                lease.release()
+        return ran, stopped
+
+    async def _arun_leased_subtask(self, subtask: dict, subtask_num: int, lease: Lease) -> dict[str, Any]:
+        """Run a subtask, abandoning it if the lease is lost."""
+        run = asyncio.create_task(self.arun_subtask(subtask, subtask_num))
+        try:
+            while not run.done():
+                await asyncio.wait({run}, timeout=1)
+                if lease.lost.is_set() and not run.done():
+                    print(f"\n[WORKER] Lost the lease on subtask {subtask_num}; abandoning it")
+                    run.cancel()
+                    await asyncio.gather(run, return_exceptions=True)
+                    return {"status": "abandoned"}
+            return run.result()
+        except asyncio.CancelledError:
+            run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+            raise
+
+    def _get_subtask_statuses(self) -> dict[int, str]:
+        """Map subtask numbers recorded in metadata to their final status."""
+        statuses = {}
         for phase in self.task_metadata.get("phases_completed", []):
             phase_name = phase.get("phase", "")
             if phase_name.startswith("subtask-"):
                 try:
                     num = int(phase_name.split("-")[1])
-                    completed.add(num)
+                    statuses[num] = phase.get("status", "complete")
                 except (IndexError, ValueError):
                     pass
-        return completed
+        return statuses
 
     def _parse_subtasks(self, planner_result: dict[str, Any]) -> list[dict]:
         """Parse subtasks from planner output.
@@ -499,80 +1258,143 @@ class TaskPipeline:
             Result dict with status and any errors
         """
         print("\nRunning integration tests...")
+        integration_dir = self.task_dir / "04-integration"
 
-        # Determine test command based on task type
-        if self.task_type == "app":
-            # TypeScript/React/Convex - run vitest
-            test_cmd = ["npm", "run", "test"]
-            test_dir = self.project_root / "app"
-        else:
-            # Infrastructure - run bats or bash tests
-            test_cmd = ["bash", "-c", "find . -name '*.test.sh' -exec bash {} \\;"]
-            test_dir = self.task_dir
+        if self.task_type != "app":
+            # Infrastructure - every subtask's bash tests, concurrently
+            return self._run_bash_integration_tests(integration_dir)
+
+        # TypeScript/React/Convex - run vitest (the JSON report has the per-test results)
+        vitest_report = integration_dir / "vitest-report.json"
+        test_cmd = [
+            "npm", "run", "test", "--",
+            "--reporter=default", "--reporter=json", f"--outputFile={vitest_report}",
+        ]
+        test_dir = self.project_root / "app"
 
         try:
-            result = subprocess.run(
+            vitest_report.unlink(missing_ok=True)
+            # Output is streamed to test-output.txt, only the tail is kept in memory
+            result = run_process(
                 test_cmd,
-                capture_output=True,
-                text=True,
+                cwd=test_dir,
                 timeout=300,  # 5 minute timeout for integration tests
-                cwd=str(test_dir)
+                log_path=integration_dir / "test-output.txt"
             )
-
-            # Save test output
-            integration_dir = self.task_dir / "04-integration"
-            integration_dir.mkdir(parents=True, exist_ok=True)
-            (integration_dir / "test-output.txt").write_text(
-                f"STDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}"
+            if result.timed_out:
+                raise subprocess.TimeoutExpired(test_cmd, 300)
+
+            # Not written if the test script is not vitest
+            test_results = read_vitest_report(vitest_report, str(result.stdout_path))
+            tests = (
+                write_test_results(test_results, integration_dir / "test-results.json", root=test_dir)
+                if test_results else None
             )
 
             if result.returncode == 0:
                 print("[OK] Integration tests passed")
-                self.task_metadata["phases_completed"].append({
+                self._record_phase({
                     "phase": "integration",
                     "completed_at": datetime.now().isoformat(),
-                    "status": "passed"
+                    "status": "passed",
+                    "tests": tests
                 })
-                self._save_task_metadata()
-                return {"status": "passed"}
+                return {"status": "passed", "tests": tests}
             else:
                 print(f"[FAILED] Integration tests failed (exit code {result.returncode})")
-                self.task_metadata["phases_completed"].append({
+                self._record_phase({
                     "phase": "integration",
                     "completed_at": datetime.now().isoformat(),
                     "status": "failed",
-                    "exit_code": result.returncode
+                    "exit_code": result.returncode,
+                    "tests": tests
                 })
-                self._save_task_metadata()
                 return {
                     "status": "failed",
                     "error": f"Tests exited with code {result.returncode}",
-                    "stdout": result.stdout[-2000:] if result.stdout else "",
-                    "stderr": result.stderr[-2000:] if result.stderr else ""
+                    "tests": tests,
+                    "stdout": result.stdout_tail[-2000:],
+                    "stderr": result.stderr_tail[-2000:],
+                    "log": str(result.stdout_path)
                 }
 
         except subprocess.TimeoutExpired:
             print("[TIMEOUT] Integration tests timed out")
-            self.task_metadata["phases_completed"].append({
+            self._record_phase({
                 "phase": "integration",
                 "completed_at": datetime.now().isoformat(),
                 "status": "timeout"
             })
-            self._save_task_metadata()
             return {"status": "failed", "error": "Integration tests timed out after 5 minutes"}
 
         except FileNotFoundError as e:
             print(f"[WARN] Could not run integration tests: {e}")
             # Don't fail if tests can't be found - just warn
-            self.task_metadata["phases_completed"].append({
+            self._record_phase({
                 "phase": "integration",
                 "completed_at": datetime.now().isoformat(),
                 "status": "skipped",
                 "reason": str(e)
             })
-            self._save_task_metadata()
             return {"status": "passed", "warning": f"Tests skipped: {e}"}
 
+    # Seconds each infrastructure test file may run in the integration phase
+    INTEGRATION_TEST_TIMEOUT_SECONDS = 300
+
+    def _run_bash_integration_tests(self, integration_dir: Path) -> dict[str, Any]:
+        """Run every *.test.sh in the task directory, one process per file.
+
+        Each file's exit code counts (a failing file fails the phase); the
+        per-file results are aggregated into test-report.json/.tap and the
+        per-test ones written to test-results.json.
+        """
+        test_files = sorted(self.task_dir.rglob("*.test.sh"))
+        if not test_files:
+            print("[WARN] No *.test.sh files found; nothing to run")
+            self._record_phase({
+                "phase": "integration",
+                "completed_at": datetime.now().isoformat(),
+                "status": "skipped",
+                "reason": "No *.test.sh files found"
+            })
+            return {"status": "passed", "warning": "No *.test.sh files found"}
+
+        results = run_bash_tests(
+            test_files,
+            cwd=self.task_dir,
+            timeout=self.INTEGRATION_TEST_TIMEOUT_SECONDS,
+            log_dir=integration_dir / "logs",
+            log_prefix="integration",
+        )
+        report_path = integration_dir / "test-report.json"
+        summary = write_test_report(results, report_path, root=self.task_dir)
+        tests = write_test_results(results, integration_dir / "test-results.json", root=self.task_dir)
+        failed = [r["file"] for r in results if not r.get("passed")]
+
+        self._record_phase({
+            "phase": "integration",
+            "completed_at": datetime.now().isoformat(),
+            "status": "failed" if failed else "passed",
+            "summary": summary,
+            "tests": tests,
+            "report": str(report_path)
+        })
+        if not failed:
+            print(f"[OK] Integration tests passed ({summary['files']} test files)")
+            return {"status": "passed", "summary": summary, "tests": tests}
+
+        print(f"[FAILED] Integration tests failed: {len(failed)} of {len(results)} test files")
+        for path in failed:
+            print(f"  - {Path(path).relative_to(self.task_dir)}")
+        return {
+            "status": "failed",
+            "error": f"{len(failed)} of {len(results)} test files failed",
+            "failed_files": failed,
+            "summary": summary,
+            "tests": tests,
+            "log": str(report_path)
+        }
+
     def run_smoke_test(self) -> dict[str, Any]:
         """Run smoke test to validate the actual deliverable works.
 
@@ -598,51 +1420,46 @@ class TaskPipeline:
             # Run the custom smoke test
             print(f"Running custom smoke test: {smoke_script}")
             try:
-                result = subprocess.run(
+                result = run_process(
                     ["bash", str(smoke_script)],
-                    capture_output=True,
-                    text=True,
+                    cwd=self.project_root,
                     timeout=120,  # 2 minute timeout
-                    cwd=str(self.project_root)
-                )
-
-                (smoke_dir / "smoke-output.txt").write_text(
-                    f"STDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}"
+                    log_path=smoke_dir / "smoke-output.txt"
                 )
+                if result.timed_out:
+                    raise subprocess.TimeoutExpired(["bash", str(smoke_script)], 120)
 
                 if result.returncode == 0:
                     print("[OK] Smoke test passed")
-                    self.task_metadata["phases_completed"].append({
+                    self._record_phase({
                         "phase": "smoke_test",
                         "completed_at": datetime.now().isoformat(),
                         "status": "passed"
                     })
-                    self._save_task_metadata()
                     return {"status": "passed"}
                 else:
                     print(f"[FAILED] Smoke test failed (exit {result.returncode})")
-                    self.task_metadata["phases_completed"].append({
+                    self._record_phase({
                         "phase": "smoke_test",
                         "completed_at": datetime.now().isoformat(),
                         "status": "failed",
                         "exit_code": result.returncode
                     })
-                    self._save_task_metadata()
                     return {
                         "status": "failed",
                         "error": f"Smoke test exited with code {result.returncode}",
-                        "stdout": result.stdout[-1000:] if result.stdout else "",
-                        "stderr": result.stderr[-1000:] if result.stderr else ""
+                        "stdout": result.stdout_tail[-1000:],
+                        "stderr": result.stderr_tail[-1000:],
+                        "log": str(result.stdout_path)
                     }
 
             except subprocess.TimeoutExpired:
                 print("[TIMEOUT] Smoke test timed out")
-                self.task_metadata["phases_completed"].append({
+                self._record_phase({
                     "phase": "smoke_test",
                     "completed_at": datetime.now().isoformat(),
                     "status": "timeout"
                 })
-                self._save_task_metadata()
                 return {"status": "failed", "error": "Smoke test timed out after 2 minutes"}
 
         else:
@@ -655,13 +1472,12 @@ class TaskPipeline:
                     print(f"[INFO] No smoke test defined. Consider adding {self.task_dir}/smoke-test.sh")
 
             print("[SKIP] No smoke test defined - skipping")
-            self.task_metadata["phases_completed"].append({
+            self._record_phase({
                 "phase": "smoke_test",
                 "completed_at": datetime.now().isoformat(),
                 "status": "skipped",
                 "reason": "No smoke-test.sh found"
             })
-            self._save_task_metadata()
             return {"status": "passed", "warning": "No smoke test defined"}
 
 
@@ -707,3 +1523,21 @@ def create_task_dir(issue_number: int, title_slug: str, base_dir: Path | None =
 
     task_dir.mkdir(parents=True, exist_ok=True)
     return task_dir
+
+
+def slugify(text: str) -> str:
+    """Convert text to a URL-friendly slug."""
+    # Lowercase and replace spaces/special chars with hyphens
+    slug = text.lower()
+    slug = re.sub(r'[^\w\s-]', '', slug)
+    slug = re.sub(r'[\s_]+', '-', slug)
+    slug = re.sub(r'-+', '-', slug)
+    return slug.strip('-')[:50]
+
+
+def extract_title_from_issue(issue_content: str) -> str:
+    """Extract title from GitHub issue output."""
+    for line in issue_content.split('\n'):
+        if line.startswith('title:'):
+            return line.split(':', 1)[1].strip()
+    return "untitled"
@@ -16,6 +16,19 @@ Usage:
 
     # Specify project root (default: current directory)
     python run.py --issue 48 --project-root /path/to/project
+
+    # Spread a planned task's subtasks over several workers (shared filesystem)
+    python run.py --task tasks/00048-agent-init-overhaul/ --worker
+
+    # Process every issue dropped into spool/incoming/ (*.md or {"issue": N} *.json)
+    python run.py --daemon spool/ --max-tasks 2 --max-concurrency 4
+
+    # Share at most 4 CLI processes / 30 starts a minute with every pipeline on this machine
+    python run.py --issue 48 --cli-slots 4 --cli-rpm 30
+
+    # Replay recorded agent transcripts (offline benchmarking, see fake_claude.py)
+    FAKE_CLAUDE_DIR=bench/transcripts python run.py --file issue.md --phase all \
+        --claude-bin ./fake_claude.py
 """
 
 import argparse
@@ -25,30 +38,61 @@ from pathlib import Path
 # Add this package to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
+from agents.limiter import CLILimiter
 from orchestrator import (
     TaskPipeline,
     fetch_github_issue,
     create_task_dir,
+    extract_title_from_issue,
+    slugify,
 )
 
 
-def slugify(text: str) -> str:
-    """Convert text to a URL-friendly slug."""
-    import re
-    # Lowercase and replace spaces/special chars with hyphens
-    slug = text.lower()
-    slug = re.sub(r'[^\w\s-]', '', slug)
-    slug = re.sub(r'[\s_]+', '-', slug)
-    slug = re.sub(r'-+', '-', slug)
-    return slug.strip('-')[:50]
-
+def cli_limiter(args: argparse.Namespace) -> CLILimiter | None:
+    """Machine-wide CLI limiter from --cli-slots/--cli-rpm (None: use the environment)."""
+    if args.cli_slots is None and args.cli_rpm is None:
+        return None
+    return CLILimiter(max_concurrent=args.cli_slots, requests_per_minute=args.cli_rpm)
+
+
+def run_daemon(args: argparse.Namespace, project_root: Path) -> None:
+    """Serve the spool directory until stopped (SIGTERM/Ctrl-C) or drained (--once)."""
+    import signal
+    from daemon import TaskDaemon
+
+    pipeline_options = {
+        "max_failures": args.max_failures,
+        "stream": args.stream,
+        "claude_bin": args.claude_bin,
+        "executor_session": args.executor_session,
+        "max_retries": args.max_retries,
+        "adaptive_timeouts": not args.fixed_timeouts,
+        "parallel_subtasks": args.parallel_subtasks,
+        "pipeline": args.pipeline,
+        "speculative": args.speculative,
+        "cli_limiter": cli_limiter(args),
+        "vitest_server": not args.no_vitest_server,
+    }
+    if args.worktrees != "auto":
+        pipeline_options["worktrees"] = args.worktrees
+
+    daemon = TaskDaemon(
+        spool_dir=args.daemon,
+        project_root=project_root,
+        tasks_dir=project_root / args.tasks_dir,
+        max_tasks=args.max_tasks,
+        max_concurrency=args.max_concurrency,
+        task_type=args.task_type,
+        use_cache=not args.no_cache,
+        pipeline_options=pipeline_options,
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    records = daemon.serve(once=args.once)
 
-def extract_title_from_issue(issue_content: str) -> str:
-    """Extract title from GitHub issue output."""
-    for line in issue_content.split('\n'):
-        if line.startswith('title:'):
-            return line.split(':', 1)[1].strip()
-    return "untitled"
+    print("\n" + "-" * 40)
+    print(f"Daemon processed {len(records)} job(s):")
+    for record in records:
+        print(f"  {record['job']}: {record['result'].get('status', 'unknown')}")
 
 
 def main():
@@ -74,6 +118,12 @@ def main():
         type=str,
         help="Path to issue/task file (markdown)"
     )
+    input_group.add_argument(
+        "--daemon",
+        type=str,
+        metavar="SPOOL_DIR",
+        help="Run as a daemon processing the issues queued in SPOOL_DIR/incoming/"
+    )
 
     # Default project root is 2 levels up from this script (tools/task-pipeline -> project root)
     default_project_root = str(Path(__file__).parent.parent.parent)
@@ -128,10 +178,151 @@ def main():
         help="Maximum subtask failures before stopping pipeline (0=unlimited, default: 3)"
     )
 
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=3,
+        help="Maximum concurrent claude CLI processes (default: 3)"
+    )
+
+    parser.add_argument(
+        "--cli-slots",
+        type=int,
+        help="Machine-wide cap on claude CLI processes, shared with every other pipeline "
+             "(default: $TASK_PIPELINE_CLI_SLOTS, unlimited if unset)"
+    )
+
+    parser.add_argument(
+        "--cli-rpm",
+        type=float,
+        help="Machine-wide cap on claude CLI starts per minute "
+             "(default: $TASK_PIPELINE_CLI_RPM, unlimited if unset)"
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream agent output and save each artifact as soon as it is complete"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the agent response and test result caches: always call the Claude CLI "
+             "and run verification tests"
+    )
+
+    parser.add_argument(
+        "--no-vitest-server",
+        action="store_true",
+        help="Run each RED/GREEN verification with a new 'npx vitest run' instead of a "
+             "warm vitest process kept for the whole run (app tasks)"
+    )
+
+    parser.add_argument(
+        "--claude-bin",
+        type=str,
+        default=None,
+        help="Claude CLI executable (default: $TASK_PIPELINE_CLAUDE_BIN or 'claude')"
+    )
+
+    parser.add_argument(
+        "--executor-session",
+        type=str,
+        choices=["fresh", "resume", "fork"],
+        default="fresh",
+        help="Executor reuses the TDD agent's CLI session: 'resume' continues it, "
+             "'fork' branches from it, 'fresh' starts a new one (default: fresh)"
+    )
+
+    parser.add_argument(
+        "--parallel-subtasks",
+        type=int,
+        default=1,
+        help="Run up to N subtasks at once, each starting when its depends_on are done (default: 1)"
+    )
+
+    parser.add_argument(
+        "--worktrees",
+        type=str,
+        choices=["auto", "always", "never"],
+        default="auto",
+        help="Run each subtask in its own git worktree and merge results back "
+             "(default: auto, i.e. when --parallel-subtasks > 1 or --speculative > 1)"
+    )
+
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Overlap stages in the main checkout: the next independent subtask's TDD "
+             "runs while the current Executor works (one writer at a time)"
+    )
+
+    parser.add_argument(
+        "--speculative",
+        type=int,
+        default=1,
+        metavar="K",
+        help="Race K Executor candidates per subtask in separate worktrees and keep "
+             "the first whose GREEN verification passes (default: 1)"
+    )
+
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="With --task: claim and run subtasks of an already planned task through lease "
+             "files, alongside other workers sharing the task directory"
+    )
+
+    parser.add_argument(
+        "--worker-id",
+        type=str,
+        help="Worker name recorded in leases and subtask records (default: host:pid:random)"
+    )
+
+    parser.add_argument(
+        "--lease-ttl",
+        type=float,
+        help="Seconds a worker's subtask lease survives without a heartbeat (default: 120)"
+    )
+
+    parser.add_argument(
+        "--max-tasks",
+        type=int,
+        default=2,
+        help="With --daemon: tasks run at once; --max-concurrency then caps CLI "
+             "processes across all of them (default: 2)"
+    )
+
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="With --daemon: exit once the queue is empty"
+    )
+
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=2,
+        help="Retries for transient Claude CLI failures such as rate limits (default: 2)"
+    )
+
+    parser.add_argument(
+        "--fixed-timeouts",
+        action="store_true",
+        help="Use each agent's fixed timeout instead of one derived from earlier run durations"
+    )
+
     args = parser.parse_args()
+    if args.worker and not args.task:
+        parser.error("--worker requires --task")
 
     project_root = Path(args.project_root).resolve()
 
+    if args.daemon:
+        run_daemon(args, project_root)
+        return
+
     # Determine task directory and issue content
     if args.issue:
         # Check for existing task directory with this issue number
@@ -231,9 +422,24 @@ def main():
         project_root=project_root,
         task_type=args.task_type,
         max_failures=args.max_failures,
+        max_concurrency=args.max_concurrency,
+        stream=args.stream,
+        use_cache=not args.no_cache,
+        claude_bin=args.claude_bin,
+        executor_session=args.executor_session,
+        max_retries=args.max_retries,
+        adaptive_timeouts=not args.fixed_timeouts,
+        parallel_subtasks=args.parallel_subtasks,
+        worktrees=args.worktrees,
+        pipeline=args.pipeline,
+        speculative=args.speculative,
+        cli_limiter=cli_limiter(args),
+        vitest_server=not args.no_vitest_server,
     )
 
-    if args.phase == "architect":
+    if args.worker:
+        result = pipeline.run_worker(worker_id=args.worker_id, lease_ttl=args.lease_ttl)
+    elif args.phase == "architect":
         result = pipeline.run_architect(issue_content)
     else:
         result = pipeline.run(issue_content)
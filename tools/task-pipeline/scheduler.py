@@ -0,0 +1,246 @@
+"""Dependency-graph scheduler for Phase 3 subtasks.
+
+The Planner emits `depends_on` for every subtask. SubtaskScheduler starts
+each subtask as soon as all of its dependencies have completed, running up
+to `width` subtasks at once. Dependents of a failed subtask are marked
+blocked instead of being run against a broken base. When the caller asks
+to stop (failure threshold), subtasks still running are cancelled.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+# Runs one subtask: (subtask, subtask_num) -> result dict with "status"
+SubtaskRunner = Callable[[dict, int], Awaitable[dict[str, Any]]]
+
+# Called after each subtask finishes; returns True to stop the run
+FinishCallback = Callable[[int, dict, dict[str, Any]], bool]
+
+
+class SubtaskGraph:
+    """Subtask dependency graph, keyed by 1-based position in subtasks.json.
+
+    `depends_on` entries refer to each subtask's "number" field (falling
+    back to its position). Problems are repaired rather than fatal and
+    reported in `warnings`:
+
+    - Dependencies on unknown subtasks are dropped.
+    - Cycles are broken by dropping, for the subtasks involved, any
+      dependency on a subtask listed at or after them - i.e. the original
+      list order (the order subtasks used to run in) wins.
+    """
+
+    def __init__(self, subtasks: list[dict]):
+        self.subtasks = {i: subtask for i, subtask in enumerate(subtasks, 1)}
+        self.warnings: list[str] = []
+
+        by_number = {}
+        for i, subtask in self.subtasks.items():
+            by_number.setdefault(subtask.get("number", i), i)
+
+        self.dependencies: dict[int, set[int]] = {}
+        for i, subtask in self.subtasks.items():
+            deps = set()
+            for ref in subtask.get("depends_on") or []:
+                dep = by_number.get(ref)
+                if dep is None:
+                    self.warnings.append(f"Subtask {i} depends on unknown subtask {ref!r} (ignored)")
+                elif dep == i:
+                    self.warnings.append(f"Subtask {i} depends on itself (ignored)")
+                else:
+                    deps.add(dep)
+            self.dependencies[i] = deps
+
+        self._break_cycles()
+
+        self.dependents: dict[int, set[int]] = {i: set() for i in self.subtasks}
+        for i, deps in self.dependencies.items():
+            for dep in deps:
+                self.dependents[dep].add(i)
+
+    def _unordered(self) -> set[int]:
+        """Subtasks that cannot be topologically ordered (in or behind a cycle)."""
+        remaining = {i: set(deps) for i, deps in self.dependencies.items()}
+        ready = [i for i, deps in remaining.items() if not deps]
+        while ready:
+            node = ready.pop()
+            del remaining[node]
+            for i, deps in remaining.items():
+                if node in deps:
+                    deps.discard(node)
+                    if not deps:
+                        ready.append(i)
+        return set(remaining)
+
+    def _break_cycles(self) -> None:
+        unordered = self._unordered()
+        if not unordered:
+            return
+        for i in sorted(unordered):
+            forward = {dep for dep in self.dependencies[i] if dep in unordered and dep > i}
+            if forward:
+                self.dependencies[i] -= forward
+                self.warnings.append(
+                    f"Dependency cycle: subtask {i} no longer waits for {sorted(forward)} (list order used)"
+                )
+
+    def blocked_by_failure(self, failed: int) -> set[int]:
+        """All subtasks that (transitively) depend on a failed one."""
+        blocked: set[int] = set()
+        stack = [failed]
+        while stack:
+            for dependent in self.dependents[stack.pop()]:
+                if dependent not in blocked:
+                    blocked.add(dependent)
+                    stack.append(dependent)
+        return blocked
+
+
+class SubtaskScheduler:
+    """Runs a SubtaskGraph with bounded concurrency.
+
+    Usage:
+        scheduler = SubtaskScheduler(subtasks, width=3)
+        results = asyncio.run(scheduler.run(pipeline.arun_subtask, on_finished))
+        task_metadata["schedule"] = scheduler.schedule()
+    """
+
+    def __init__(
+        self,
+        subtasks: list[dict],
+        width: int = 1,
+        previous: dict[int, str] | None = None,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            subtasks: Subtask dicts from the planner's subtasks.json
+            width: Maximum number of subtasks running at once
+            previous: Status of subtasks finished by an earlier run
+                      ("complete" satisfies dependents, anything else
+                      blocks them); these are not run again
+        """
+        if width < 1:
+            raise ValueError("width must be at least 1")
+        self.graph = SubtaskGraph(subtasks)
+        self.width = width
+        self.status: dict[int, str] = {i: "pending" for i in self.graph.subtasks}
+        self.blocked_by: dict[int, int] = {}
+        self.timings: dict[int, dict[str, Any]] = {}
+        self.max_running = 0
+        self._started = time.monotonic()
+
+        for i, status in (previous or {}).items():
+            if i in self.status:
+                self.status[i] = "skipped" if status == "complete" else f"skipped_{status}"
+                if status != "complete":
+                    self._block_dependents(i)
+
+    @property
+    def warnings(self) -> list[str]:
+        return self.graph.warnings
+
+    def _satisfied(self, i: int) -> bool:
+        return self.status[i] in ("complete", "skipped")
+
+    def _block_dependents(self, failed: int) -> None:
+        for dependent in sorted(self.graph.blocked_by_failure(failed)):
+            if self.status[dependent] == "pending":
+                self.status[dependent] = "blocked"
+                self.blocked_by[dependent] = failed
+
+    def _ready(self) -> list[int]:
+        """Pending subtasks whose dependencies are all satisfied, in list order."""
+        return [
+            i for i, status in self.status.items()
+            if status == "pending" and all(self._satisfied(dep) for dep in self.graph.dependencies[i])
+        ]
+
+    async def run(
+        self,
+        run_subtask: SubtaskRunner,
+        on_finished: FinishCallback | None = None,
+    ) -> list[dict[str, Any]]:
+        """Run all runnable subtasks.
+
+        Args:
+            run_subtask: Coroutine function running one subtask
+            on_finished: Called with (subtask_num, subtask, result) after
+                         each subtask; returning True stops the scheduler:
+                         no further subtasks start and running ones are
+                         cancelled (status "cancelled")
+
+        Returns:
+            Results of the subtasks that finished, in completion order
+        """
+        running: dict[asyncio.Task, int] = {}
+        results = []
+        stopping = False
+
+        try:
+            while True:
+                if not stopping:
+                    for i in self._ready()[:self.width - len(running)]:
+                        self.status[i] = "running"
+                        self.timings[i] = {
+                            "started_at": datetime.now().isoformat(),
+                            "start_offset_ms": round((time.monotonic() - self._started) * 1000),
+                        }
+                        task = asyncio.create_task(run_subtask(self.graph.subtasks[i], i))
+                        running[task] = i
+                    self.max_running = max(self.max_running, len(running))
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: running[t]):
+                    i = running.pop(task)
+                    result = task.result()
+                    results.append(result)
+
+                    status = "failed" if result.get("status") == "failed" else "complete"
+                    self.status[i] = status
+                    self.timings[i]["finished_at"] = datetime.now().isoformat()
+                    self.timings[i]["end_offset_ms"] = round((time.monotonic() - self._started) * 1000)
+                    if status == "failed":
+                        self._block_dependents(i)
+
+                    if on_finished and on_finished(i, self.graph.subtasks[i], result):
+                        stopping = True
+
+                if stopping:
+                    break
+        finally:
+            for task, i in running.items():
+                task.cancel()
+                self.status[i] = "cancelled"
+                self.timings[i]["finished_at"] = datetime.now().isoformat()
+                self.timings[i]["end_offset_ms"] = round((time.monotonic() - self._started) * 1000)
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        for i, status in self.status.items():
+            if status == "pending":
+                self.status[i] = "not_started"
+        return results
+
+    def schedule(self) -> dict[str, Any]:
+        """The schedule as run, for task.json."""
+        return {
+            "width": self.width,
+            "max_running": self.max_running,
+            "warnings": self.warnings,
+            "subtasks": [
+                {
+                    "subtask": i,
+                    "depends_on": sorted(self.graph.dependencies[i]),
+                    "status": self.status[i],
+                    **({"blocked_by": self.blocked_by[i]} if i in self.blocked_by else {}),
+                    **self.timings.get(i, {}),
+                }
+                for i in self.graph.subtasks
+            ],
+        }
@@ -1,3 +1,4 @@
 from tools.file_ops import FileTools
+from tools.process import ProcessCancelled, ProcessGroup, ProcessResult, run_process, arun_process
 
-__all__ = ["FileTools"]
+__all__ = ["FileTools", "ProcessCancelled", "ProcessGroup", "ProcessResult", "run_process", "arun_process"]
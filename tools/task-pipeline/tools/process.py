@@ -0,0 +1,510 @@
+"""Subprocess runner with bounded-memory output capture.
+
+`subprocess.run(..., capture_output=True)` keeps a child's entire output in
+memory, which adds up for verbose vitest runs and long agent transcripts.
+The runners here stream stdout/stderr to log files as they arrive and keep
+only the last few KB of each in memory for error reporting.
+
+Every child starts in its own process group, so killing it also kills what
+it spawned (vitest workers, commands run by bash tests). Children started
+while a ProcessGroup is active are tracked by it and can all be terminated
+at once when a pipeline gives up.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import os
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Callable
+
+# Bytes of each stream kept in memory
+DEFAULT_TAIL_BYTES = 64 * 1024
+
+# Read size for child output
+CHUNK_SIZE = 64 * 1024
+
+
+class ProcessCancelled(Exception):
+    """A child was not started, or was killed, because its ProcessGroup was terminated."""
+
+
+class ProcessGroup:
+    """The child processes of one pipeline run, terminated as a unit.
+
+    Activation is tracked in a context variable, which asyncio tasks and
+    asyncio.to_thread() inherit, so run_process() calls made on behalf of a
+    pipeline (including from agent verification threads) register with it.
+
+    A group may have a parent: its children are then also tracked by the
+    parent, so terminating the parent terminates them too, while the group
+    itself can be terminated on its own (e.g. one speculative candidate).
+
+    Usage:
+        group = ProcessGroup()
+        with group.activate():
+            asyncio.run(...)           # children register with the group
+        ...
+        group.terminate("failure threshold reached")   # from inside the run
+    """
+
+    # Seconds between SIGTERM and SIGKILL in terminate()
+    DEFAULT_GRACE_SECONDS = 5.0
+
+    def __init__(self, parent: "ProcessGroup | None" = None):
+        self.parent = parent
+        self._cancelled = False
+        self._reason: str | None = None
+        self._pids: set[int] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def reason(self) -> str | None:
+        if self._cancelled or self.parent is None:
+            return self._reason
+        return self.parent.reason
+
+    @contextlib.contextmanager
+    def activate(self):
+        token = _active_group.set(self)
+        try:
+            yield self
+        finally:
+            _active_group.reset(token)
+
+    def add(self, pid: int) -> None:
+        """Track a started child (killed at once if the group was terminated).
+
+        Raises:
+            ProcessCancelled: If the group has been terminated
+        """
+        with self._lock:
+            cancelled = self._cancelled
+            if not cancelled:
+                self._pids.add(pid)
+        if cancelled:
+            _kill_group(pid, signal.SIGKILL)
+            raise ProcessCancelled(self.reason or "process group terminated")
+        if self.parent is not None:
+            try:
+                self.parent.add(pid)  # kills the child if the parent was terminated
+            except ProcessCancelled:
+                with self._lock:
+                    self._pids.discard(pid)
+                raise
+
+    def discard(self, pid: int) -> None:
+        with self._lock:
+            self._pids.discard(pid)
+        if self.parent is not None:
+            self.parent.discard(pid)
+
+    def check(self) -> None:
+        """Raise ProcessCancelled if the group has been terminated."""
+        if self.cancelled:
+            raise ProcessCancelled(self.reason or "process group terminated")
+
+    def terminate(self, reason: str, grace_seconds: float | None = None) -> int:
+        """SIGTERM every running child's process group, SIGKILL after a grace period.
+
+        Does not block: the SIGKILL is sent from a timer thread. Children
+        started afterwards are refused (ProcessCancelled).
+
+        Returns:
+            Number of process groups signalled
+        """
+        grace = self.DEFAULT_GRACE_SECONDS if grace_seconds is None else grace_seconds
+        with self._lock:
+            self._cancelled = True
+            self._reason = reason
+            pids = sorted(self._pids)
+
+        for pid in pids:
+            _kill_group(pid, signal.SIGTERM)
+        if pids:
+            # Also catches grandchildren that outlive the group leader
+            timer = threading.Timer(grace, lambda: [_kill_group(pid, signal.SIGKILL) for pid in pids])
+            timer.daemon = True
+            timer.start()
+        return len(pids)
+
+
+_active_group: contextvars.ContextVar[ProcessGroup | None] = contextvars.ContextVar(
+    "task_pipeline_process_group", default=None
+)
+
+
+def active_process_group() -> ProcessGroup | None:
+    """The ProcessGroup children started from this context register with."""
+    return _active_group.get()
+
+
+def _kill_group(pid: int, sig: int) -> None:
+    """Signal a child's process group (its pid, see start_new_session)."""
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class OutputTail:
+    """Ring buffer holding the last max_bytes of a byte stream."""
+
+    def __init__(self, max_bytes: int = DEFAULT_TAIL_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._buffer = bytearray()
+
+    def append(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+        self._buffer += chunk[-self.max_bytes:]
+        overflow = len(self._buffer) - self.max_bytes
+        if overflow > 0:
+            del self._buffer[:overflow]
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > len(self._buffer)
+
+    def text(self) -> str:
+        return self._buffer.decode(errors="replace")
+
+
+class LineSplitter:
+    """Reassembles lines from arbitrary chunks and hands them to a callback."""
+
+    def __init__(self, on_line: Callable[[str], None]):
+        self.on_line = on_line
+        self._pending = bytearray()
+
+    def feed(self, chunk: bytes) -> None:
+        self._pending += chunk
+        start = 0
+        while True:
+            end = self._pending.find(b"\n", start)
+            if end == -1:
+                break
+            self.on_line(self._pending[start:end + 1].decode(errors="replace"))
+            start = end + 1
+        del self._pending[:start]
+
+    def close(self) -> None:
+        if self._pending:
+            self.on_line(self._pending.decode(errors="replace"))
+            self._pending.clear()
+
+
+class ProcessResult:
+    """Outcome of run_process() / arun_process().
+
+    Only the tails of stdout/stderr are held in memory; the full output is
+    in the log files (if any were requested).
+    """
+
+    def __init__(
+        self,
+        cmd: list[str],
+        returncode: int | None,
+        timed_out: bool,
+        duration_ms: float,
+        spawn_ms: float,
+        stdout: OutputTail,
+        stderr: OutputTail,
+        stdout_path: Path | None,
+        stderr_path: Path | None,
+    ):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.timed_out = timed_out
+        self.duration_ms = duration_ms
+        self.spawn_ms = spawn_ms
+        self.stdout_tail = stdout.text()
+        self.stderr_tail = stderr.text()
+        self.stdout_bytes = stdout.total_bytes
+        self.stderr_bytes = stderr.total_bytes
+        self.stdout_truncated = stdout.truncated
+        self.stderr_truncated = stderr.truncated
+        self.stdout_path = stdout_path
+        self.stderr_path = stderr_path
+
+    @property
+    def ok(self) -> bool:
+        return not self.timed_out and self.returncode == 0
+
+    def read_stdout(self) -> str:
+        """Full stdout, read back from its log file when the tail is partial.
+
+        Needs a separate stderr_log_path; a shared log interleaves stderr.
+        """
+        if self.stdout_truncated and self.stdout_path is not None and self.stderr_path != self.stdout_path:
+            return self.stdout_path.read_text(errors="replace")
+        return self.stdout_tail
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serializable summary (tails included)."""
+        return {
+            "exit_code": self.returncode,
+            "timed_out": self.timed_out,
+            "duration_ms": round(self.duration_ms),
+            "stdout": self.stdout_tail,
+            "stderr": self.stderr_tail,
+            "stdout_bytes": self.stdout_bytes,
+            "stderr_bytes": self.stderr_bytes,
+            "log": str(self.stdout_path) if self.stdout_path else None,
+            "stderr_log": str(self.stderr_path) if self.stderr_path and self.stderr_path != self.stdout_path else None,
+        }
+
+
+class _Sink:
+    """Where one child stream goes: tail buffer, log file, line callback."""
+
+    def __init__(
+        self,
+        tail_bytes: int,
+        log_file: BinaryIO | None,
+        log_lock: threading.Lock,
+        on_line: Callable[[str], None] | None,
+    ):
+        self.tail = OutputTail(tail_bytes)
+        self.log_file = log_file
+        self.log_lock = log_lock
+        self.lines = LineSplitter(on_line) if on_line else None
+
+    def write(self, chunk: bytes) -> None:
+        self.tail.append(chunk)
+        if self.log_file is not None:
+            with self.log_lock:
+                self.log_file.write(chunk)
+        if self.lines is not None:
+            self.lines.feed(chunk)
+
+    def close(self) -> None:
+        if self.lines is not None:
+            self.lines.close()
+
+
+class _Logs:
+    """Opens the stdout/stderr log files (shared when stderr_path is None)."""
+
+    def __init__(self, log_path: Path | str | None, stderr_log_path: Path | str | None):
+        self.stdout_path = Path(log_path) if log_path else None
+        self.stderr_path = Path(stderr_log_path) if stderr_log_path else self.stdout_path
+        self.lock = threading.Lock()
+        self.stdout_file: BinaryIO | None = None
+        self.stderr_file: BinaryIO | None = None
+
+    def __enter__(self) -> "_Logs":
+        if self.stdout_path is not None:
+            self.stdout_path.parent.mkdir(parents=True, exist_ok=True)
+            self.stdout_file = open(self.stdout_path, "wb")
+        if self.stderr_path is not None and self.stderr_path != self.stdout_path:
+            self.stderr_path.parent.mkdir(parents=True, exist_ok=True)
+            self.stderr_file = open(self.stderr_path, "wb")
+        else:
+            self.stderr_file = self.stdout_file
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        for log_file in {self.stdout_file, self.stderr_file}:
+            if log_file is not None:
+                log_file.close()
+
+
+def run_process(
+    cmd: list[str],
+    cwd: Path | str | None = None,
+    timeout: float | None = None,
+    log_path: Path | str | None = None,
+    stderr_log_path: Path | str | None = None,
+    on_stdout_line: Callable[[str], None] | None = None,
+    tail_bytes: int = DEFAULT_TAIL_BYTES,
+    env: dict[str, str] | None = None,
+    cancellable: bool = True,
+) -> ProcessResult:
+    """Run a command, streaming its output to log files.
+
+    Args:
+        cmd: Command and arguments
+        cwd: Working directory
+        timeout: Seconds before the child is killed (result.timed_out is set)
+        log_path: File receiving stdout (and stderr, unless stderr_log_path
+                  is given). None keeps only the in-memory tails.
+        stderr_log_path: Separate file for stderr
+        on_stdout_line: Called with each stdout line as it arrives (from a
+                        reader thread)
+        tail_bytes: Bytes of each stream kept in memory
+        env: Environment for the child (default: inherited)
+        cancellable: Register with the active ProcessGroup. Pass False for
+                     short commands that must not be interrupted halfway
+                     (e.g. git merges).
+
+    Returns:
+        ProcessResult
+
+    Raises:
+        FileNotFoundError: If the executable does not exist
+        ProcessCancelled: If the active ProcessGroup has been terminated
+                          (before the child started or while it ran)
+    """
+    group = active_process_group() if cancellable else None
+    if group is not None:
+        group.check()
+
+    started = time.monotonic()
+    with _Logs(log_path, stderr_log_path) as logs:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=str(cwd) if cwd else None,
+            env=env,
+            start_new_session=True,
+        )
+        spawn_ms = (time.monotonic() - started) * 1000
+        if group is not None:
+            try:
+                group.add(proc.pid)
+            except ProcessCancelled:
+                proc.wait()
+                raise
+
+        stdout_sink = _Sink(tail_bytes, logs.stdout_file, logs.lock, on_stdout_line)
+        stderr_sink = _Sink(tail_bytes, logs.stderr_file, logs.lock, None)
+
+        def pump(stream: BinaryIO, sink: _Sink) -> None:
+            with stream:
+                while chunk := stream.read1(CHUNK_SIZE):
+                    sink.write(chunk)
+            sink.close()
+
+        readers = [
+            threading.Thread(target=pump, args=(proc.stdout, stdout_sink), daemon=True),
+            threading.Thread(target=pump, args=(proc.stderr, stderr_sink), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+
+        timed_out = False
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            _kill_group(proc.pid, signal.SIGKILL)
+            proc.wait()
+        except BaseException:
+            _kill_group(proc.pid, signal.SIGKILL)
+            proc.wait()
+            raise
+        finally:
+            if group is not None:
+                group.discard(proc.pid)
+            for reader in readers:
+                reader.join()
+
+    if group is not None and group.cancelled:
+        # Killed (or finished) while the pipeline gave up: not a result to act on
+        raise ProcessCancelled(group.reason or "process group terminated")
+
+    return ProcessResult(
+        cmd=cmd,
+        returncode=proc.returncode,
+        timed_out=timed_out,
+        duration_ms=(time.monotonic() - started) * 1000,
+        spawn_ms=spawn_ms,
+        stdout=stdout_sink.tail,
+        stderr=stderr_sink.tail,
+        stdout_path=logs.stdout_path,
+        stderr_path=logs.stderr_path,
+    )
+
+
+async def arun_process(
+    cmd: list[str],
+    cwd: Path | str | None = None,
+    timeout: float | None = None,
+    log_path: Path | str | None = None,
+    stderr_log_path: Path | str | None = None,
+    on_stdout_line: Callable[[str], None] | None = None,
+    tail_bytes: int = DEFAULT_TAIL_BYTES,
+    env: dict[str, str] | None = None,
+    cancellable: bool = True,
+) -> ProcessResult:
+    """Async variant of run_process().
+
+    Cancelling the awaiting task kills the child's process group and
+    re-raises.
+    """
+    group = active_process_group() if cancellable else None
+    if group is not None:
+        group.check()
+
+    started = time.monotonic()
+    with _Logs(log_path, stderr_log_path) as logs:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=str(cwd) if cwd else None,
+            env=env,
+            start_new_session=True,
+        )
+        spawn_ms = (time.monotonic() - started) * 1000
+        if group is not None:
+            try:
+                group.add(proc.pid)
+            except ProcessCancelled:
+                await proc.wait()
+                raise
+
+        stdout_sink = _Sink(tail_bytes, logs.stdout_file, logs.lock, on_stdout_line)
+        stderr_sink = _Sink(tail_bytes, logs.stderr_file, logs.lock, None)
+
+        async def pump(stream: asyncio.StreamReader, sink: _Sink) -> None:
+            while chunk := await stream.read(CHUNK_SIZE):
+                sink.write(chunk)
+            sink.close()
+
+        async def communicate() -> None:
+            await asyncio.gather(
+                pump(proc.stdout, stdout_sink),
+                pump(proc.stderr, stderr_sink),
+            )
+            await proc.wait()
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            _kill_group(proc.pid, signal.SIGKILL)
+            await proc.wait()
+        except asyncio.CancelledError:
+            _kill_group(proc.pid, signal.SIGKILL)
+            await proc.wait()
+            raise
+        finally:
+            if group is not None:
+                group.discard(proc.pid)
+
+    if group is not None and group.cancelled:
+        raise ProcessCancelled(group.reason or "process group terminated")
+
+    return ProcessResult(
+        cmd=cmd,
+        returncode=proc.returncode,
+        timed_out=timed_out,
+        duration_ms=(time.monotonic() - started) * 1000,
+        spawn_ms=spawn_ms,
+        stdout=stdout_sink.tail,
+        stderr=stderr_sink.tail,
+        stdout_path=logs.stdout_path,
+        stderr_path=logs.stderr_path,
+    )
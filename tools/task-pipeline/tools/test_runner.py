@@ -0,0 +1,540 @@
+"""Test runners for RED/GREEN verification.
+
+Verification used to start one `npx vitest run` per test file, paying Node
+and vite startup (plus transforms) for every file. run_vitest() runs all
+of a subtask's test files in a single vitest process and reads per-file and
+per-test outcomes from vitest's JSON reporter. Given a warm VitestServer,
+the files run there instead of in a new process. run_bash_tests() runs
+infrastructure test files concurrently, one process per file.
+
+Every runner returns one record per test file:
+    {"file": ..., "passed": bool, "log": ..., "tests": [...]}   ran
+    {"file": ..., "timeout": True, "log": ...}                  killed
+    {"file": ..., "error": "...", "log": ...}                   not run
+
+Each entry of "tests" is {"name", "status", "duration_ms", "failure"}
+(duration and failure message when the runner reports them).
+
+run_cached() serves files whose inputs are unchanged from a TestResultCache
+(those records carry "cached": True). write_test_report() aggregates the
+records of one run into report.json and a TAP version of it (report.tap);
+write_test_results() flattens them into one record per test
+(test-results.json) and summarizes those for task.json.
+"""
+
+import contextvars
+import json
+import os
+import re
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from tools.process import run_process
+from tools.vitest_server import VitestServer, VitestServerError
+
+
+VITEST_CMD = ["npx", "vitest", "run"]
+
+
+# Characters of a failure message kept per test (stack traces can be long)
+FAILURE_MESSAGE_CHARS = 4000
+
+# vitest statuses that mean the test did not run
+VITEST_SKIPPED = {"skipped", "pending", "todo", "disabled"}
+
+
+def _failure_message(lines: list[str]) -> str | None:
+    message = "\n".join(lines).strip()
+    return message[:FAILURE_MESSAGE_CHARS] or None
+
+
+def _vitest_tests(file_report: dict[str, Any]) -> list[dict[str, Any]]:
+    """Per-test outcomes of one file in a vitest JSON report."""
+    tests = []
+    for test in file_report.get("assertionResults", []):
+        status = test.get("status", "unknown")
+        duration = test.get("duration")
+        tests.append({
+            "name": test.get("fullName") or test.get("title", ""),
+            "status": "skipped" if status in VITEST_SKIPPED else status,
+            "duration_ms": round(duration) if duration is not None else None,
+            "failure": _failure_message(test.get("failureMessages") or []),
+        })
+    return tests
+
+
+def _vitest_file_record(test_file: Path | str, file_report: dict[str, Any], log: str) -> dict[str, Any]:
+    record = {
+        "file": str(test_file),
+        "passed": file_report.get("status") == "passed",
+        "tests": _vitest_tests(file_report),
+        "log": log,
+    }
+    start, end = file_report.get("startTime"), file_report.get("endTime")
+    if start is not None and end is not None:
+        record["duration_ms"] = round(end - start)
+    if file_report.get("message"):
+        # Suite-level failure (syntax error, failed import, ...)
+        record["error"] = file_report["message"]
+    return record
+
+
+def _read_vitest_report(
+    test_files: list[Path], report_path: Path, log: str, failure: str
+) -> list[dict[str, Any]]:
+    """Per-file records from a vitest JSON report (failure: error if there is none)."""
+    try:
+        report = json.loads(report_path.read_text())
+    except (OSError, ValueError):
+        return [{"file": str(f), "error": failure, "log": log} for f in test_files]
+
+    by_file = {
+        Path(file_report.get("name", "")).resolve(): file_report
+        for file_report in report.get("testResults", [])
+    }
+    results = []
+    for test_file in test_files:
+        file_report = by_file.get(Path(test_file).resolve())
+        if file_report is None:
+            # Outside vitest's include patterns (or excluded by its config)
+            results.append({"file": str(test_file), "error": "Not collected by vitest", "log": log})
+            continue
+        results.append(_vitest_file_record(test_file, file_report, log))
+    return results
+
+
+def read_vitest_report(report_path: Path, log: str) -> list[dict[str, Any]]:
+    """Per-file records for every file in a vitest JSON report (empty if there is none)."""
+    try:
+        report = json.loads(report_path.read_text())
+    except (OSError, ValueError):
+        return []
+    return [
+        _vitest_file_record(file_report.get("name", ""), file_report, log)
+        for file_report in report.get("testResults", [])
+    ]
+
+
+def run_vitest(
+    test_files: list[Path],
+    cwd: Path,
+    timeout: float,
+    log_path: Path,
+    report_path: Path,
+    server: VitestServer | None = None,
+) -> list[dict[str, Any]]:
+    """Run test files in one vitest process.
+
+    Args:
+        test_files: Test files to run (all of them, in one invocation)
+        cwd: Directory vitest runs in (where its config lives)
+        timeout: Seconds for the whole run
+        log_path: File receiving vitest's (verbose reporter) output
+        report_path: File receiving the JSON report
+        server: Warm vitest server for cwd; the files run there instead of
+                in a new `npx vitest run` (which remains the fallback if
+                the server fails)
+
+    Returns:
+        One record per test file, in the order given
+
+    Raises:
+        FileNotFoundError: If npx is not installed
+        ProcessCancelled: If the active ProcessGroup has been terminated
+    """
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.unlink(missing_ok=True)
+
+    if server is not None:
+        log = str(server.log_path)
+        try:
+            server.run(test_files, timeout=timeout, report_path=report_path)
+            return _read_vitest_report(test_files, report_path, log, "vitest server wrote no report")
+        except TimeoutError:
+            return [{"file": str(f), "timeout": True, "log": log} for f in test_files]
+        except VitestServerError as e:
+            print(f"[WARN] vitest server failed, running npx vitest run: {e}")
+
+    cmd = VITEST_CMD + [
+        "--reporter=verbose",
+        "--reporter=json",
+        f"--outputFile={report_path}",
+        *(str(f) for f in test_files),
+    ]
+    proc = run_process(cmd, cwd=cwd, timeout=timeout, log_path=log_path)
+    log = str(proc.stdout_path)
+
+    if proc.timed_out:
+        return [{"file": str(f), "timeout": True, "log": log} for f in test_files]
+    return _read_vitest_report(
+        test_files, report_path, log, f"vitest wrote no JSON report (exit code {proc.returncode})"
+    )
+
+
+# TAP test lines: "ok 3 - name", "not ok 4 name # SKIP reason"
+TAP_LINE = re.compile(r"^(not )?ok\b\s*\d*\s*(?:-\s*)?(.*?)\s*(?:#\s*(skip|todo)\b.*)?$", re.IGNORECASE)
+
+# Test duration appended by `bats --timing`: "ok 1 name in 12ms"
+TAP_TIMING = re.compile(r"\s+in (\d+)ms$")
+
+
+def _tap_tests(lines: Iterable[str]) -> list[dict[str, Any]]:
+    """Per-test outcomes from TAP lines in a test's output (bats, tap-emitting scripts).
+
+    Takes the lines one at a time (e.g. an open log file), so only the
+    diagnostics of the current test are held, up to FAILURE_MESSAGE_CHARS.
+    A failed test's message is the diagnostics that follow its line: "#"
+    comments (bats) or an indented YAML block.
+    """
+    tests = []
+    diagnostics: list[str] = []
+    diagnostic_chars = 0
+
+    def close_test() -> None:
+        nonlocal diagnostic_chars
+        if tests and tests[-1]["status"] == "failed":
+            tests[-1]["failure"] = _failure_message(diagnostics)
+        diagnostics.clear()
+        diagnostic_chars = 0
+
+    def add_diagnostic(text: str) -> None:
+        nonlocal diagnostic_chars
+        if diagnostic_chars < FAILURE_MESSAGE_CHARS:
+            diagnostics.append(text)
+            diagnostic_chars += len(text) + 1
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        match = TAP_LINE.match(line.strip())
+        if match is None:
+            stripped = line.strip()
+            if stripped.startswith("#"):
+                add_diagnostic(stripped.lstrip("#").strip())
+            elif line.startswith(" ") and stripped not in ("---", "..."):
+                add_diagnostic(stripped)
+            continue
+        close_test()
+
+        failed, name, directive = match.groups()
+        if directive:
+            status = "skipped"
+        else:
+            status = "failed" if failed else "passed"
+        timing = TAP_TIMING.search(name)
+        if timing:
+            name = name[:timing.start()]
+        tests.append({
+            "name": name,
+            "status": status,
+            "duration_ms": int(timing.group(1)) if timing else None,
+            "failure": None,
+        })
+    close_test()
+    return tests
+
+
+def _run_bash_test(test_file: Path, cwd: Path, timeout: float, log_path: Path) -> dict[str, Any]:
+    """Run one bash test file; it passes when it exits 0 and reports no failed TAP test."""
+    try:
+        proc = run_process(["bash", str(test_file)], cwd=cwd, timeout=timeout, log_path=log_path)
+    except FileNotFoundError as e:
+        return {"file": str(test_file), "error": str(e)}
+
+    record = {"file": str(test_file), "duration_ms": round(proc.duration_ms), "log": str(proc.stdout_path)}
+    if proc.timed_out:
+        record["timeout"] = True
+        return record
+
+    with open(log_path, errors="replace") as log:
+        tests = _tap_tests(log)
+    record["exit_code"] = proc.returncode
+    record["passed"] = proc.returncode == 0 and not any(t["status"] == "failed" for t in tests)
+    if tests:
+        record["tests"] = tests
+    return record
+
+
+def default_test_jobs() -> int:
+    """Test files run at once by default: one per CPU."""
+    return os.cpu_count() or 1
+
+
+def run_bash_tests(
+    test_files: list[Path],
+    cwd: Path,
+    timeout: float,
+    log_dir: Path,
+    log_prefix: str,
+    jobs: int | None = None,
+) -> list[dict[str, Any]]:
+    """Run bash test files concurrently, each in its own process.
+
+    A file passes when it exits 0 (and, if it prints TAP, no test is
+    "not ok"). Infrastructure tests mostly wait on I/O, so they overlap well.
+
+    Args:
+        test_files: *.test.sh files
+        cwd: Directory the scripts run in
+        timeout: Seconds per file
+        log_dir: Directory for the per-file logs
+        log_prefix: Log file name prefix ("red", "green", "integration")
+        jobs: Files run at once (default: CPU count)
+
+    Returns:
+        One record per test file, in the order given
+
+    Raises:
+        ProcessCancelled: If the active ProcessGroup has been terminated
+    """
+    log_paths = []
+    names = Counter(f.name for f in test_files)
+    for i, test_file in enumerate(test_files, 1):
+        # Files from different subtasks may share a name
+        name = test_file.name if names[test_file.name] == 1 else f"{i:02d}-{test_file.name}"
+        log_paths.append(log_dir / f"{log_prefix}-{name}.log")
+
+    workers = max(1, min(jobs or default_test_jobs(), len(test_files)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="test") as pool:
+        # Each run carries the caller's context (its ProcessGroup)
+        futures = [
+            pool.submit(contextvars.copy_context().run, _run_bash_test, test_file, cwd, timeout, log_path)
+            for test_file, log_path in zip(test_files, log_paths)
+        ]
+        return [future.result() for future in futures]
+
+
+def run_cached(
+    test_files: list[Path],
+    run: Callable[[list[Path]], list[dict[str, Any]]],
+    cache: Any = None,
+    phase: str = "",
+    runner: str = "",
+    root: Path | None = None,
+    inputs_digest: str | None = None,
+) -> list[dict[str, Any]]:
+    """Run test files, reusing the results of files whose inputs are unchanged.
+
+    Args:
+        test_files: Test files to verify
+        run: Runner for the files not in the cache (e.g. a partial of
+             run_vitest or run_bash_tests); returns records in order
+        cache: TestResultCache (None runs everything)
+        phase: Verification phase ("red", "green"), part of the cache key
+        runner: Runner name, part of the cache key
+        root: Test file paths in the cache key are relative to this
+        inputs_digest: TestResultCache.inputs_digest() of the run (None
+                       runs everything)
+
+    Returns:
+        One record per test file, in the order given; records served from
+        the cache carry "cached": True. Only files that ran to completion
+        (passed or failed) are stored, never timeouts or files not run.
+    """
+    if cache is None or inputs_digest is None:
+        return run(test_files)
+
+    keys = {
+        f: cache.make_test_key(phase, runner, f, root or Path("/"), inputs_digest) for f in test_files
+    }
+    cached = {}
+    for test_file, key in keys.items():
+        entry = cache.get(key)
+        if entry is not None:
+            cached[test_file] = {**entry["record"], "file": str(test_file), "cached": True}
+
+    to_run = [f for f in test_files if f not in cached]
+    fresh = dict(zip(to_run, run(to_run))) if to_run else {}
+    for test_file, record in fresh.items():
+        if "passed" in record:
+            cache.put(keys[test_file], {"record": record, "ran_at": datetime.now().isoformat()})
+    return [cached.get(f) or fresh[f] for f in test_files]
+
+
+def summarize_results(results: list[dict[str, Any]]) -> dict[str, int]:
+    """Counts of files by outcome, of their tests, and of results served from cache."""
+    summary = {
+        "files": len(results), "passed": 0, "failed": 0, "timed_out": 0, "errors": 0, "tests": 0, "cached": 0
+    }
+    for record in results:
+        if record.get("timeout"):
+            summary["timed_out"] += 1
+        elif "passed" not in record:
+            summary["errors"] += 1
+        elif record["passed"]:
+            summary["passed"] += 1
+        else:
+            summary["failed"] += 1
+        summary["tests"] += len(record.get("tests", []))
+        summary["cached"] += bool(record.get("cached"))
+    return summary
+
+
+def _tap_line(ok: bool, number: int, name: str, directive: str = "") -> str:
+    line = f"{'ok' if ok else 'not ok'} {number} - {name}"
+    return f"{line} # {directive}" if directive else line
+
+
+def _file_directive(record: dict[str, Any]) -> str:
+    """TAP directive explaining why a file did not pass."""
+    if record.get("timeout"):
+        return "timed out"
+    if "passed" not in record:
+        return "not run: " + (record.get("error") or "unknown error").splitlines()[0]
+    if not record["passed"] and record.get("exit_code"):
+        return f"exit code {record['exit_code']}"
+    return ""
+
+
+def write_test_report(results: list[dict[str, Any]], report_path: Path, root: Path | None = None) -> dict[str, int]:
+    """Write one aggregated report for a test run: JSON plus a TAP version next to it.
+
+    Args:
+        results: Records from run_vitest() / run_bash_tests()
+        report_path: JSON report path (the TAP report gets a .tap suffix)
+        root: Test file paths in the TAP report are relative to this
+
+    Returns:
+        The summary (see summarize_results())
+    """
+    summary = summarize_results(results)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps({"summary": summary, "files": results}, indent=2))
+
+    lines = ["TAP version 13", f"1..{len(results)}"]
+    for i, record in enumerate(results, 1):
+        name = Path(record["file"])
+        if root is not None and name.is_relative_to(root):
+            name = name.relative_to(root)
+        tests = record.get("tests", [])
+        if tests:
+            # Per-test results as a TAP subtest
+            lines += [f"    # Subtest: {name}", f"    1..{len(tests)}"]
+            for j, test in enumerate(tests, 1):
+                skipped = test["status"] == "skipped"
+                ok = skipped or test["status"] == "passed"
+                lines.append("    " + _tap_line(ok, j, test["name"], "SKIP" if skipped else ""))
+        directive = _file_directive(record)
+        if record.get("cached"):
+            directive = f"{directive} (cached result)" if directive else "cached result"
+        lines.append(_tap_line(bool(record.get("passed")), i, str(name), directive))
+    report_path.with_suffix(".tap").write_text("\n".join(lines) + "\n")
+    return summary
+
+
+# Lines of a failing script's log kept as its failure message (no TAP output)
+LOG_TAIL_LINES = 20
+
+# Slowest tests and failures listed in a test-results summary, and the
+# characters of each failure message kept there
+SUMMARY_SLOWEST = 5
+SUMMARY_FAILURES = 10
+SUMMARY_MESSAGE_CHARS = 300
+
+
+def _log_tail(log: str | None) -> str | None:
+    try:
+        with open(log, errors="replace") as f:
+            lines = deque((line.rstrip("\n") for line in f), maxlen=LOG_TAIL_LINES)
+    except (OSError, TypeError):
+        return None
+    return _failure_message(list(lines))
+
+
+def test_records(results: list[dict[str, Any]], root: Path | None = None) -> list[dict[str, Any]]:
+    """Flatten per-file records into one record per test.
+
+    A file gets a record of its own when it has no per-test results (plain
+    scripts, timeouts, files that did not run) or when it failed without a
+    failing test (a suite-level error, a non-zero exit after passing tests).
+
+    Returns:
+        Records {"file", "name", "status", "duration_ms", "failure"} with
+        status "passed", "failed", "skipped", "timeout" or "error" (and
+        "cached": True for results served from the cache)
+    """
+    records = []
+    for result in results:
+        file = Path(result["file"])
+        if root is not None and file.is_relative_to(root):
+            file = file.relative_to(root)
+        extra = {"cached": True} if result.get("cached") else {}
+
+        tests = result.get("tests", [])
+        for test in tests:
+            records.append({
+                "file": str(file),
+                "name": test["name"],
+                "status": test["status"],
+                "duration_ms": test.get("duration_ms"),
+                "failure": test.get("failure"),
+                **extra,
+            })
+
+        if result.get("timeout"):
+            status, failure = "timeout", "Timed out"
+        elif "passed" not in result:
+            status, failure = "error", result.get("error") or "Not run"
+        elif result["passed"]:
+            if tests:
+                continue
+            status, failure = "passed", None
+        elif any(t["status"] == "failed" for t in tests):
+            continue
+        else:
+            status = "failed"
+            failure = result.get("error") or _log_tail(result.get("log"))
+            if result.get("exit_code"):
+                failure = (f"{failure}\n" if failure else "") + f"(exit code {result['exit_code']})"
+        records.append({
+            "file": str(file),
+            "name": file.name,
+            "status": status,
+            "duration_ms": result.get("duration_ms"),
+            "failure": _failure_message([failure]) if failure else None,
+            **extra,
+        })
+    return records
+
+
+def summarize_tests(tests: list[dict[str, Any]]) -> dict[str, Any]:
+    """Counts by status, total duration, the slowest tests and the failures."""
+    summary: dict[str, Any] = {
+        "tests": len(tests), "passed": 0, "failed": 0, "skipped": 0, "timeout": 0, "error": 0
+    }
+    for test in tests:
+        summary[test["status"]] = summary.get(test["status"], 0) + 1
+
+    timed = [t for t in tests if t.get("duration_ms") is not None]
+    summary["duration_ms"] = sum(t["duration_ms"] for t in timed)
+    summary["slowest"] = [
+        {"file": t["file"], "name": t["name"], "duration_ms": t["duration_ms"]}
+        for t in sorted(timed, key=lambda t: t["duration_ms"], reverse=True)[:SUMMARY_SLOWEST]
+    ]
+    summary["failures"] = [
+        {"file": t["file"], "name": t["name"], "message": (t["failure"] or "")[:SUMMARY_MESSAGE_CHARS]}
+        for t in tests if t["status"] not in ("passed", "skipped")
+    ][:SUMMARY_FAILURES]
+    return summary
+
+
+def write_test_results(
+    results: list[dict[str, Any]], results_path: Path, root: Path | None = None
+) -> dict[str, Any]:
+    """Write the per-test records of a run (test-results.json) and summarize them.
+
+    Args:
+        results: Records from run_vitest() / run_bash_tests()
+        results_path: Where to write the records
+        root: Test file paths are relative to this
+
+    Returns:
+        The summary (see summarize_tests())
+    """
+    tests = test_records(results, root)
+    summary = summarize_tests(tests)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    results_path.write_text(json.dumps({"summary": summary, "tests": tests}, indent=2))
+    return summary
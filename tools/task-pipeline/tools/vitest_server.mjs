@@ -0,0 +1,196 @@
+#!/usr/bin/env node
+/**
+ * Long-lived vitest process for the task pipeline (driven by vitest_server.py).
+ *
+ * Started in an app directory, it keeps one Vitest instance - vite server,
+ * module graph and transform cache - alive between test runs, so a run after
+ * the Executor's edits only re-transforms the files that changed. Requests
+ * arrive as JSON lines on stdin and are handled one at a time; replies are
+ * JSON lines on the file descriptor in $VITEST_SERVER_REPLY_FD, so vitest's
+ * own console output (stdout/stderr, i.e. the server log) never mixes in.
+ *
+ *   <- {"ready": true, "version": "1.6.0"}                     once started
+ *   -> {"id": 1, "op": "ping"}
+ *   <- {"id": 1, "ok": true}
+ *   -> {"id": 2, "op": "run", "files": ["/abs/a.test.ts"], "report": "/abs/r.json"}
+ *   <- {"id": 2, "ok": true, "duration_ms": 812, "invalidated": 3}
+ *   -> {"id": 3, "op": "close"}                                 (or close stdin)
+ *
+ * The report file has the shape of vitest's JSON reporter (testResults[] with
+ * assertionResults[]), so it is parsed like the output of `vitest run`.
+ * Works with the programmatic API of vitest 1.x to 3.x.
+ */
+
+import fs from 'node:fs';
+import path from 'node:path';
+import readline from 'node:readline';
+import { pathToFileURL } from 'node:url';
+
+const replyFd = Number(process.env.VITEST_SERVER_REPLY_FD);
+
+function reply(message) {
+  fs.writeSync(replyFd, JSON.stringify(message) + '\n');
+}
+
+/** URL of the project's vitest/node entry (resolved from the app dir, not this script). */
+function resolveVitestNode(dir) {
+  for (let current = path.resolve(dir); ; current = path.dirname(current)) {
+    const pkgDir = path.join(current, 'node_modules', 'vitest');
+    const pkgFile = path.join(pkgDir, 'package.json');
+    if (fs.existsSync(pkgFile)) {
+      const pkg = JSON.parse(fs.readFileSync(pkgFile, 'utf8'));
+      let entry = pkg.exports?.['./node'];
+      while (entry && typeof entry === 'object') entry = entry.import ?? entry.default;
+      return pathToFileURL(path.join(pkgDir, entry || 'dist/node.js')).href;
+    }
+    if (path.dirname(current) === current) {
+      throw new Error(`vitest is not installed for ${dir}`);
+    }
+  }
+}
+
+let ctx;
+try {
+  const { createVitest } = await import(resolveVitestNode(process.cwd()));
+  ctx = await createVitest('test', { watch: false, passWithNoTests: true, reporters: ['verbose'] });
+  await ctx.init?.();
+} catch (error) {
+  reply({ ready: false, error: String(error?.stack ?? error) });
+  process.exit(1);
+}
+
+// API names changed between vitest majors
+const globSpecs = (ctx.globTestSpecifications ?? ctx.globTestSpecs ?? ctx.globTestFiles).bind(ctx);
+const runSpecs = (ctx.runTestSpecifications ?? ctx.runFiles).bind(ctx);
+const specFile = (spec) => spec.moduleId ?? spec[1];
+
+function viteServers() {
+  const servers = new Set([ctx.server, ctx.vite]);
+  for (const project of ctx.projects ?? []) servers.add(project.vite ?? project.server);
+  servers.delete(undefined);
+  return [...servers];
+}
+
+let lastRunAt = 0;
+
+// File mtimes can lag the clock by a few ms (coarse timestamps); files
+// modified this close before the previous run are invalidated anyway
+const MTIME_SLACK_MS = 1000;
+
+/** Invalidate modules of source files modified since the previous run. */
+function invalidateChanged() {
+  const changed = new Set();
+  for (const server of viteServers()) {
+    for (const [file, modules] of server.moduleGraph.fileToModulesMap) {
+      if (file.includes('/node_modules/')) continue;
+      let mtime;
+      try {
+        mtime = fs.statSync(file).mtimeMs;
+      } catch {
+        mtime = Infinity; // deleted
+      }
+      if (mtime < lastRunAt - MTIME_SLACK_MS) continue;
+      for (const mod of modules) server.moduleGraph.invalidateModule(mod);
+      changed.add(file);
+    }
+  }
+  for (const file of changed) ctx.invalidateFile?.(file);
+  return changed.size;
+}
+
+const STATUS = { pass: 'passed', fail: 'failed', skip: 'skipped', todo: 'todo' };
+
+function errorMessages(result) {
+  return (result?.errors ?? []).map((error) => error?.message ?? String(error));
+}
+
+function collectTests(task, prefix, tests) {
+  for (const child of task.tasks ?? []) {
+    const fullName = prefix ? `${prefix} ${child.name}` : child.name;
+    if (child.type === 'suite') {
+      collectTests(child, fullName, tests);
+      continue;
+    }
+    tests.push({
+      fullName,
+      title: child.name,
+      status: STATUS[child.result?.state] ?? (child.mode === 'run' ? 'pending' : 'skipped'),
+      duration: child.result?.duration ?? null,
+      failureMessages: errorMessages(child.result),
+    });
+  }
+  return tests;
+}
+
+function fileReport(file) {
+  const assertionResults = collectTests(file, '', []);
+  const failed = file.result?.state === 'fail' || assertionResults.some((t) => t.status === 'failed');
+  const startTime = file.result?.startTime ?? null;
+  return {
+    name: file.filepath,
+    status: failed ? 'failed' : 'passed',
+    message: errorMessages(file.result).join('\n'),
+    startTime,
+    endTime: startTime === null ? null : startTime + (file.result?.duration ?? 0),
+    assertionResults,
+  };
+}
+
+async function run(files, reportPath) {
+  const invalidated = invalidateChanged();
+  // Edits made while this run is in progress are picked up by the next one
+  lastRunAt = Date.now();
+
+  const specs = await globSpecs(files);
+  if (specs.length) await runSpecs(specs, false);
+
+  const wanted = new Set(specs.map(specFile));
+  const testResults = ctx.state.getFiles().filter((f) => wanted.has(f.filepath)).map(fileReport);
+  const success = testResults.every((r) => r.status === 'passed');
+  fs.writeFileSync(reportPath, JSON.stringify({ success, testResults }));
+  return invalidated;
+}
+
+async function shutdown() {
+  try {
+    await ctx.close();
+  } finally {
+    process.exit(0);
+  }
+}
+
+async function handle(line) {
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch {
+    return;
+  }
+  const { id, op } = request;
+  try {
+    if (op === 'ping') {
+      reply({ id, ok: true });
+    } else if (op === 'run') {
+      const started = performance.now();
+      const invalidated = await run(request.files, request.report);
+      reply({ id, ok: true, duration_ms: Math.round(performance.now() - started), invalidated });
+    } else if (op === 'close') {
+      await shutdown();
+    } else {
+      reply({ id, ok: false, error: `Unknown op: ${op}` });
+    }
+  } catch (error) {
+    reply({ id, ok: false, error: String(error?.stack ?? error) });
+  }
+}
+
+let queue = Promise.resolve();
+const lines = readline.createInterface({ input: process.stdin });
+lines.on('line', (line) => {
+  queue = queue.then(() => handle(line));
+});
+lines.on('close', () => {
+  queue = queue.then(shutdown);
+});
+
+reply({ ready: true, version: ctx.version ?? null });
@@ -0,0 +1,303 @@
+"""Warm vitest servers for RED/GREEN verification of app subtasks.
+
+Every `npx vitest run` pays Node startup, config loading, vite plugin setup
+and a cold transform cache. A subtask ran vitest at least three times
+(version check, RED, GREEN). VitestServer keeps one vitest process per app
+directory alive for the whole pipeline run (see vitest_server.mjs) and
+sends it test files to run; modules whose files changed since the previous
+run are invalidated, the rest stay transformed.
+
+VitestServers owns them: started ahead of first use (warm()), health-checked
+before each use, restarted once if they crash or hang, and shut down with
+the pipeline. When a server cannot be started (no node, vitest missing or
+too old) callers fall back to `npx vitest run`.
+"""
+
+import itertools
+import json
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from tools.process import ProcessCancelled, active_process_group
+
+
+class VitestServerError(Exception):
+    """The vitest server could not be started or stopped responding."""
+
+
+class VitestServer:
+    """One long-lived vitest process, rooted in an app directory.
+
+    Usage:
+        server = VitestServer(project_root / "app", log_path)
+        server.start()
+        server.run([test_file], timeout=120, report_path=report)
+        server.close()
+    """
+
+    SCRIPT = Path(__file__).with_name("vitest_server.mjs")
+
+    # Seconds to wait for the vite server and config to load
+    STARTUP_TIMEOUT_SECONDS = 60
+
+    # Seconds an idle server has to answer a health check
+    PING_TIMEOUT_SECONDS = 5
+
+    # Seconds a server gets to shut down before it is killed
+    CLOSE_TIMEOUT_SECONDS = 10
+
+    def __init__(self, app_dir: Path | str, log_path: Path | str):
+        self.app_dir = Path(app_dir)
+        self.log_path = Path(log_path)
+        self.version: str | None = None
+        self._proc: subprocess.Popen | None = None
+        self._replies: dict[Any, queue.Queue] = {}
+        self._ids = itertools.count(1)
+        # One request at a time, so a run's timeout only covers that run
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the process and wait until vitest is initialized.
+
+        Raises:
+            VitestServerError: If node is missing or vitest failed to load
+        """
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        ready = self._replies["ready"] = queue.Queue()
+        read_fd, write_fd = os.pipe()
+        try:
+            with open(self.log_path, "ab") as log:
+                self._proc = subprocess.Popen(
+                    ["node", str(self.SCRIPT)],
+                    cwd=self.app_dir,
+                    stdin=subprocess.PIPE,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    pass_fds=(write_fd,),
+                    env={**os.environ, "VITEST_SERVER_REPLY_FD": str(write_fd)},
+                    start_new_session=True,
+                )
+        except OSError as e:
+            os.close(read_fd)
+            raise VitestServerError(f"Could not start node: {e}") from e
+        finally:
+            os.close(write_fd)
+
+        threading.Thread(
+            target=self._read_replies, args=(read_fd,), name="vitest-server", daemon=True
+        ).start()
+        try:
+            message = ready.get(timeout=self.STARTUP_TIMEOUT_SECONDS)
+        except queue.Empty:
+            message = {"ready": False, "error": f"not ready after {self.STARTUP_TIMEOUT_SECONDS}s"}
+        finally:
+            self._replies.pop("ready", None)
+        if not message.get("ready"):
+            self.kill()
+            error = (message.get("error") or "exited during startup").strip().splitlines()[0]
+            raise VitestServerError(f"{error} (see {self.log_path})")
+        self.version = message.get("version")
+
+    def _read_replies(self, read_fd: int) -> None:
+        with os.fdopen(read_fd, "rb") as replies:
+            for line in replies:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                waiting = self._replies.get(message.get("id", "ready"))
+                if waiting is not None:
+                    waiting.put(message)
+
+        # Process gone: fail whoever is still waiting
+        for waiting in list(self._replies.values()):
+            waiting.put({"ok": False, "ready": False, "error": "vitest server exited"})
+
+    def _request(self, op: str, timeout: float, **fields: Any) -> dict[str, Any]:
+        """Send one request and wait for its reply.
+
+        Raises:
+            TimeoutError: If no reply arrived in time
+            VitestServerError: If the server is gone or the request failed
+            ProcessCancelled: If the active ProcessGroup has been terminated
+        """
+        if not self.alive():
+            raise VitestServerError("vitest server is not running")
+        request_id = next(self._ids)
+        reply = self._replies[request_id] = queue.Queue()
+        try:
+            try:
+                self._proc.stdin.write((json.dumps({"id": request_id, "op": op, **fields}) + "\n").encode())
+                self._proc.stdin.flush()
+            except OSError as e:
+                raise VitestServerError(f"vitest server is not accepting requests: {e}") from e
+
+            group = active_process_group()
+            deadline = time.monotonic() + timeout
+            while True:
+                if group is not None:
+                    group.check()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"vitest server did not answer {op} within {timeout:.0f}s")
+                try:
+                    message = reply.get(timeout=min(remaining, 0.2))
+                    break
+                except queue.Empty:
+                    continue
+        finally:
+            self._replies.pop(request_id, None)
+
+        if not message.get("ok"):
+            raise VitestServerError(message.get("error", "request failed"))
+        return message
+
+    def run(self, test_files: list[Path], timeout: float, report_path: Path) -> dict[str, Any]:
+        """Run test files, writing a vitest JSON report to report_path.
+
+        A run that does not finish in time, or whose ProcessGroup is
+        terminated while it runs, kills the server (its workers may be stuck
+        in the test code, and would otherwise keep executing the abandoned
+        run); the next use restarts it.
+
+        Returns:
+            The reply (duration_ms, invalidated)
+
+        Raises:
+            TimeoutError: If the run exceeded timeout
+            VitestServerError: If the server failed
+            ProcessCancelled: If the active ProcessGroup has been terminated
+        """
+        with self._lock:
+            try:
+                return self._request(
+                    "run", timeout, files=[str(f) for f in test_files], report=str(report_path)
+                )
+            except (TimeoutError, ProcessCancelled):
+                self.kill()
+                raise
+
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def healthy(self) -> bool:
+        """Whether the process is up and answers (a busy server counts as healthy)."""
+        if not self.alive():
+            return False
+        if not self._lock.acquire(blocking=False):
+            return True  # running tests for another subtask
+        try:
+            self._request("ping", self.PING_TIMEOUT_SECONDS)
+            return True
+        except (TimeoutError, VitestServerError):
+            return False
+        finally:
+            self._lock.release()
+
+    def close(self) -> None:
+        """Ask the server to shut down; kill it if it does not."""
+        if not self.alive():
+            return
+        try:
+            self._proc.stdin.write(b'{"op": "close"}\n')
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=self.CLOSE_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            self.kill()
+
+    def kill(self) -> None:
+        """Kill the server and the vitest workers it started."""
+        if self._proc is None:
+            return
+        try:
+            os.killpg(self._proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self._proc.wait()
+
+
+class VitestServers:
+    """The warm vitest servers of one pipeline run, one per app directory.
+
+    Usage:
+        servers = VitestServers(task_dir / "logs")
+        servers.warm(project_root / "app")      # start in the background
+        server = servers.get(project_root / "app")  # None: use npx vitest run
+        ...
+        servers.close_all()
+    """
+
+    # Starts per app directory (first start plus restarts after a crash or
+    # failed health check) before falling back to `npx vitest run`; a
+    # server that fails to start at all is not retried
+    MAX_STARTS = 2
+
+    def __init__(self, log_dir: Path | str):
+        self.log_dir = Path(log_dir)
+        self._servers: dict[Path, VitestServer] = {}
+        self._starts: dict[Path, int] = {}
+        self._dir_locks: dict[Path, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _dir_lock(self, app_dir: Path) -> threading.Lock:
+        with self._lock:
+            return self._dir_locks.setdefault(app_dir, threading.Lock())
+
+    def warm(self, app_dir: Path | str) -> None:
+        """Start the server for app_dir in the background (get() waits for it)."""
+        if Path(app_dir).is_dir():
+            threading.Thread(target=self.get, args=(app_dir,), name="vitest-warm", daemon=True).start()
+
+    def get(self, app_dir: Path | str) -> VitestServer | None:
+        """A healthy server for app_dir, started if needed; None if unavailable."""
+        app_dir = Path(app_dir).resolve()
+        if not app_dir.is_dir():
+            return None
+
+        with self._dir_lock(app_dir):
+            server = self._servers.get(app_dir)
+            if server is not None:
+                if server.healthy():
+                    return server
+                print(f"[WARN] vitest server in {app_dir} stopped responding; restarting it")
+                server.kill()
+                del self._servers[app_dir]
+
+            starts = self._starts.get(app_dir, 0)
+            if starts >= self.MAX_STARTS:
+                return None
+            self._starts[app_dir] = starts + 1
+
+            server = VitestServer(app_dir, self.log_dir / f"vitest-server-{app_dir.parent.name}.log")
+            try:
+                server.start()
+            except VitestServerError as e:
+                # Not worth retrying (no node, vitest missing or too old)
+                self._starts[app_dir] = self.MAX_STARTS
+                print(f"[WARN] vitest server unavailable in {app_dir}, using npx vitest run: {e}")
+                return None
+            self._servers[app_dir] = server
+            return server
+
+    def close(self, app_dir: Path | str) -> None:
+        """Shut down the server for app_dir (e.g. when its worktree is removed)."""
+        app_dir = Path(app_dir).resolve()
+        with self._dir_lock(app_dir):
+            server = self._servers.pop(app_dir, None)
+            if server is not None:
+                server.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            app_dirs = list(self._servers)
+        for app_dir in app_dirs:
+            self.close(app_dir)
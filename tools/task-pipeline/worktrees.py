@@ -0,0 +1,417 @@
+"""Isolated git worktrees for concurrently running subtasks.
+
+Every ExecutorAgent edits files in the project tree, so two subtasks running
+at once would trample each other's changes. WorktreeManager gives each
+subtask its own `git worktree`, branched from an integration branch that
+holds the work of all subtasks merged so far. When a subtask finishes, its
+changes are committed, merged into the integration branch and applied to
+the main checkout. A conflict at either step fails the subtask.
+
+Because a subtask only starts once its dependencies have been merged (see
+SubtaskScheduler), merges happen in dependency order.
+
+Merges into a main checkout are serialized across all managers in the
+process (several tasks may run at once, see daemon.py). With shared=True
+several processes (run.py --worker) use the same worktree root: the
+integration worktree is reused rather than recreated, and merges are also
+serialized across processes with an flock on .worktrees/.merge.lock.
+
+Layout (all under <project_root>/.worktrees/<task name>/):
+    integration/      integration branch checkout
+    subtask-NN/       one checkout per running subtask
+    subtask-NN-cK/    speculative Executor candidate K (see create_candidate)
+    subtask-NN.patch  the diff applied to the main checkout
+"""
+
+import contextlib
+import fcntl
+import shutil
+import threading
+from pathlib import Path
+
+from node_store import NodeModulesStore
+from tools.process import ProcessResult, run_process
+
+
+# One lock per main checkout, shared by every manager in this process
+_checkout_locks: dict[Path, threading.Lock] = {}
+_checkout_locks_guard = threading.Lock()
+
+
+def _checkout_lock(project_root: Path) -> threading.Lock:
+    with _checkout_locks_guard:
+        return _checkout_locks.setdefault(project_root, threading.Lock())
+
+
+class WorktreeError(Exception):
+    """A git worktree operation failed."""
+
+
+class Worktree:
+    """A subtask's checkout and where the task directory is mirrored in it."""
+
+    def __init__(
+        self,
+        subtask_num: int,
+        path: Path,
+        branch: str,
+        task_dir: Path,
+        task_mirror: Path,
+        subtask_dir: Path,
+        candidate: int | None = None,
+    ):
+        self.subtask_num = subtask_num
+        self.path = path
+        self.branch = branch
+        self.task_dir = task_dir
+        self.task_mirror = task_mirror
+        # The subtask's directory in the main task dir
+        self.subtask_dir = subtask_dir
+        # Candidate number for speculative Executor checkouts
+        self.candidate = candidate
+        self.base_commit: str | None = None
+        self.commit: str | None = None
+        # Paths the pipeline added to the checkout (never committed)
+        self.scaffolding: list[str] = []
+        # How each package dir got its node_modules
+        self.node_modules: dict[str, str] = {}
+
+    def task_path(self, path: Path) -> Path:
+        """Location inside the worktree of a path under the main task dir."""
+        return self.task_mirror / path.relative_to(self.task_dir)
+
+    def to_dict(self) -> dict[str, str | None]:
+        return {
+            "path": str(self.path),
+            "branch": self.branch,
+            "base_commit": self.base_commit,
+            "commit": self.commit,
+            "node_modules": self.node_modules,
+        }
+
+
+class WorktreeManager:
+    """Creates, merges and removes the worktrees of one task.
+
+    Usage:
+        manager = WorktreeManager(project_root, task_dir)
+        manager.setup()
+        worktree = manager.create(1, task_dir / "03-subtask-01")
+        # ... run agents with project_root=worktree.path ...
+        error = manager.finish(worktree, "Add parser", success=True)
+        manager.cleanup()
+    """
+
+    ROOT_DIR = ".worktrees"
+    BRANCH_PREFIX = "task-pipeline"
+
+    # Package directories whose node_modules worktrees share (see NodeModulesStore)
+    PACKAGE_DIRS = ("app",)
+
+    # Identity for the pipeline's own commits (branches are temporary)
+    GIT_IDENTITY = ["-c", "user.name=task-pipeline", "-c", "user.email=task-pipeline@localhost"]
+
+    def __init__(
+        self,
+        project_root: Path | str,
+        task_dir: Path | str,
+        node_store: NodeModulesStore | None = None,
+        shared: bool = False,
+    ):
+        self.project_root = Path(project_root).resolve()
+        self.task_dir = Path(task_dir).resolve()
+        self.root = self.project_root / self.ROOT_DIR / self.task_dir.name
+        self.branch_prefix = f"{self.BRANCH_PREFIX}/{self.task_dir.name}"
+        self.integration = self.root / "integration"
+        self.integration_branch = f"{self.branch_prefix}/integration"
+
+        # Where the task directory appears inside each worktree. Mirroring
+        # its path keeps relative imports in generated tests working.
+        try:
+            self.task_rel = self.task_dir.relative_to(self.project_root)
+        except ValueError:
+            self.task_rel = Path("tasks") / self.task_dir.name
+
+        # Installed dependencies shared by all worktrees
+        self.node_store = node_store or NodeModulesStore()
+
+        # Merges into the integration branch and the main checkout are serial
+        # (across processes too when shared)
+        self.shared = shared
+        self._merge_lock = _checkout_lock(self.project_root)
+
+    @contextlib.contextmanager
+    def _merging(self):
+        """Exclusive access to the integration branch and the main checkout."""
+        with self._merge_lock:
+            if not self.shared:
+                yield
+                return
+            self.root.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.root.parent / ".merge.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def is_available(project_root: Path | str) -> bool:
+        """Whether project_root is a git checkout with at least one commit."""
+        try:
+            result = run_process(["git", "rev-parse", "--verify", "-q", "HEAD"], cwd=project_root, timeout=30)
+        except FileNotFoundError:
+            return False
+        return result.ok
+
+    def _git(self, *args: str, cwd: Path | None = None, check: bool = True) -> ProcessResult:
+        # Not cancellable: a half-done merge would leave the integration branch broken
+        result = run_process(["git", *args], cwd=cwd or self.project_root, timeout=300, cancellable=False)
+        if check and not result.ok:
+            raise WorktreeError(f"git {' '.join(args)} failed: {result.stderr_tail.strip()}")
+        return result
+
+    def _rev_parse(self, ref: str, cwd: Path | None = None) -> str:
+        return self._git("rev-parse", ref, cwd=cwd).stdout_tail.strip()
+
+    def setup(self) -> None:
+        """Create the integration worktree from the main checkout's state.
+
+        Uncommitted changes to tracked files are included (via
+        `git stash create`, which leaves the working tree untouched). A
+        shared manager reuses an integration worktree another worker set up.
+        """
+        self._exclude_root()
+        with self._merging():
+            if self.shared and (self.integration / ".git").exists():
+                return
+            snapshot = self._git("stash", "create").stdout_tail.strip()
+            base = snapshot or self._rev_parse("HEAD")
+
+            self._remove_worktree(self.integration)
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._git("worktree", "add", "--force", "-B", self.integration_branch, str(self.integration), base)
+
+    def _exclude_root(self) -> None:
+        """Keep .worktrees/ out of `git status` without touching .gitignore."""
+        common_dir = Path(self._git("rev-parse", "--git-common-dir").stdout_tail.strip())
+        if not common_dir.is_absolute():
+            common_dir = self.project_root / common_dir
+        exclude = common_dir / "info" / "exclude"
+        pattern = f"/{self.ROOT_DIR}/"
+        existing = exclude.read_text() if exclude.exists() else ""
+        if pattern not in existing.splitlines():
+            exclude.parent.mkdir(parents=True, exist_ok=True)
+            with exclude.open("a") as f:
+                f.write(("" if existing.endswith("\n") or not existing else "\n") + pattern + "\n")
+
+    def create(self, subtask_num: int, subtask_dir: Path) -> Worktree:
+        """Create (or reuse, when resuming) the worktree for a subtask.
+
+        The subtask's directory from the main task dir, if any, is copied
+        into the worktree so finished stages are not rerun.
+        """
+        path = self.root / f"subtask-{subtask_num:02d}"
+        branch = f"{self.branch_prefix}/subtask-{subtask_num:02d}"
+        subtask_dir = Path(subtask_dir).resolve()
+        worktree = Worktree(subtask_num, path, branch, self.task_dir, path / self.task_rel, subtask_dir)
+
+        if not (path / ".git").exists():
+            with self._merging():
+                head = self._rev_parse("HEAD", cwd=self.integration)
+            self._git("worktree", "add", "--force", "-B", branch, str(path), head)
+        worktree.base_commit = self._rev_parse("HEAD", cwd=path)
+        self._scaffold(worktree)
+
+        if subtask_dir.exists():
+            shutil.copytree(subtask_dir, worktree.task_path(subtask_dir), dirs_exist_ok=True)
+        return worktree
+
+    def create_candidate(self, worktree: Worktree, candidate: int) -> Worktree:
+        """Create a fresh checkout of a subtask worktree for one Executor candidate.
+
+        The candidate branches from the subtask worktree's HEAD and gets a
+        copy of its mirrored subtask dir (the TDD agent's tests and specs).
+        """
+        path = self.root / f"subtask-{worktree.subtask_num:02d}-c{candidate}"
+        branch = f"{worktree.branch}-c{candidate}"
+        checkout = Worktree(
+            worktree.subtask_num, path, branch, self.task_dir, path / self.task_rel,
+            worktree.subtask_dir, candidate=candidate
+        )
+
+        # Candidates never resume: a leftover checkout is from a cancelled run
+        self._remove_worktree(path)
+        head = self._rev_parse("HEAD", cwd=worktree.path)
+        self._git("worktree", "add", "--force", "-B", branch, str(path), head)
+        checkout.base_commit = head
+        self._scaffold(checkout)
+
+        mirror = worktree.task_path(worktree.subtask_dir)
+        if mirror.exists():
+            shutil.copytree(mirror, checkout.task_path(worktree.subtask_dir), dirs_exist_ok=True)
+        return checkout
+
+    def adopt(self, worktree: Worktree, candidate: Worktree, title: str, merge: bool = True) -> None:
+        """Take over a candidate's artifacts and (if merge) its changes.
+
+        The candidate's edits are committed on its branch and fast-forwarded
+        into the subtask worktree, so finish() merges them as usual. The
+        candidate checkout is removed afterwards.
+
+        Raises:
+            WorktreeError: If the candidate's commit cannot be fast-forwarded
+        """
+        try:
+            if merge:
+                candidate.commit = self._commit(candidate, title)
+                if candidate.commit is not None:
+                    self._git("merge", "--ff-only", "-q", candidate.branch, cwd=worktree.path)
+
+            mirror = candidate.task_path(candidate.subtask_dir)
+            if mirror.exists():
+                shutil.copytree(mirror, worktree.task_path(worktree.subtask_dir), dirs_exist_ok=True)
+        finally:
+            self.discard(candidate)
+
+    def discard(self, candidate: Worktree) -> None:
+        """Remove a candidate checkout and its branch."""
+        self._remove_worktree(candidate.path)
+        self._git("branch", "-D", candidate.branch, check=False)
+
+    def _scaffold(self, worktree: Worktree) -> None:
+        """Add what the agents need but git does not track to a checkout."""
+        # Agent definitions may be untracked in the main checkout
+        agents_dir = worktree.path / ".claude" / "agents"
+        if not agents_dir.exists() and not agents_dir.is_symlink():
+            agents_dir.parent.mkdir(parents=True, exist_ok=True)
+            agents_dir.symlink_to(self.project_root / ".claude" / "agents", target_is_directory=True)
+        if agents_dir.is_symlink():
+            worktree.scaffolding.append(".claude/agents")
+
+        self._provision_node_modules(worktree)
+
+    def _provision_node_modules(self, worktree: Worktree) -> None:
+        """Link each package's node_modules into the shared store.
+
+        Failures are recorded, not raised: tests then report vitest as
+        unavailable instead of failing the subtask.
+        """
+        for package in self.PACKAGE_DIRS:
+            package_dir = worktree.path / package
+            if not (package_dir / "package.json").exists():
+                continue
+            try:
+                worktree.node_modules[package] = self.node_store.provision(
+                    package_dir, self.project_root / package
+                )
+            except OSError as e:
+                worktree.node_modules[package] = f"failed: {e}"
+            if (package_dir / "node_modules").exists():
+                worktree.scaffolding.append(f"{package}/node_modules")
+
+    def finish(self, worktree: Worktree, title: str, success: bool) -> str | None:
+        """Copy artifacts back and, on success, merge the subtask's changes.
+
+        Returns:
+            Failure reason if the changes could not be merged, else None.
+            Failed subtasks keep their worktree for inspection.
+        """
+        self._sync_back(worktree)
+        if not success:
+            return None
+
+        try:
+            worktree.commit = self._commit(worktree, title)
+            if worktree.commit is not None:
+                with self._merging():
+                    error = self._merge(worktree)
+                if error:
+                    return error
+        except WorktreeError as e:
+            return str(e)
+
+        self._remove_worktree(worktree.path)
+        self._git("branch", "-D", worktree.branch, check=False)
+        return None
+
+    def _sync_back(self, worktree: Worktree) -> None:
+        """Copy the subtask's artifacts from the worktree to the main task dir."""
+        mirror = worktree.task_path(worktree.subtask_dir)
+        if mirror.exists():
+            shutil.copytree(mirror, worktree.subtask_dir, dirs_exist_ok=True)
+
+    def _commit(self, worktree: Worktree, title: str) -> str | None:
+        """Commit the agents' edits (not the task dir copy).
+
+        Returns:
+            The worktree's HEAD, or None if it has no changes since
+            base_commit (an adopted candidate's commit counts as a change)
+        """
+        # Stage everything, then unstage the task dir copy and scaffolding
+        # (exclude pathspecs would fail on paths that are also gitignored)
+        self._git("add", "-A", cwd=worktree.path)
+        self._git("reset", "-q", "--", self.task_rel.as_posix(), *worktree.scaffolding, cwd=worktree.path)
+        if self._git("diff", "--cached", "--quiet", cwd=worktree.path, check=False).returncode != 0:
+            message = f"Subtask {worktree.subtask_num}: {title}"
+            if worktree.candidate is not None:
+                message += f" (candidate {worktree.candidate})"
+            self._git(*self.GIT_IDENTITY, "commit", "--no-verify", "-q", "-m", message, cwd=worktree.path)
+
+        head = self._rev_parse("HEAD", cwd=worktree.path)
+        return head if head != worktree.base_commit else None
+
+    def _merge(self, worktree: Worktree) -> str | None:
+        """Merge into the integration branch and apply to the main checkout."""
+        before = self._rev_parse("HEAD", cwd=self.integration)
+        merge = self._git(
+            *self.GIT_IDENTITY, "merge", "--no-ff", "--no-edit", "-q", worktree.branch,
+            cwd=self.integration, check=False
+        )
+        if not merge.ok:
+            conflicts = self._git(
+                "diff", "--name-only", "--diff-filter=U", cwd=self.integration, check=False
+            ).stdout_tail.split()
+            self._git("merge", "--abort", cwd=self.integration, check=False)
+            return f"Merge conflict with earlier subtasks in: {', '.join(conflicts) or 'unknown files'}"
+
+        patch = self.root / f"subtask-{worktree.subtask_num:02d}.patch"
+        diff = self._git(
+            "diff", "--binary", f"--output={patch}", before, "HEAD", cwd=self.integration, check=False
+        )
+        apply_error = None
+        if not diff.ok:
+            apply_error = f"Could not diff subtask changes: {diff.stderr_tail.strip()}"
+        elif patch.stat().st_size:
+            check = self._git("apply", "--check", str(patch), check=False)
+            if check.ok:
+                check = self._git("apply", str(patch), check=False)
+            if not check.ok:
+                apply_error = f"Changes conflict with the main checkout: {check.stderr_tail.strip()}"
+
+        if apply_error:
+            # Keep the integration branch in step with the main checkout
+            self._git("reset", "--hard", "-q", before, cwd=self.integration, check=False)
+            return apply_error
+        return None
+
+    def _remove_worktree(self, path: Path) -> None:
+        self.node_store.release(path)
+        if path.exists():
+            self._git("worktree", "remove", "--force", str(path), check=False)
+            shutil.rmtree(path, ignore_errors=True)
+        self._git("worktree", "prune", check=False)
+
+    def cleanup(self) -> None:
+        """Remove the integration worktree (failed subtasks' worktrees stay).
+
+        A shared manager leaves it for the other workers.
+        """
+        if self.shared:
+            return
+        self._remove_worktree(self.integration)
+        self._git("branch", "-D", self.integration_branch, check=False)
+        try:
+            self.root.rmdir()
+        except OSError:
+            pass